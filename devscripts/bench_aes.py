@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+# Allow direct execution
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import argparse
+import time
+
+from yt_dlp.aes import (
+    _aes_cbc_decrypt_native,
+    _aes_ctr_native,
+    _aes_gcm_decrypt_and_verify_native,
+    aes_cbc_decrypt,
+    aes_ctr_decrypt,
+)
+from yt_dlp.dependencies import Cryptodome_AES
+from yt_dlp.utils import bytes_to_intlist, intlist_to_bytes
+
+
+def bench(name, func, size, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f'{name:<24}{elapsed * 1000:10.1f} ms{size / elapsed / 1024:12.0f} KiB/s')
+
+
+def gcm_decrypt(data, key, nonce):
+    # The tag is not valid, so only the decryption and hashing are measured
+    try:
+        _aes_gcm_decrypt_and_verify_native(data, key, bytes(16), nonce)
+    except ValueError:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the throughput of the AES implementations')
+    parser.add_argument('--size', type=int, default=256 * 1024, help='Size of the data in bytes (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of runs to average (default: %(default)s)')
+    args = parser.parse_args()
+
+    key, iv, data = os.urandom(16), os.urandom(16), os.urandom(args.size)
+    int_key, int_iv, int_data = map(bytes_to_intlist, (key, iv, data))
+
+    cases = {
+        'cbc': {
+            'int list': lambda: intlist_to_bytes(aes_cbc_decrypt(int_data, int_key, int_iv)),
+            'native': lambda: _aes_cbc_decrypt_native(data, key, iv),
+        },
+        'ctr': {
+            'int list': lambda: intlist_to_bytes(aes_ctr_decrypt(int_data, int_key, int_iv)),
+            'native': lambda: _aes_ctr_native(data, key, iv),
+        },
+        'gcm': {
+            'native': lambda: gcm_decrypt(data, key, iv[:12]),
+        },
+    }
+    if Cryptodome_AES:
+        cases['cbc']['pycryptodome'] = lambda: Cryptodome_AES.new(key, Cryptodome_AES.MODE_CBC, iv).decrypt(data)
+        cases['ctr']['pycryptodome'] = lambda: Cryptodome_AES.new(
+            key, Cryptodome_AES.MODE_CTR, nonce=b'', initial_value=iv).decrypt(data)
+        cases['gcm']['pycryptodome'] = lambda: Cryptodome_AES.new(key, Cryptodome_AES.MODE_GCM, iv[:12]).decrypt(data)
+    else:
+        print('pycryptodome is not installed; skipping it')
+
+    for mode, funcs in cases.items():
+        for name, func in funcs.items():
+            bench(f'{mode} {name}', func, args.size, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
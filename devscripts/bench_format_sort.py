@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+# Allow direct execution
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import argparse
+import random
+import time
+
+from yt_dlp import YoutubeDL
+from yt_dlp.extractor.common import InfoExtractor
+
+VCODECS = ('avc1.64001F', 'avc1.4d401e', 'vp09.00.40.08', 'vp09.02.10.10', 'av01.0.08M.08', 'hev1.1.6.L93', 'none')
+ACODECS = ('mp4a.40.2', 'mp4a.40.5', 'opus', 'vorbis', 'ec-3', 'ac-3', 'none')
+PROTOCOLS = ('https', 'm3u8_native', 'http_dash_segments', 'f4m')
+DYNAMIC_RANGES = ('SDR', 'HDR10', 'HLG', 'DV', None)
+
+
+def make_formats(count, rng):
+    formats = []
+    for i in range(count):
+        vcodec, acodec = rng.choice(VCODECS), rng.choice(ACODECS)
+        height = rng.choice((144, 240, 360, 480, 720, 1080, 1440, 2160))
+        formats.append({
+            'format_id': f'{i}',
+            'url': f'https://example.com/{i}.mp4',
+            'ext': 'webm' if vcodec.startswith('vp') or acodec in ('opus', 'vorbis') else 'mp4',
+            'vcodec': vcodec,
+            'acodec': acodec,
+            'protocol': rng.choice(PROTOCOLS),
+            'dynamic_range': rng.choice(DYNAMIC_RANGES),
+            'height': height,
+            'width': height * 16 // 9,
+            'fps': rng.choice((24, 30, 60, None)),
+            'tbr': rng.uniform(50, 20000),
+            'filesize': rng.choice((None, rng.randint(10 ** 5, 10 ** 9))),
+            'quality': rng.choice((None, -1, 0, 1)),
+        })
+    return formats
+
+
+def bench(name, func, count, repeat, unit='formats'):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f'{name:<24}{elapsed * 1000:10.2f} ms{count / elapsed:14.0f} {unit}/s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the speed of sorting formats with InfoExtractor.FormatSort')
+    parser.add_argument('--formats', type=int, default=5000, help='Number of formats to sort (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of runs to average (default: %(default)s)')
+    parser.add_argument('-S', '--format-sort', default='', help='Sort order to use, as in yt-dlp -S')
+    args = parser.parse_args()
+
+    ydl = YoutubeDL({'quiet': True, 'format_sort': [f for f in args.format_sort.split(',') if f]})
+    ie = InfoExtractor(ydl)
+    formats = make_formats(args.formats, random.Random(0))
+
+    bench('compile', lambda: ie.FormatSort(ie, ()), 1, args.repeat * 20, 'sorts')
+    bench('sort (compiled)', lambda: ie._sort_formats(formats[:]), args.formats, args.repeat)
+    bench('sort (uncached)', lambda: formats[:].sort(key=ie.FormatSort(ie, ()).calculate_preference),
+          args.formats, args.repeat)
+    sort_key = ie._get_format_sort().calculate_preference
+    bench('sort keys', lambda: list(map(sort_key, formats)), args.formats, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
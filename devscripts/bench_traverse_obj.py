@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+# Allow direct execution
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import argparse
+import json
+import time
+import unittest.mock
+
+from yt_dlp import utils
+from yt_dlp.utils import traverse_obj
+
+# Paths in the style of those used on ytInitialData by the youtube extractor
+TAB_PATH = ('contents', 'twoColumnBrowseResultsRenderer', 'tabs', ..., 'tabRenderer')
+VIDEO_PATH = (*TAB_PATH, 'content', 'richGridRenderer', 'contents', ..., 'richItemRenderer', 'content', 'videoRenderer')
+CASES = {
+    'single key': lambda data: traverse_obj(data, 'contents'),
+    'nested keys': lambda data: traverse_obj(
+        data, ('contents', 'twoColumnBrowseResultsRenderer', 'tabs', 0, 'tabRenderer', 'title')),
+    'alternatives': lambda data: traverse_obj(
+        data, ('header', 'c4TabbedHeaderRenderer', 'title'), ('metadata', 'channelMetadataRenderer', 'title'),
+        expected_type=str),
+    'branching': lambda data: traverse_obj(data, (*VIDEO_PATH, 'videoId')),
+    'tuple keys': lambda data: traverse_obj(
+        data, (*VIDEO_PATH, ('lengthText', 'viewCountText'), 'simpleText')),
+    'first match': lambda data: traverse_obj(data, (*VIDEO_PATH, 'title', 'runs', 0, 'text'), get_all=False),
+}
+
+
+def make_initial_data(count):
+    return {
+        'header': {'c4TabbedHeaderRenderer': {'title': 'Channel'}},
+        'contents': {'twoColumnBrowseResultsRenderer': {'tabs': [{'tabRenderer': {'title': 'Home'}}, {'tabRenderer': {
+            'title': 'Videos',
+            'content': {'richGridRenderer': {'contents': [{'richItemRenderer': {'content': {'videoRenderer': {
+                'videoId': f'{i:011d}',
+                'title': {'runs': [{'text': f'Video {i}'}]},
+                'lengthText': {'simpleText': f'{i % 60}:{i % 60:02d}'},
+                'viewCountText': {'simpleText': f'{i} views'},
+            }}}} for i in range(count)]}},
+        }}]}},
+    }
+
+
+def bench(func, data, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(data)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare compiled and interpreted traverse_obj paths')
+    parser.add_argument('fixtures', nargs='*', help=(
+        'JSON files to traverse, e.g. ytInitialData saved from a channel page. '
+        'If none are given, synthetic data with the same structure is used'))
+    parser.add_argument('--items', type=int, default=200, help='Number of videos in the synthetic data (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=1000, help='Number of runs to average (default: %(default)s)')
+    args = parser.parse_args()
+
+    fixtures = {'synthetic': make_initial_data(args.items)}
+    for fn in args.fixtures:
+        with open(fn, encoding='utf-8') as f:
+            fixtures[os.path.basename(fn)] = json.load(f)
+
+    print(f'{"":<32}{"compiled":>12}{"interpreted":>14}{"speedup":>10}')
+    for fixture, data in fixtures.items():
+        for name, func in CASES.items():
+            compiled = bench(func, data, args.repeat)
+            with unittest.mock.patch.object(utils, '_is_compilable_traversal', lambda *_: False):
+                interpreted = bench(func, data, args.repeat)
+            print(f'{f"{fixture}: {name}":<32}{compiled * 1e6:10.2f}us{interpreted * 1e6:12.2f}us{interpreted / compiled:9.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -31,3 +31,7 @@ def __new__(cls, *args, **kwargs):
         instance = cls.real_class.__new__(cls.real_class)
         instance.__init__(*args, **kwargs)
         return instance
+
+    @classmethod
+    def _get_url_host_keys(cls):
+        return cls._URL_HOST_KEYS
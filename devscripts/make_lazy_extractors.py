@@ -121,6 +121,8 @@ def build_lazy_ie(ie, name, attr_base):
         valid_url = ie._make_valid_url()
     if valid_url:
         s += f'    _VALID_URL = {valid_url!r}\n'
+    # Used by YoutubeDL to look up the candidate extractors of a URL by its host
+    s += f'    _URL_HOST_KEYS = {ie._get_url_host_keys()!r}\n'
     return s + '\n'.join(extra_ie_code(ie, attr_base))
 
 
@@ -9,7 +9,11 @@
 
 
 import copy
+import io
 import json
+import tempfile
+import threading
+import time
 import urllib.error
 
 from test.helper import FakeYDL, assertRegexpMatches
@@ -19,9 +23,11 @@
 from yt_dlp.extractor.common import InfoExtractor
 from yt_dlp.postprocessor.common import PostProcessor
 from yt_dlp.utils import (
+    MaxDownloadsReached,
     ExtractorError,
     LazyList,
     OnDemandPagedList,
+    RejectedVideoReached,
     int_or_none,
     match_filter_func,
 )
@@ -410,6 +416,31 @@ def format_info(f_id):
             downloaded = ydl.downloaded_info_dicts[0]
             self.assertEqual(downloaded['format_id'], f1['format_id'])
 
+    def test_format_sort(self):
+        formats = [
+            {'format_id': 'vp9', 'vcodec': 'vp9', 'acodec': 'none', 'height': 720, 'url': TEST_URL},
+            {'format_id': 'vp9.2', 'vcodec': 'vp9.2', 'acodec': 'none', 'height': 720, 'url': TEST_URL},
+            {'format_id': 'avc', 'vcodec': 'avc1.64001F', 'acodec': 'none', 'height': 1080, 'url': TEST_URL},
+            {'format_id': 'av1', 'vcodec': 'AV01.0.08M.08', 'acodec': 'none', 'height': 480, 'url': TEST_URL},
+            {'format_id': 'unknown', 'vcodec': 'foo', 'acodec': 'none', 'height': 720, 'url': TEST_URL},
+        ]
+
+        def sorted_ids(ie, field_preference=()):
+            info_dict = _make_result(copy.deepcopy(formats))
+            ie._sort_formats(info_dict['formats'], field_preference)
+            return [f['format_id'] for f in info_dict['formats']]
+
+        ie = YoutubeIE(YDL({'format_sort': ['vcodec']}))
+        self.assertEqual(sorted_ids(ie), ['unknown', 'avc', 'vp9', 'vp9.2', 'av1'])
+        self.assertEqual(sorted_ids(ie, ('res',)), ['unknown', 'avc', 'vp9', 'vp9.2', 'av1'])
+        self.assertIs(ie._get_format_sort(), ie._get_format_sort(()))
+        self.assertIsNot(ie._get_format_sort(), ie._get_format_sort(('res',)))
+
+        ie = YoutubeIE(YDL({'format_sort': ['res:720', 'vcodec:vp9']}))
+        self.assertEqual(sorted_ids(ie), ['avc', 'av1', 'vp9.2', 'unknown', 'vp9'])
+        ie = YoutubeIE(YDL({'format_sort': ['res:720', '+vcodec']}))
+        self.assertEqual(sorted_ids(ie), ['avc', 'av1', 'vp9.2', 'vp9', 'unknown'])
+
     def test_audio_only_extractor_format_selection(self):
         # For extractors with incomplete formats (all formats are audio-only or
         # video-only) best and worst should fallback to corresponding best/worst
@@ -534,6 +565,25 @@ def test_format_filtering(self):
             pass
         self.assertEqual(ydl.downloaded_info_dicts, [])
 
+    def test_format_selector_cache(self):
+        ydl = YDL({'format': 'bv*+ba/b'})
+        self.assertIs(ydl.build_format_selector('bv*+ba/b'), ydl.format_selector)
+        self.assertIsNot(ydl.build_format_selector('b'), ydl.format_selector)
+
+        formats = [
+            {'format_id': 'A', 'url': TEST_URL, 'ext': 'mp4', 'vcodec': 'none', 'acodec': 'aac', 'height': None},
+            {'format_id': 'B', 'url': TEST_URL, 'ext': 'mp4', 'vcodec': 'avc1', 'acodec': 'none', 'height': 480},
+            {'format_id': 'C', 'url': TEST_URL, 'ext': 'mp4', 'vcodec': 'avc1', 'acodec': 'aac', 'height': 720},
+            {'format_id': 'D', 'url': TEST_URL, 'ext': 'mp4', 'vcodec': 'avc1', 'acodec': 'none', 'height': 1080},
+        ]
+        ctx = {'formats': formats, 'has_merged_format': True, 'incomplete_formats': False}
+        selector = ydl.build_format_selector('bv[height<=720]+ba/b[height<=720],b[height<=720]')
+        self.assertEqual([f['format_id'] for f in selector(ctx)], ['B+A', 'C'])
+        # The formats are filtered once for both selectors with the same filter
+        self.assertEqual(list(ctx['filtered_contexts']), [('height<=720', )])
+        self.assertEqual(
+            [f['format_id'] for f in ctx['filtered_contexts'][('height<=720', )]['formats']], ['B', 'C'])
+
     def test_default_format_spec(self):
         ydl = YDL({'simulate': True})
         self.assertEqual(ydl._default_format_spec({}), 'bestvideo*+bestaudio/best')
@@ -855,6 +905,58 @@ def gen():
         test('%(title3)s', ('foo/bar\\test', 'foo_bar_test'))
         test('folder/%(title3)s', ('folder/foo/bar\\test', 'folder%sfoo_bar_test' % os.path.sep))
 
+    def test_compiled_outtmpl(self):
+        tmpl = '%%%(height)s-%(width,height|x)05d-%(title)s%s'
+        self.assertIs(YoutubeDL._compile_outtmpl(tmpl), YoutubeDL._compile_outtmpl(tmpl))
+        self.assertEqual(YoutubeDL._compile_outtmpl(tmpl)[::2], ('', '-', '-', '%s'))
+
+        ydl = YoutubeDL()
+        self.assertEqual(ydl.evaluate_outtmpl(tmpl, {'height': 720, 'title': 'a'}), '%720-00720-a%s')
+        self.assertEqual(ydl.evaluate_outtmpl(tmpl, {'width': 1280}), '%NA-01280-NA%s')
+        self.assertEqual(ydl.evaluate_outtmpl(tmpl, {}), '%NA-x-NA%s')
+
+    def test_info_json(self):
+        info = {
+            'id': '1234', 'title': 'ü', 'epoch': 1, 'formats': [{'format_id': 'a', 'url': TEST_URL, 'vbr': None}],
+            'requested_formats': [], '__private': 1, 'tags': LazyList(iter(['a', 'b'])), 'entries': None,
+        }
+        ydl = YoutubeDL()
+        ydl._out_files.out = io.StringIO()
+        ydl._print_info_json(info)
+        self.assertEqual(ydl._out_files.out.getvalue(), json.dumps(ydl.sanitize_info(info)) + '\n')
+
+        # Documents written in several batches are not interleaved by concurrent writers
+        ydl._out_files.out = io.StringIO()
+        write_string = ydl._write_string
+
+        def slow_write_string(*args, **kwargs):
+            write_string(*args, **kwargs)
+            time.sleep(0.001)
+
+        ydl._write_string = slow_write_string
+        threads = [threading.Thread(target=ydl._print_info_json, args=({'id': str(i), 'data': [str(i) * 1000] * 200},))
+                   for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        lines = ydl._out_files.out.getvalue().splitlines()
+        self.assertEqual(sorted(json.loads(line)['id'] for line in lines), ['0', '1', '2', '3'])
+
+        # Nothing is printed if the document cannot be encoded, even after the first batch
+        ydl._out_files.out = io.StringIO()
+        self.assertRaises(
+            TypeError, ydl._print_info_json, {'id': 'x', 'data': ['x' * 1000] * 200, 'bad': {object(): 1}})
+        self.assertEqual(ydl._out_files.out.getvalue(), '')
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fn = os.path.join(tmpdir, 'test.info.json')
+            ydl._write_info_json_file(info, fn)
+            with open(fn, encoding='utf-8') as f:
+                written = json.load(f)
+            self.assertEqual(written, ydl.sanitize_info(info, True))
+            self.assertEqual(written['formats'], [{'format_id': 'a', 'url': TEST_URL}])
+
     def test_format_note(self):
         ydl = YoutubeDL()
         self.assertEqual(ydl._format_note({}), '')
@@ -1097,6 +1199,75 @@ def test_selection(params, expected_ids, evaluate_all=False):
         test_selection({'playlist_items': '-15::2'}, INDICES[1::2], True)
         test_selection({'playlist_items': '-15::15'}, [], True)
 
+    def test_concurrent_entries(self):
+        def playlist():
+            return {
+                '_type': 'playlist',
+                'id': 'test',
+                'extractor': 'test:playlist',
+                'extractor_key': 'test:playlist',
+                'webpage_url': 'http://example.com',
+                'entries': ({'id': str(i), 'title': str(i), 'url': TEST_URL, 'ext': 'mp4'} for i in range(1, 11)),
+            }
+
+        class _YDL(YDL):
+            def process_info(self, info_dict):
+                # Make later entries finish first
+                time.sleep(0.01 * (10 - int(info_dict['id'])))
+                super().process_info(info_dict)
+
+        for lazy in (False, True):
+            ydl = _YDL({'concurrent_entries': 4, 'lazy_playlist': lazy})
+            result = ydl.process_ie_result(playlist())
+            self.assertEqual([e['id'] for e in result['entries']], [str(i) for i in range(1, 11)])
+            self.assertEqual([e['playlist_index'] for e in result['entries']], list(range(1, 11)))
+            self.assertEqual(sorted(int(d['id']) for d in ydl.downloaded_info_dicts), list(range(1, 11)))
+
+        ydl = FakeYDL({'concurrent_entries': 4, 'max_downloads': 3, 'simulate': True})
+        self.assertRaises(MaxDownloadsReached, ydl.process_ie_result, playlist())
+        self.assertEqual(ydl._num_downloads, 3)
+
+        class _RejectingYDL(YDL):
+            def process_info(self, info_dict):
+                self.started.append(int(info_dict['id']))
+                if info_dict['id'] == '2':
+                    raise RejectedVideoReached
+                time.sleep(0.05)
+                super().process_info(info_dict)
+
+        # No entries are started once one of the workers breaks
+        ydl = _RejectingYDL({'concurrent_entries': 4})
+        ydl.started = []
+        self.assertRaises(RejectedVideoReached, ydl.process_ie_result, playlist())
+        self.assertLessEqual(max(ydl.started), 4)
+
+    def test_dump_json_stream(self):
+        def entries(ydl):
+            for i in range(1, 4):
+                # The playlist info and all previous entries must have been printed already
+                self.assertEqual(ydl._out_files.out.getvalue().count('\n'), i)
+                yield {'_type': 'url', 'id': str(i), 'url': f'http://example.com/{i}', 'ie_key': 'Generic'}
+
+        ydl = YoutubeDL({'dump_single_json': 'lines', 'extract_flat': 'in_playlist', 'quiet': True})
+        ydl._out_files.out = io.StringIO()
+        ydl._YoutubeDL__download_wrapper(ydl.process_ie_result)({
+            '_type': 'playlist',
+            'id': 'test',
+            'extractor': 'test:playlist',
+            'extractor_key': 'test:playlist',
+            'webpage_url': 'http://example.com',
+            'entries': entries(ydl),
+        })
+        lines = list(map(json.loads, ydl._out_files.out.getvalue().splitlines()))
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(lines[0]['_type'], 'playlist')
+        self.assertNotIn('entries', lines[0])
+        self.assertEqual([line['id'] for line in lines[1:4]], ['1', '2', '3'])
+        self.assertEqual(lines[4], {
+            '_type': 'playlist_end', 'id': 'test', 'playlist_count': 3, 'n_entries': 3, 'failures': 0,
+            'epoch': lines[4]['epoch'],
+        })
+
     def test_urlopen_no_file_protocol(self):
         # see https://github.com/ytdl-org/youtube-dl/issues/8227
         ydl = YDL()
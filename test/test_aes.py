@@ -9,13 +9,18 @@
 
 
 import base64
+import os
 
 from yt_dlp.aes import (
     BLOCK_SIZE_BYTES,
+    _aes_cbc_decrypt_native,
+    _aes_ctr_native,
+    _aes_gcm_decrypt_and_verify_native,
     aes_cbc_decrypt,
     aes_cbc_decrypt_bytes,
     aes_cbc_encrypt,
     aes_ctr_decrypt,
+    aes_ctr_decrypt_bytes,
     aes_ctr_encrypt,
     aes_decrypt,
     aes_decrypt_text,
@@ -65,6 +70,11 @@ def test_ctr_decrypt(self):
         decrypted = intlist_to_bytes(aes_ctr_decrypt(data, self.key, self.iv))
         self.assertEqual(decrypted.rstrip(b'\x08'), self.secret_msg)
 
+    def test_ctr_decrypt_bytes(self):
+        data = b'\x03\xc7\xdd\xd4\x8e\xb3\xbc\x1a*O\xdc1\x12+8Aio\xd1z\xb5#\xaf\x08'
+        decrypted = aes_ctr_decrypt_bytes(data, intlist_to_bytes(self.key), intlist_to_bytes(self.iv))
+        self.assertEqual(decrypted, self.secret_msg)
+
     def test_ctr_encrypt(self):
         data = bytes_to_intlist(self.secret_msg)
         encrypted = intlist_to_bytes(aes_ctr_encrypt(data, self.key, self.iv))
@@ -84,6 +94,32 @@ def test_gcm_decrypt(self):
                 data, intlist_to_bytes(self.key), authentication_tag, intlist_to_bytes(self.iv[:12]))
             self.assertEqual(decrypted.rstrip(b'\x08'), self.secret_msg)
 
+    def test_native(self):
+        for key_size in (16, 24, 32):
+            for size in (0, 1, 16, 17, 100):
+                key, iv, data = os.urandom(key_size), os.urandom(BLOCK_SIZE_BYTES), os.urandom(size)
+                int_key, int_iv, int_data = map(bytes_to_intlist, (key, iv, data))
+                self.assertEqual(
+                    _aes_cbc_decrypt_native(data, key, iv),
+                    intlist_to_bytes(aes_cbc_decrypt(int_data, int_key, int_iv)))
+                self.assertEqual(
+                    _aes_ctr_native(data, key, iv),
+                    intlist_to_bytes(aes_ctr_decrypt(int_data, int_key, int_iv)))
+        # The counter wraps around
+        self.assertEqual(
+            _aes_ctr_native(bytes(32), intlist_to_bytes(self.key), b'\xff' * 16),
+            intlist_to_bytes(aes_ctr_encrypt([0] * 32, self.key, [0xff] * 16)))
+
+    def test_gcm_decrypt_native(self):
+        data = b'\x159Y\xcf5eud\x90\x9c\x85&]\x14\x1d\x0f.\x08\xb4T\xe4/\x17\xbd'
+        authentication_tag = b'\xe8&I\x80rI\x07\x9d}YWuU@:e'
+        key, nonce = intlist_to_bytes(self.key), intlist_to_bytes(self.iv[:12])
+
+        decrypted = _aes_gcm_decrypt_and_verify_native(data, key, authentication_tag, nonce)
+        self.assertEqual(decrypted.rstrip(b'\x08'), self.secret_msg)
+        self.assertRaises(
+            ValueError, _aes_gcm_decrypt_and_verify_native, data, key, authentication_tag[::-1], nonce)
+
     def test_decrypt_text(self):
         password = intlist_to_bytes(self.key).decode()
         encrypted = base64.b64encode(
@@ -10,7 +10,7 @@
 
 import collections
 
-from test.helper import gettestcases
+from test.helper import FakeYDL, gettestcases
 from yt_dlp.extractor import FacebookIE, YoutubeIE, gen_extractors
 
 
@@ -82,6 +82,15 @@ def test_no_duplicates(self):
                         ie.suitable(url),
                         f'{type(ie).__name__} should not match URL {url!r} . That URL belongs to {tc["name"]}.')
 
+    def test_host_index(self):
+        ydl = FakeYDL()
+        ydl.add_default_info_extractors()
+        ydl._ies_lookups = 1  # Force the index to be built
+        for tc in gettestcases(include_onlymatching=True):
+            url = tc['url']
+            self.assertIn(tc['name'], [ie_key for ie_key, _ in ydl._candidate_ies(url)],
+                          f'{tc["name"]}IE should be a candidate for URL {url!r}')
+
     def test_keywords(self):
         self.assertMatch(':ytsubs', ['youtube:subscriptions'])
         self.assertMatch(':ytsubscriptions', ['youtube:subscriptions'])
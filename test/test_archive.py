@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+# Allow direct execution
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import shutil
+import tempfile
+
+from test.helper import FakeYDL
+from yt_dlp.archive import DownloadArchive, SQLiteDownloadArchive, TextDownloadArchive
+from yt_dlp.dependencies import sqlite3
+
+
+class TestDownloadArchive(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _path(self, name):
+        return os.path.join(self.tmpdir, name)
+
+    def _test_archive(self, fn, batch_size=1):
+        archive = DownloadArchive.open(fn, batch_size)
+        self.assertNotIn('youtube a', archive)
+        archive.add('youtube a')
+        archive.add('youtube b')
+        self.assertIn('youtube a', archive)
+        self.assertIn('youtube b', archive)
+        archive.close()
+
+        archive = DownloadArchive.open(fn, batch_size)
+        self.assertIn('youtube a', archive)
+        self.assertNotIn('youtube c', archive)
+        self.assertEqual(list(archive), ['youtube a', 'youtube b'])
+        archive.close()
+
+    def test_text(self):
+        fn = self._path('archive.txt')
+        self.assertIsInstance(DownloadArchive.open(fn), TextDownloadArchive)
+        self._test_archive(fn)
+        with open(fn, encoding='utf-8') as f:
+            self.assertEqual(f.read(), 'youtube a\nyoutube b\n')
+
+    def test_text_batched(self):
+        fn = self._path('archive.txt')
+        archive = DownloadArchive.open(fn, batch_size=2)
+        archive.add('youtube a')
+        self.assertFalse(os.path.exists(fn))
+        archive.add('youtube b')
+        archive.add('youtube c')
+        with open(fn, encoding='utf-8') as f:
+            self.assertEqual(f.read(), 'youtube a\nyoutube b\n')
+        archive.close()
+        with open(fn, encoding='utf-8') as f:
+            self.assertEqual(f.read(), 'youtube a\nyoutube b\nyoutube c\n')
+
+    @unittest.skipUnless(sqlite3, 'sqlite3 is not available')
+    def test_sqlite(self):
+        fn = self._path('archive.sqlite')
+        archive = DownloadArchive.open(fn)
+        self.assertIsInstance(archive, SQLiteDownloadArchive)
+        archive.close()
+        self._test_archive(fn)
+        self._test_archive(self._path('batched.sqlite'), batch_size=10)
+
+    @unittest.skipUnless(sqlite3, 'sqlite3 is not available')
+    def test_sqlite_shared(self):
+        fn = self._path('archive.db')
+        first, second = DownloadArchive.open(fn), DownloadArchive.open(fn)
+        first.add('youtube a')
+        self.assertIn('youtube a', second)
+        first.close()
+        second.close()
+
+    @unittest.skipUnless(sqlite3, 'sqlite3 is not available')
+    def test_import_export(self):
+        text_fn, db_fn, export_fn = map(self._path, ('archive.txt', 'archive.sqlite3', 'export.txt'))
+        with open(text_fn, 'w', encoding='utf-8') as f:
+            f.write('youtube b\n\nyoutube a\nyoutube b\n')
+        archive = DownloadArchive.open(db_fn)
+        archive.import_text(text_fn)
+        self.assertIn('youtube a', archive)
+        archive.export_text(export_fn)
+        archive.close()
+        with open(export_fn, encoding='utf-8') as f:
+            self.assertEqual(f.read(), 'youtube a\nyoutube b\n')
+
+    def test_ydl(self):
+        fn = self._path('archive.txt')
+        info = {'id': 'a', 'extractor_key': 'Youtube'}
+        with FakeYDL({'download_archive': fn, 'download_archive_batch_size': 5}) as ydl:
+            self.assertFalse(ydl.in_download_archive(info))
+            ydl.record_download_archive(info)
+            self.assertTrue(ydl.in_download_archive(info))
+        with open(fn, encoding='utf-8') as f:
+            self.assertEqual(f.read(), 'youtube a\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
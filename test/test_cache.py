@@ -9,9 +9,12 @@
 
 
 import shutil
+import time
+import unittest.mock
 
 from test.helper import FakeYDL
 from yt_dlp.cache import Cache
+from yt_dlp.dependencies import sqlite3
 
 
 def _is_empty(d):
@@ -52,6 +55,53 @@ def test_cache(self):
         self.assertFalse(os.path.exists(self.test_dir))
         self.assertEqual(c.load('test_cache', 'k.'), None)
 
+    def _test_backend(self, backend):
+        ydl = FakeYDL({
+            'cachedir': self.test_dir,
+            'cache_backend': backend,
+            'cache_limits': {
+                'test_ttl': {'ttl': 60},
+                'test_max': {'max_entries': 2},
+            },
+        })
+        c = Cache(ydl)
+        obj = {'x': 1, 'y': ['ä', '\\a', True]}
+        c.store('test_cache', 'k.', obj)
+        self.assertEqual(c.load('test_cache', 'k.'), obj)
+        # Loaded data can be modified without affecting the cache
+        c.load('test_cache', 'k.')['x'] = 2
+        self.assertEqual(c.load('test_cache', 'k.'), obj)
+        # Entries are shared with other instances using the same cachedir
+        self.assertEqual(Cache(ydl).load('test_cache', 'k.'), obj)
+
+        c.store('test_ttl', 'k', obj)
+        self.assertEqual(c.load('test_ttl', 'k'), obj)
+        with unittest.mock.patch('time.time', return_value=time.time() + 120):
+            self.assertEqual(c.load('test_ttl', 'k'), None)
+
+        for i in range(4):
+            c.store('test_max', f'k{i}', i)
+            time.sleep(0.01)
+        c.close()
+        self.assertEqual([c.load('test_max', f'k{i}') for i in range(4)], [None, None, 2, 3])
+
+        c.delete('test_max', 'k3')
+        self.assertEqual(c.load('test_max', 'k3'), None)
+        self.assertEqual(c.load('test_max', 'k2'), 2)
+        c.delete('test_max')
+        self.assertEqual(c.load('test_max', 'k2'), None)
+        self.assertEqual(c.load('test_cache', 'k.'), obj)
+
+        c.remove()
+        self.assertFalse(os.path.exists(self.test_dir))
+
+    def test_file_backend(self):
+        self._test_backend('file')
+
+    @unittest.skipUnless(sqlite3, 'sqlite3 is not available')
+    def test_sqlite_backend(self):
+        self._test_backend('sqlite')
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+
+# Allow direct execution
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import base64
+import http.server
+import json
+import re
+import shutil
+import tempfile
+import threading
+import time
+import unittest.mock
+
+from test.helper import http_server_port
+from yt_dlp import YoutubeDL
+from yt_dlp.downloader.f4m import F4mFD
+from yt_dlp.downloader.fragment import FragmentFD
+from yt_dlp.downloader.http import HttpFD
+from yt_dlp.downloader.ism import IsmFD, box, full_box, u32
+
+FRAGMENT_COUNT = 12
+
+
+def fragment_content(index):
+    return bytes([index]) * (1000 + 97 * index)
+
+
+def fragment_offset(index):
+    return sum(map(len, map(fragment_content, range(1, index))))
+
+
+FILE_CONTENT = b''.join(map(fragment_content, range(1, FRAGMENT_COUNT + 1)))
+
+
+def ism_fragment_content(index):
+    return box(b'moof', box(b'traf', full_box(b'tfhd', 0, 0, u32.pack(7)))) + box(b'mdat', fragment_content(index))
+
+
+def f4m_fragment_content(index):
+    return box(b'afra', bytes(9)) + box(b'mdat', fragment_content(index))
+
+
+F4M_BOOTSTRAP = full_box(b'abst', 0, 0, b''.join((
+    bytes(4 + 1 + 4 + 8 + 8),  # BootstrapinfoVersion, flags, TimeScale, CurrentMediaTime, SmpteTimeCodeOffset
+    b'\x00',  # MovieIdentifier
+    bytes(4),  # ServerEntryCount, QualityEntryCount, DrmData, MetaData
+    b'\x01', full_box(b'asrt', 0, 0, b'\x00' + u32.pack(1) + u32.pack(1) + u32.pack(FRAGMENT_COUNT)),
+    b'\x01', full_box(b'afrt', 0, 0, u32.pack(1000) + b'\x00' + u32.pack(1) + u32.pack(1) + bytes(8) + u32.pack(2000)),
+)))
+F4M_MANIFEST = (
+    '<manifest xmlns="http://ns.adobe.com/f4m/1.0"><media url="media" bitrate="1"/>'
+    '<bootstrapInfo>%s</bootstrapInfo></manifest>' % base64.b64encode(F4M_BOOTSTRAP).decode()).encode()
+
+
+class HTTPTestRequestHandler(http.server.BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.headers.get('Range')))
+        if self.path == '/f4m/manifest.f4m':
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(F4M_MANIFEST)
+            return
+        mobj = re.match(r'^/(frag|ism|f4m)/(?:mediaSeg1-Frag)?(\d+)$', self.path)
+        if mobj:
+            index = int(mobj.group(2))
+            content = {
+                'frag': fragment_content,
+                'ism': ism_fragment_content,
+                'f4m': f4m_fragment_content,
+            }[mobj.group(1)](index)
+        else:
+            assert self.path == '/file'
+            start, end = map(int, re.match(r'^bytes=(\d+)-(\d+)$', self.headers['Range']).groups())
+            index = next(i for i in range(1, FRAGMENT_COUNT + 1) if fragment_offset(i) == start)
+            content = FILE_CONTENT[start:end + 1]
+        if index in self.server.missing_fragments:
+            self.send_response(404)
+            self.end_headers()
+            return
+        if index == 1:
+            # Make the first fragment the slowest one
+            time.sleep(0.2)
+        self.send_response(206 if self.headers.get('Range') else 200)
+        self.send_header('Content-Type', 'video/mp2t')
+        self.send_header('Content-Length', len(content))
+        if self.headers.get('Range'):
+            self.send_header('Content-Range', 'bytes %d-%d/%d' % (start, end, len(FILE_CONTENT)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class FakeLogger:
+    def debug(self, msg):
+        pass
+
+    def warning(self, msg):
+        pass
+
+    def error(self, msg):
+        pass
+
+
+class SimpleFragmentFD(FragmentFD):
+    FD_NAME = 'test'
+
+    def real_download(self, filename, info_dict):
+        ctx = {
+            'filename': filename,
+            'total_frags': len(info_dict['fragments']),
+        }
+        self._prepare_and_start_frag_download(ctx, info_dict)
+        fragments = [{
+            'frag_index': frag_index,
+            'url': fragment['url'],
+            'byte_range': fragment.get('byte_range'),
+        } for frag_index, fragment in enumerate(info_dict['fragments'], 1)]
+        return self.download_and_append_fragments(ctx, fragments, info_dict)
+
+
+class FixupFragmentFD(SimpleFragmentFD):
+    def _fixup_fragment(self, ctx, frag_bytes):
+        self.fixup_threads.add(threading.current_thread())
+        # Make the first fragments the slowest ones to process
+        time.sleep(0.01 * (FRAGMENT_COUNT - frag_bytes[0]))
+        return frag_bytes[:-1]
+
+
+class TestFragmentFD(unittest.TestCase):
+    def setUp(self):
+        self.httpd = http.server.ThreadingHTTPServer(
+            ('127.0.0.1', 0), HTTPTestRequestHandler)
+        self.httpd.requests = []
+        self.httpd.missing_fragments = set()
+        self.port = http_server_port(self.httpd)
+        self.server_thread = threading.Thread(target=self.httpd.serve_forever)
+        self.server_thread.daemon = True
+        self.server_thread.start()
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def download(self, params, byte_range=False, expected=FILE_CONTENT):
+        params['logger'] = FakeLogger()
+        ydl = YoutubeDL(params)
+        downloader = SimpleFragmentFD(ydl, params)
+        if byte_range:
+            fragments = [{
+                'url': 'http://127.0.0.1:%d/file' % self.port,
+                'byte_range': {
+                    'start': fragment_offset(i),
+                    'end': fragment_offset(i + 1),
+                },
+            } for i in range(1, FRAGMENT_COUNT + 1)]
+        else:
+            fragments = [
+                {'url': 'http://127.0.0.1:%d/frag/%d' % (self.port, i)}
+                for i in range(1, FRAGMENT_COUNT + 1)]
+        self.assertTrue(downloader.real_download(self.filename, {'fragments': fragments}))
+        with open(self.filename, 'rb') as f:
+            self.assertEqual(f.read(), expected)
+        return sorted(os.listdir(self.tmpdir))
+
+    @property
+    def filename(self):
+        return os.path.join(self.tmpdir, 'testfile.ts')
+
+    def test_fragment_sink(self):
+        # Fragments never look for the parts map of a download over several connections
+        with unittest.mock.patch.object(HttpFD, '_discard_part_map') as discard_part_map:
+            self.assertEqual(self.download({}), ['testfile.ts'])
+        discard_part_map.assert_not_called()
+
+    def test_fragment_sink_concurrent(self):
+        self.assertEqual(self.download({'concurrent_fragment_downloads': 4}), ['testfile.ts'])
+
+    def test_fragment_sink_spill(self):
+        SimpleFragmentFD._FRAGMENT_BUFFER_SIZE = 1024
+        try:
+            self.assertEqual(self.download({'concurrent_fragment_downloads': 4}), ['testfile.ts'])
+        finally:
+            del SimpleFragmentFD._FRAGMENT_BUFFER_SIZE
+
+    def test_fixup_pipelined(self):
+        params = {'concurrent_fragment_downloads': 4, 'logger': FakeLogger()}
+        downloader = FixupFragmentFD(YoutubeDL(params), params)
+        downloader.fixup_threads = set()
+        fragments = [
+            {'url': 'http://127.0.0.1:%d/frag/%d' % (self.port, i)} for i in range(1, FRAGMENT_COUNT + 1)]
+        self.assertTrue(downloader.real_download(self.filename, {'fragments': fragments}))
+        with open(self.filename, 'rb') as f:
+            self.assertEqual(f.read(), b''.join(fragment_content(i)[:-1] for i in range(1, FRAGMENT_COUNT + 1)))
+        self.assertNotIn(threading.current_thread(), downloader.fixup_threads)
+        self.assertGreater(len(downloader.fixup_threads), 1)
+
+    def test_ism(self):
+        params = {'concurrent_fragment_downloads': 4, 'logger': FakeLogger()}
+        downloader = IsmFD(YoutubeDL(params), params)
+        download_params = {'fourcc': 'TTML', 'stream_type': 'text', 'duration': 10000000}
+        self.assertTrue(downloader.real_download(self.filename, {
+            'fragments': [
+                {'url': 'http://127.0.0.1:%d/ism/%d' % (self.port, i)} for i in range(1, FRAGMENT_COUNT + 1)],
+            '_download_params': download_params,
+        }))
+        self.assertEqual(download_params['track_id'], 7)
+        content = b''.join(map(ism_fragment_content, range(1, FRAGMENT_COUNT + 1)))
+        with open(self.filename, 'rb') as f:
+            data = f.read()
+        self.assertEqual(data[4:8], b'ftyp')
+        self.assertIn(b'moov', data[:-len(content)])
+        self.assertEqual(data[-len(content):], content)
+
+    def test_f4m(self):
+        params = {'concurrent_fragment_downloads': 4, 'logger': FakeLogger()}
+        downloader = F4mFD(YoutubeDL(params), params)
+        self.assertTrue(downloader.real_download(self.filename, {
+            'url': 'http://127.0.0.1:%d/f4m/manifest.f4m' % self.port,
+        }))
+        with open(self.filename, 'rb') as f:
+            data = f.read()
+        self.assertEqual(data[:4], b'FLV\x01')
+        self.assertEqual(data[13:], FILE_CONTENT)
+
+    def test_keep_fragments(self):
+        files = self.download({'keep_fragments': True})
+        self.assertEqual(len(files), FRAGMENT_COUNT + 1)
+        self.assertIn('testfile.ts.part-Frag1', files)
+
+    def test_out_of_order(self):
+        self.assertEqual(self.download({'concurrent_fragment_downloads': 4}, byte_range=True), ['testfile.ts'])
+
+    def test_out_of_order_skip(self):
+        self.httpd.missing_fragments.add(3)
+        self.download(
+            {'concurrent_fragment_downloads': 4}, byte_range=True,
+            expected=b''.join(fragment_content(i) for i in range(1, FRAGMENT_COUNT + 1) if i != 3))
+
+    def test_out_of_order_resume(self):
+        completed = (2, 3, 7)
+        with open(self.filename + '.part', 'wb') as f:
+            f.truncate(len(FILE_CONTENT))
+            for i in completed:
+                f.seek(fragment_offset(i))
+                f.write(fragment_content(i))
+        bitmap = bytearray(2)
+        for i in completed:
+            bitmap[(i - 1) // 8] |= 1 << ((i - 1) % 8)
+        with open(self.filename + '.ytdl', 'w') as f:
+            json.dump({'downloader': {
+                'current_fragment': {'index': 0},
+                'fragment_bitmap': bitmap.hex(),
+            }}, f)
+
+        self.assertEqual(self.download({}, byte_range=True), ['testfile.ts'])
+        requested = {r for _, r in self.httpd.requests}
+        self.assertEqual(len(requested), FRAGMENT_COUNT - len(completed))
+        for i in completed:
+            self.assertNotIn('bytes=%d-%d' % (fragment_offset(i), fragment_offset(i + 1) - 1), requested)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,6 +9,7 @@
 
 
 import http.server
+import json
 import re
 import threading
 
@@ -21,6 +22,8 @@
 
 
 TEST_SIZE = 10 * 1024
+PARTS_SIZE = 100 * 1024
+PARTS_CONTENT = bytes(i % 251 for i in range(PARTS_SIZE))
 
 
 class HTTPTestRequestHandler(http.server.BaseHTTPRequestHandler):
@@ -54,8 +57,21 @@ def serve(self, range=True, content_length=True):
         self.end_headers()
         self.wfile.write(b'#' * size)
 
+    def serve_parts(self):
+        start, end = map(int, re.match(r'^bytes=(\d+)-(\d+)$', self.headers['Range']).groups())
+        end = min(end, PARTS_SIZE - 1)
+        self.server.ranges.append((start, end))
+        self.send_response(206)
+        self.send_header('Content-Type', 'video/mp4')
+        self.send_header('Content-Range', 'bytes %d-%d/%d' % (start, end, PARTS_SIZE))
+        self.send_header('Content-Length', end - start + 1)
+        self.end_headers()
+        self.wfile.write(PARTS_CONTENT[start:end + 1])
+
     def do_GET(self):
-        if self.path == '/regular':
+        if self.path == '/parts':
+            self.serve_parts()
+        elif self.path == '/regular':
             self.serve()
         elif self.path == '/no-content-length':
             self.serve(content_length=False)
@@ -111,6 +127,76 @@ def test_chunked(self):
             'http_chunk_size': 1000,
         })
 
+    def test_connections_unsupported(self):
+        self.download_all({
+            'http_connections': 4,
+        })
+
+
+class PartsHttpFD(HttpFD):
+    _MIN_PART_SIZE = 4 * 1024
+
+
+class TestHttpFDParts(unittest.TestCase):
+    def setUp(self):
+        self.httpd = http.server.ThreadingHTTPServer(
+            ('127.0.0.1', 0), HTTPTestRequestHandler)
+        self.httpd.ranges = []
+        self.port = http_server_port(self.httpd)
+        self.server_thread = threading.Thread(target=self.httpd.serve_forever)
+        self.server_thread.daemon = True
+        self.server_thread.start()
+        self.filename = 'testfile.mp4'
+        for fn in (self.filename, self.filename + '.part', self.filename + '.ytdl'):
+            try_rm(encodeFilename(fn))
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        for fn in (self.filename, self.filename + '.part', self.filename + '.ytdl'):
+            try_rm(encodeFilename(fn))
+
+    def download(self, params):
+        params['logger'] = FakeLogger()
+        downloader = PartsHttpFD(YoutubeDL(params), params)
+        self.assertTrue(downloader.real_download(self.filename, {
+            'url': 'http://127.0.0.1:%d/parts' % self.port,
+        }))
+        with open(self.filename, 'rb') as f:
+            self.assertEqual(f.read(), PARTS_CONTENT)
+        self.assertFalse(os.path.exists(self.filename + '.ytdl'))
+
+    def test_parts(self):
+        self.download({'http_connections': 4})
+        # Probe plus at least one request per connection
+        self.assertGreaterEqual(len(self.httpd.ranges), 5)
+
+    def test_parts_chunked(self):
+        self.download({'http_connections': 3, 'http_chunk_size': 10000})
+        self.assertTrue(all(end - start < 10000 for start, end in self.httpd.ranges))
+
+    def write_interrupted_download(self, remaining, content=PARTS_CONTENT):
+        with open(self.filename + '.part', 'wb') as f:
+            f.truncate(PARTS_SIZE)
+            for start, end in ((0, 20000), (50000, 70000)):
+                f.seek(start)
+                f.write(content[start:end])
+        with open(self.filename + '.ytdl', 'w') as f:
+            json.dump({'downloader': {'filesize': PARTS_SIZE, 'http_parts': remaining}}, f)
+
+    def test_parts_resume(self):
+        remaining = [[20000, 50000], [70000, PARTS_SIZE]]
+        self.write_interrupted_download(remaining)
+        self.download({'http_connections': 2})
+        for start, end in self.httpd.ranges[1:]:
+            self.assertTrue(any(s <= start and end < e for s, e in remaining), (start, end))
+
+    def test_parts_no_continue(self):
+        # The downloaded parts are not reused, so their wrong content does not end up in the file
+        self.write_interrupted_download([[20000, 50000], [70000, PARTS_SIZE]], bytes(PARTS_SIZE))
+        self.download({'http_connections': 2, 'continuedl': False})
+        self.assertIn(0, [start for start, _ in self.httpd.ranges[1:]])
+
 
 if __name__ == '__main__':
     unittest.main()
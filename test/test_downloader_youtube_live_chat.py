@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+# Allow direct execution
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import json
+import shutil
+import tempfile
+
+from yt_dlp import YoutubeDL
+from yt_dlp.downloader.youtube_live_chat import YoutubeLiveChatFD
+
+PAGE_COUNT = 5
+WATCH_URL = 'https://www.youtube.com/watch?v=testvideo'
+
+
+def html_page(data):
+    ytcfg = {
+        'INNERTUBE_API_KEY': 'key',
+        'INNERTUBE_CONTEXT': {'client': {'clientName': 'WEB', 'clientVersion': '1.0', 'visitorData': 'visitor'}},
+    }
+    return (f'<html><script>ytcfg.set({json.dumps(ytcfg)});'
+            f'var ytInitialData = {json.dumps(data)};</script></html>').encode()
+
+
+def replay_action(page, i):
+    return {'replayChatItemAction': {
+        'actions': [{'addChatItemAction': {'item': {'text': f'{page}-{i}'}}}],
+        'videoOffsetTimeMsec': str(page * 1000 + i),
+    }}
+
+
+def response(url, request_data):
+    if url == WATCH_URL:
+        return html_page({'contents': {'twoColumnWatchNextResults': {'conversationBar': {'liveChatRenderer': {
+            'continuations': [{'reloadContinuationData': {'continuation': 'c0'}}]}}}}})
+    if request_data is None:
+        # The chat page, which points to the unfiltered replay
+        return html_page({'continuationContents': {'liveChatContinuation': {'header': {'liveChatHeaderRenderer': {
+            'viewSelector': {'sortFilterSubMenuRenderer': {'subMenuItems': [{}, {
+                'continuation': {'reloadContinuationData': {'continuation': 'c1'}}}]}}}}}}})
+    page = int(json.loads(request_data)['continuation'][1:])
+    continuation = {'continuations': [{'liveChatReplayContinuationData': {
+        'continuation': f'c{page + 1}'}}]} if page < PAGE_COUNT else {}
+    return json.dumps({'continuationContents': {'liveChatContinuation': {
+        'actions': [replay_action(page, i) for i in range(3)], **continuation}}}).encode()
+
+
+class FakeLiveChatFD(YoutubeLiveChatFD):
+    _REPLAY_SYNC_INTERVAL = 0
+
+    def __init__(self, ydl, params, tmpdir, failing_page=None):
+        super().__init__(ydl, params)
+        self.tmpdir = tmpdir
+        self.failing_page = failing_page
+        self.fragment_files = []
+
+    def _download_fragment(self, ctx, frag_url, info_dict, headers=None, request_data=None):
+        if request_data and json.loads(request_data)['continuation'] == f'c{self.failing_page}':
+            return False
+        fragment_filename = os.path.join(self.tmpdir, f'Frag{len(self.fragment_files)}')
+        with open(fragment_filename, 'wb') as f:
+            f.write(response(frag_url, request_data))
+        self.fragment_files.append(fragment_filename)
+        ctx['fragment_filename_sanitized'] = fragment_filename
+        return True
+
+
+class TestYoutubeLiveChatFD(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'testvideo.live_chat.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def download(self, failing_page=None):
+        params = {'quiet': True, 'noprogress': True}
+        downloader = FakeLiveChatFD(YoutubeDL(params), params, self.tmpdir, failing_page)
+        return downloader, downloader.real_download(self.filename, {
+            'video_id': 'testvideo',
+            'url': WATCH_URL,
+            'protocol': 'youtube_live_chat_replay',
+        })
+
+    def test_replay(self):
+        downloader, success = self.download()
+        self.assertTrue(success)
+        with open(self.filename, encoding='utf-8') as f:
+            actions = [json.loads(line) for line in f]
+        self.assertEqual(actions, [replay_action(page, i) for page in range(1, PAGE_COUNT + 1) for i in range(3)])
+        # The fragments are removed once written
+        self.assertEqual(len(downloader.fragment_files), PAGE_COUNT + 2)
+        self.assertFalse(any(map(os.path.exists, downloader.fragment_files)))
+
+    def test_failed_continuation(self):
+        downloader, success = self.download(failing_page=3)
+        self.assertFalse(success)
+        with open(self.filename + '.part', encoding='utf-8') as f:
+            actions = [json.loads(line) for line in f]
+        self.assertEqual(actions, [replay_action(page, i) for page in range(1, 3) for i in range(3)])
+
+
+if __name__ == '__main__':
+    unittest.main()
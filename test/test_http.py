@@ -43,6 +43,29 @@ def do_GET(self):
             assert False
 
 
+class KeepAliveRequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.connections.add(self.client_address)
+        content = b'keep-alive'
+        self.send_response(200)
+        if self.path == '/chunked':
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            self.wfile.write(b'%x\r\n%s\r\n0\r\n\r\n' % (len(content), content))
+        else:
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+        if self.path == '/drop':
+            # Close the connection without telling the client
+            self.close_connection = True
+
+
 class FakeLogger:
     def debug(self, msg):
         pass
@@ -88,6 +111,39 @@ def test_nocheckcertificate(self):
         self.assertEqual(r['entries'][0]['url'], 'https://127.0.0.1:%d/vid.mp4' % self.port)
 
 
+class TestKeepAlive(unittest.TestCase):
+    def setUp(self):
+        self.httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveRequestHandler)
+        self.httpd.connections = set()
+        self.port = http_server_port(self.httpd)
+        self.server_thread = threading.Thread(target=self.httpd.serve_forever)
+        self.server_thread.daemon = True
+        self.server_thread.start()
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _fetch(self, ydl, *paths):
+        for path in paths:
+            self.assertEqual(ydl.urlopen('http://127.0.0.1:%d%s' % (self.port, path)).read(), b'keep-alive')
+
+    def test_reuse(self):
+        with YoutubeDL({'logger': FakeLogger()}) as ydl:
+            self._fetch(ydl, '/a', '/b', '/chunked', '/c')
+        self.assertEqual(len(self.httpd.connections), 1)
+
+    def test_no_reuse(self):
+        with YoutubeDL({'logger': FakeLogger(), 'http_pool_size': 0}) as ydl:
+            self._fetch(ydl, '/a', '/b', '/c')
+        self.assertEqual(len(self.httpd.connections), 3)
+
+    def test_stale_connection(self):
+        with YoutubeDL({'logger': FakeLogger()}) as ydl:
+            self._fetch(ydl, '/drop', '/a', '/b')
+        self.assertEqual(len(self.httpd.connections), 2)
+
+
 class TestClientCert(unittest.TestCase):
     def setUp(self):
         certfn = os.path.join(TEST_DIR, 'testcert.pem')
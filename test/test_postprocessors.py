@@ -8,15 +8,27 @@
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 
+import json
+import tempfile
+import unittest.mock
+
 from yt_dlp import YoutubeDL
 from yt_dlp.compat import compat_shlex_quote
 from yt_dlp.postprocessor import (
     ExecPP,
+    FFmpegCopyStreamPP,
+    FFmpegFixupM4aPP,
+    FFmpegFixupStretchedPP,
+    FFmpegMetadataPP,
+    FFmpegPostProcessor,
     FFmpegThumbnailsConvertorPP,
     MetadataFromFieldPP,
     MetadataParserPP,
     ModifyChaptersPP,
+    PostProcessor,
 )
+from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessorError
+from yt_dlp.utils import Popen
 
 
 class TestMetadataFromField(unittest.TestCase):
@@ -60,6 +72,128 @@ def test_escaping(self):
             os.remove(file.format(out))
 
 
+class TestFFmpegProbeCache(unittest.TestCase):
+    def test_probe_cache(self):
+        pp = FFmpegPostProcessor(YoutubeDL())
+        pp.basename, pp.probe_basename, pp._version = 'ffmpeg', 'ffprobe', '5.1'
+        pp._paths = {'ffmpeg': 'ffmpeg', 'ffprobe': 'ffprobe'}
+        output = json.dumps({
+            'format': {'duration': '10.5'},
+            'streams': [{'codec_type': 'video', 'codec_name': 'h264'}, {'codec_type': 'audio', 'codec_name': 'aac'}],
+        })
+
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                unittest.mock.patch.object(Popen, 'run', return_value=(output, '', 0)) as run:
+            path = os.path.join(tmpdir, 'video.mp4')
+            with open(path, 'wb') as f:
+                f.write(b'\x00')
+
+            self.assertEqual(pp.get_audio_codec(path), 'aac')
+            self.assertEqual(pp._get_real_video_duration(path), 10.5)
+            self.assertEqual(pp.get_stream_number(path, ('codec_type', ), 'audio'), (1, 2))
+            self.assertEqual(run.call_count, 1)
+
+            # Rewriting the file changes its size or modification time
+            with open(path, 'ab') as f:
+                f.write(b'\x00')
+            self.assertEqual(pp.get_audio_codec(path), 'aac')
+            self.assertEqual(run.call_count, 2)
+
+            # Running ffmpeg on the file invalidates it even if neither changes
+            pp.run_ffmpeg(path, os.path.join(tmpdir, 'out.mp4'), [])
+            self.assertEqual(run.call_count, 3)
+            self.assertEqual(pp.get_audio_codec(path), 'aac')
+            self.assertEqual(run.call_count, 4)
+
+            # Only the most recently probed files are kept
+            paths = [os.path.join(tmpdir, f'{i}.mp4') for i in range(3)]
+            for other in paths:
+                with open(other, 'wb') as f:
+                    f.write(b'\x00')
+            with unittest.mock.patch.object(FFmpegPostProcessor, '_PROBE_CACHE_SIZE', 2):
+                for other in paths:
+                    pp.get_audio_codec(other)
+                self.assertEqual(run.call_count, 7)
+                self.assertEqual(list(pp._downloader._probe_cache), [os.path.abspath(p) for p in paths[1:]])
+                pp.get_audio_codec(paths[-1])
+                self.assertEqual(run.call_count, 7)
+
+
+class TestFFmpegFusedFixups(unittest.TestCase):
+    def run_pps(self, *pps, params=None, side_effect=None, **info):
+        ydl = YoutubeDL(params)
+        for pp in pps:
+            ydl.add_post_processor(pp(ydl))
+        with unittest.mock.patch.object(
+                FFmpegPostProcessor, 'run_ffmpeg_multiple_files', side_effect=side_effect) as run_ffmpeg, \
+                unittest.mock.patch('os.replace'):
+            info = ydl.run_all_pps('post_process', {
+                'filepath': 'video.mp4', 'ext': 'mp4', 'vcodec': 'h264', 'acodec': 'aac', **info})
+        self.assertNotIn('__ffmpeg_fixups', info)
+        self.assertNotIn('__ffmpeg_fuse_next', info)
+        return [call.args for call in run_ffmpeg.call_args_list]
+
+    def test_fused_fixups(self):
+        copy_opts = list(FFmpegPostProcessor.stream_copy_opts())
+        self.assertEqual(self.run_pps(FFmpegFixupStretchedPP, FFmpegCopyStreamPP, stretched_ratio=2), [
+            (['video.mp4'], 'video.temp.mp4', [*copy_opts, '-aspect', '2.000000'])])
+        self.assertEqual(self.run_pps(FFmpegFixupStretchedPP, FFmpegMetadataPP, stretched_ratio=2, title='a'), [
+            (('video.mp4', None), 'video.temp.mp4', [
+                *copy_opts, '-write_id3v1', '1', '-metadata', 'title=a', '-aspect', '2.000000'])])
+
+        # Nothing takes the fixups before a postprocessor that cannot be fused
+        class NoopPP(PostProcessor):
+            def run(self, info):
+                return [], info
+
+        self.assertEqual(self.run_pps(FFmpegFixupStretchedPP, FFmpegCopyStreamPP, NoopPP, stretched_ratio=2), [
+            (['video.mp4'], 'video.temp.mp4', [*copy_opts, '-aspect', '2.000000'])])
+
+    def test_failed_fused_pass(self):
+        def run_ffmpeg(input_paths, out_path, opts):
+            if '-metadata' in opts:
+                raise FFmpegPostProcessorError('failed')
+
+        # The fixups are still done if the pass they were fused into fails
+        copy_opts = list(FFmpegPostProcessor.stream_copy_opts())
+        calls = self.run_pps(
+            FFmpegFixupStretchedPP, FFmpegMetadataPP, params={'ignoreerrors': True, 'quiet': True},
+            side_effect=run_ffmpeg, stretched_ratio=2, title='a')
+        self.assertEqual(calls[-1], (['video.mp4'], 'video.temp.mp4', [*copy_opts, '-aspect', '2.000000']))
+        self.assertEqual(len(calls), 2)
+
+    def test_conflicting_options(self):
+        conflicting = FFmpegPostProcessor._conflicting_options
+        self.assertFalse(conflicting(['-aspect', '2'], ['-map', '0', '-dn', '-ignore_unknown', '-aspect', '2']))
+        self.assertTrue(conflicting(['-aspect', '2'], ['-map', '0', '-dn', '-aspect', '3']))
+        self.assertTrue(conflicting(['-f', 'mp4'], ['-vn', '-f']))
+        # Values are not options
+        self.assertFalse(conflicting(['-aspect', '2'], ['-dn', '-metadata', 'comment=-aspect']))
+
+    def test_conflicting_fixups(self):
+        class FixupMovPP(FFmpegFixupM4aPP):
+            def run(self, info):
+                self._fixup('Correcting container', info['filepath'], [*self.stream_copy_opts(), '-f', 'mov'], info)
+                return [], info
+
+        copy_opts = list(FFmpegPostProcessor.stream_copy_opts())
+        info = {'ext': 'm4a', 'vcodec': 'none', 'container': 'm4a_dash', 'title': 'a'}
+        self.assertEqual(self.run_pps(FFmpegFixupM4aPP, FixupMovPP, FFmpegMetadataPP, **info), [
+            (['video.mp4'], 'video.temp.mp4', [*copy_opts, '-f', 'mp4']),
+            (['video.mp4'], 'video.temp.mp4', [*copy_opts, '-f', 'mov']),
+            (('video.mp4', None), 'video.temp.mp4', [
+                *FFmpegMetadataPP._options('m4a'), '-write_id3v1', '1', '-metadata', 'title=a'])])
+
+        class FixupAspectPP(FFmpegFixupStretchedPP):
+            def run(self, info):
+                self._fixup('Fixing aspect ratio', info['filepath'], [*self.stream_copy_opts(), '-aspect', '3'], info)
+                return [], info
+
+        self.assertEqual(self.run_pps(FFmpegFixupStretchedPP, FixupAspectPP, FFmpegCopyStreamPP, stretched_ratio=2), [
+            (['video.mp4'], 'video.temp.mp4', [*copy_opts, '-aspect', '2.000000']),
+            (['video.mp4'], 'video.temp.mp4', [*copy_opts, '-aspect', '3'])])
+
+
 class TestExec(unittest.TestCase):
     def test_parse_cmd(self):
         pp = ExecPP(YoutubeDL(), '')
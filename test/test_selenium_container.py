@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+
+# Allow direct execution
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import base64
+import gc
+import json
+import os.path
+import threading
+import time
+
+from test.helper import FakeYDL
+from yt_dlp.selenium_container import SeleniumContainer, SeleniumPool
+
+
+class FakeContainer:
+    def __init__(self, headless):
+        self.headless = headless
+        self.cookie_domains = set()
+        self.last_used = time.monotonic()
+        self.alive = True
+        self.closed = False
+        self.loaded_cookies = []
+
+    def is_alive(self):
+        return self.alive and not self.closed
+
+    def reset(self):
+        self.last_used = time.monotonic()
+
+    def close(self):
+        self.closed = True
+
+    def load(self, url):
+        pass
+
+    def load_cookies(self, cookiejar, base_domain):
+        self.loaded_cookies.append(base_domain)
+        self.cookie_domains.add(base_domain)
+
+
+class FakePool(SeleniumPool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.started = []
+
+    def _new_container(self, headless):
+        container = FakeContainer(headless)
+        self._containers.add(container)
+        self.started.append(container)
+        return container
+
+
+class TestSeleniumPool(unittest.TestCase):
+    def test_reuse(self):
+        pool = FakePool(FakeYDL(), size=2)
+        with pool.lease(True) as first:
+            pass
+        with pool.lease(True) as second:
+            self.assertIs(second, first)
+            # A browser with another headless mode is started alongside
+            with pool.lease(False) as other:
+                self.assertIsNot(other, first)
+        self.assertEqual(len(pool.started), 2)
+        pool.close()
+        self.assertTrue(all(c.closed for c in pool.started))
+        self.assertEqual(pool._num_alive, 0)
+
+    def test_garbage_collected(self):
+        pool = FakePool(FakeYDL())
+        with pool.lease(True) as container:
+            pass
+        del pool
+        gc.collect()
+        self.assertTrue(container.closed)
+
+    def test_size_limit(self):
+        pool = FakePool(FakeYDL(), size=1)
+        first = pool.acquire(True)
+        leased = []
+        thread = threading.Thread(target=lambda: leased.append(pool.acquire(True)))
+        thread.start()
+        thread.join(0.1)
+        # Blocks until the browser is released
+        self.assertTrue(thread.is_alive())
+        pool.release(first)
+        thread.join(5)
+        self.assertEqual(leased, [first])
+        self.assertEqual(len(pool.started), 1)
+
+    def test_idle_eviction(self):
+        pool = FakePool(FakeYDL(), idle_timeout=0.05)
+        with pool.lease(True) as container:
+            pass
+        # The reaper closes idle browsers even if nothing is leased anymore
+        for _ in range(100):
+            if container.closed:
+                break
+            time.sleep(0.01)
+        self.assertTrue(container.closed)
+        self.assertEqual(pool._num_alive, 0)
+        with pool.lease(True) as new_container:
+            self.assertIsNot(new_container, container)
+
+    def test_dead_browser(self):
+        pool = FakePool(FakeYDL())
+        with pool.lease(True) as container:
+            container.alive = False
+        self.assertTrue(container.closed)
+        self.assertEqual(pool._idle, [])
+        self.assertEqual(pool._num_alive, 0)
+
+        # A browser that died while idle is replaced on the next lease
+        with pool.lease(True) as container:
+            pass
+        container.alive = False
+        with pool.lease(True) as new_container:
+            self.assertIsNot(new_container, container)
+        self.assertTrue(container.closed)
+        self.assertEqual(pool._num_alive, 1)
+
+    def test_failed_lease(self):
+        pool = FakePool(FakeYDL())
+        with self.assertRaises(ValueError), pool.lease(True) as container:
+            raise ValueError
+        self.assertTrue(container.closed)
+        self.assertEqual(pool._num_alive, 0)
+
+    def test_cookies(self):
+        ydl = FakeYDL()
+        ydl.params['cookiesfrombrowser'] = ('chrome',)
+        pool = FakePool(ydl)
+        for _ in range(2):
+            with pool.lease(True, 'https://example.com', '.example.com') as container:
+                pass
+        with pool.lease(True, 'https://example.org', '.example.org'):
+            pass
+        self.assertEqual(container.loaded_cookies, ['.example.com', '.example.org'])
+
+
+class FakeDriver:
+    class SwitchTo:
+        def window(self, handle):
+            pass
+
+        def default_content(self):
+            pass
+
+    def __init__(self):
+        self.events = []
+        self.bodies = {}
+        self.window_handles = ['main']
+        self.switch_to = self.SwitchTo()
+
+    def get_log(self, log_type):
+        events, self.events = self.events, []
+        return [{'message': json.dumps({'message': {'method': method, 'params': params}})}
+                for method, params in events]
+
+    def execute_cdp_cmd(self, cmd, args):
+        body = self.bodies[args['requestId']]
+        if isinstance(body, bytes):
+            return {'body': base64.b64encode(body).decode(), 'base64Encoded': True}
+        return {'body': body, 'base64Encoded': False}
+
+    def get(self, url):
+        pass
+
+    def quit(self):
+        pass
+
+    def load(self, request_id, url, body, content_range=None):
+        headers = {'Content-Range': content_range} if content_range else {}
+        self.bodies[request_id] = body
+        self.events += [
+            ('Network.requestWillBeSent', {'requestId': request_id, 'request': {'url': url}}),
+            ('Network.responseReceived', {'requestId': request_id, 'response': {'url': url, 'headers': headers}}),
+            ('Network.loadingFinished', {'requestId': request_id}),
+        ]
+
+
+class TestSeleniumContainer(unittest.TestCase):
+    def setUp(self):
+        self.container = SeleniumContainer(headless=True, spill_size=4)
+        self.container.driver = self.driver = FakeDriver()
+
+    def tearDown(self):
+        self.container.close()
+
+    def test_capture(self):
+        self.container.capture('https://example.com/api')
+        self.driver.load('1', 'https://example.com/api/1', '{}')
+        self.driver.load('2', 'https://example.com/page', '<html>')
+        # Unrelated events are skipped without being handled
+        self.driver.events.append(('Network.dataReceived', {'requestId': '1'}))
+        self.container.extract_network()
+        self.assertEqual(list(self.container.response_dict), ['https://example.com/api/1'])
+        self.assertEqual(self.container.response_dict['https://example.com/api/1']['1']['body'], '{}')
+        # Responses that are not captured are only recorded by URL
+        self.assertEqual(
+            self.container.response_updated_key_list, ['https://example.com/page', 'https://example.com/api/1'])
+
+        # Responses are only fetched once, unless their request is reused by a redirect
+        self.container.response_updated_key_list.clear()
+        self.driver.events.append(('Network.loadingFinished', {'requestId': '1'}))
+        self.container.extract_network()
+        self.assertEqual(self.container.response_updated_key_list, [])
+        self.driver.load('1', 'https://example.com/api/2', '[]')
+        self.container.extract_network()
+        self.assertEqual(self.container.response_updated_key_list, ['https://example.com/api/2'])
+
+    def test_spill(self):
+        url = 'https://example.com/video'
+        # Bodies that are not valid UTF-8 are binary
+        self.driver.load('1', url, b'\xff\xfe\x02\x03\x04', 'bytes 0-4/8')
+        self.driver.load('2', url, b'\x05\x06\xff', 'bytes 5-7/8')
+        self.container.extract_network()
+        parts = self.container.response_dict[url]
+        # Only the part of at least spill_size bytes is written to a file
+        self.assertIsNone(parts['1']['body'])
+        self.assertEqual(parts['2']['body'], b'\x05\x06\xff')
+
+        data = self.container.get_response_frag_data(parts)
+        self.assertTrue(data['end'])
+        with open(data['body_file'], 'rb') as f:
+            self.assertEqual(f.read(), b'\xff\xfe\x02\x03\x04\x05\x06\xff')
+
+        # The spill file only lasts until the lease ends
+        self.container.reset()
+        self.assertFalse(os.path.exists(data['body_file']))
+        self.assertEqual(self.container.response_dict, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -26,6 +26,7 @@
     InAdvancePagedList,
     LazyList,
     OnDemandPagedList,
+    SanitizedJSONEncoder,
     age_restricted,
     args_to_str,
     base_url,
@@ -108,6 +109,7 @@
     strip_or_none,
     subtitles_filename,
     timeconvert,
+    traverse_obj,
     unescapeHTML,
     unified_strdate,
     unified_timestamp,
@@ -115,10 +117,12 @@
     update_url_query,
     uppercase_escape,
     url_basename,
+    url_host_candidates,
     url_or_none,
     urlencode_postdata,
     urljoin,
     urshift,
+    valid_url_host_keys,
     version_tuple,
     xpath_attr,
     xpath_element,
@@ -554,6 +558,26 @@ def test_url_basename(self):
             url_basename('http://media.w3.org/2010/05/sintel/trailer.mp4'),
             'trailer.mp4')
 
+    def test_valid_url_host_keys(self):
+        self.assertEqual(valid_url_host_keys(r'https?://(?:www\.)?foo\.de/(?P<id>\d+)'), ('foo.de',))
+        self.assertEqual(valid_url_host_keys(r'(?:https?://)?(?:www\.)?foo\.de(?:/|$)'), ('foo.de',))
+        self.assertEqual(valid_url_host_keys(r'(?i)https?://(?:[^/]+\.)?Foo\.(?:de|com)/'), ('foo.com', 'foo.de'))
+        self.assertEqual(valid_url_host_keys(r'https?://foo\.(?:de/a|com/b)'), ('foo.com', 'foo.de'))
+        self.assertEqual(valid_url_host_keys(r'https?://(?:ab|cd)\.foo\.de(?:/[^/]+)*/x'), ('ab.foo.de', 'cd.foo.de'))
+        self.assertEqual(valid_url_host_keys(r'https?://foo\.(?:de|com)/|bar:(?P<id>\d+)'), None)
+        self.assertEqual(valid_url_host_keys(r'https?://foo\.de'), None)
+        self.assertEqual(valid_url_host_keys(r'https?://[^.]+\.foo\.de/'), None)
+        self.assertEqual(valid_url_host_keys(r'https?://foo.de/'), None)
+        self.assertEqual(valid_url_host_keys(r'https?://foo\.de:\d+/'), None)
+        self.assertEqual(valid_url_host_keys(r'https?://foo\.[a-z]+/'), None)
+        self.assertEqual(valid_url_host_keys(r'foosearch(?P<n>\d+)?:'), None)
+
+    def test_url_host_candidates(self):
+        self.assertEqual(url_host_candidates('http://www.Foo.de/bar//baz'), {'http:', 'www.foo.de'})
+        self.assertEqual(url_host_candidates('//foo.de'), {'', 'foo.de'})
+        self.assertEqual(url_host_candidates('foo.de/bar?x=http://baz'), {'foo.de'})
+        self.assertEqual(url_host_candidates('foosearch:bar'), {'foosearch:bar'})
+
     def test_base_url(self):
         self.assertEqual(base_url('http://foo.de/'), 'http://foo.de/')
         self.assertEqual(base_url('http://foo.de/bar'), 'http://foo.de/')
@@ -1842,6 +1866,76 @@ def test_determine_file_encoding(self):
         self.assertEqual(determine_file_encoding('# coding: utf-32-be'.encode('utf-32-be')), ('utf-32-be', 0))
         self.assertEqual(determine_file_encoding('# coding: utf-16-le'.encode('utf-16-le')), ('utf-16-le', 0))
 
+    def test_traverse_obj(self):
+        data = {
+            'str': 'str',
+            'none': None,
+            'list': [{'index': 0}, {'index': 1}, {'other': 2}],
+            'dict': {'Key': 'value', 'int': 10},
+        }
+
+        self.assertEqual(traverse_obj(data, 'str'), 'str')
+        self.assertEqual(traverse_obj(data, ('dict', 'Key')), 'value')
+        self.assertEqual(traverse_obj(data, ['dict', 'Key']), 'value')
+        self.assertEqual(traverse_obj(data, ('none', 'key'), default='default'), 'default')
+        self.assertEqual(traverse_obj(data, ('list', 1, 'index')), 1)
+        self.assertEqual(traverse_obj(data, ('list', -1)), {'other': 2})
+        self.assertEqual(traverse_obj(data, ('list', 5, 'index')), None)
+        self.assertEqual(traverse_obj(data, ('dict', None, 'int')), {'Key': 'value', 'int': 10})
+        self.assertEqual(traverse_obj(data, 'missing', ('dict', 'int')), 10)
+
+        # Branching
+        self.assertEqual(traverse_obj(data, ('list', ..., 'index')), [0, 1])
+        self.assertEqual(traverse_obj(data, ('list', ..., 'index'), get_all=False), 0)
+        self.assertEqual(traverse_obj(data, ('list', ..., ('index', 'other'))), [0, 1, 2])
+        self.assertEqual(traverse_obj(data, (('str', 'missing', ('dict', 'int')),)), ['str', 10])
+        self.assertEqual(traverse_obj(data, (('str', 'missing', ['dict', 'int']),)), ['str', 10])
+        self.assertEqual(traverse_obj(data, ('dict', ...)), ['value', 10])
+        self.assertEqual(traverse_obj(data, ('list', ..., ...), expected_type=int), [0, 1, 2])
+        self.assertEqual(traverse_obj(data, ('list', lambda i, v: 'index' in v, 'index')), [0, 1])
+
+        # Options
+        self.assertEqual(traverse_obj(data, ('dict', 'key')), None)
+        self.assertEqual(traverse_obj(data, ('DICT', 'key'), casesense=False), 'value')
+        self.assertEqual(traverse_obj(data, ('str', 0)), None)
+        self.assertEqual(traverse_obj(data, ('str', 0), traverse_string=True), 's')
+        self.assertEqual(traverse_obj(data, ('dict', 'int', ...), traverse_string=True), ['1', '0'])
+        self.assertEqual(traverse_obj(data, ('list', '1', 'index'), is_user_input=True), 1)
+        self.assertEqual(traverse_obj(data, ('list', '1:', 'index'), is_user_input=True), None)
+        self.assertEqual(traverse_obj(data, ('list', ':', 'index'), is_user_input=True), [0, 1])
+        self.assertEqual(traverse_obj(data, ('str', ':2'), is_user_input=True, traverse_string=True), 'st')
+
+        # Paths that are not compiled behave the same
+        self.assertEqual(
+            traverse_obj(data, ('list', lambda *_: True, 'index')), traverse_obj(data, ('list', ..., 'index')))
+        self.assertEqual(traverse_obj(data, ('list', 1.0)), None)
+
+    def test_SanitizedJSONEncoder(self):
+        class Unknown:
+            def __repr__(self):
+                return 'unknown'
+
+        obj = {
+            'str': 'ü"', 'int': 1, 'float': 1.5, 'bool': True, 'none': None, 1: 'int key', None: 'none key',
+            'tuple': (1, (2, 3)), 'set': {4}, 'lazy': LazyList(iter([5, {'__private': 6}])), 'unknown': Unknown(),
+            'empty': [{}, []], 'nan': float('nan'),
+        }
+        expected = ('{"str": "\\u00fc\\"", "int": 1, "float": 1.5, "bool": true, "none": null, "1": "int key", '
+                    '"null": "none key", "tuple": [1, [2, 3]], "set": [4], "lazy": [5, {"__private": 6}], '
+                    '"unknown": "unknown", "empty": [{}, []], "nan": NaN}')
+        self.assertEqual(json.dumps(obj, cls=SanitizedJSONEncoder), expected)
+
+        stream = io.StringIO()
+        json.dump(obj, stream, cls=SanitizedJSONEncoder, reject=lambda k, v: v is None or str(k).startswith('__'))
+        self.assertEqual(stream.getvalue(), expected.replace('"none": null, ', '').replace('{"__private": 6}', '{}'))
+        self.assertEqual(
+            json.dumps(['ü', {'a': 'ü'}], cls=SanitizedJSONEncoder, ensure_ascii=False), '["ü", {"a": "ü"}]')
+        self.assertEqual(json.dumps('str', cls=SanitizedJSONEncoder), '"str"')
+
+        self.assertRaises(TypeError, json.dumps, {(1,): 1}, cls=SanitizedJSONEncoder)
+        self.assertEqual(json.dumps({(1,): 1}, cls=SanitizedJSONEncoder, skipkeys=True), '{}')
+        self.assertRaises(ValueError, json.dumps, float('inf'), cls=SanitizedJSONEncoder, allow_nan=False)
+
 
 if __name__ == '__main__':
     unittest.main()
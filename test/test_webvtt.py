@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+# Allow direct execution
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import io
+
+from yt_dlp.webvtt import CueBlock, CueMerger, Magic, _BlockStreamParser, parse_fragment, parse_stream
+
+WEBVTT_DATA = (
+    b'WEBVTT\r\nX-TIMESTAMP-MAP=LOCAL:00:00:00.000,MPEGTS:900000\r\n\r\n'
+    b'STYLE\r\n::cue { color: white }\r\n\r\n'
+    b'NOTE a comment\r\n\r\n'
+    b'1\r\n00:00:00.000 --> 00:00:01.500 align:start\r\nfirst\r\ncue \xc3\xa9\r\n\r\n\r\n'
+    b'00:01.500 --> 00:02.000\nsecond cue')
+
+
+def serialize(blocks):
+    output = io.StringIO()
+    for block in blocks:
+        block.write_into(output)
+    return output.getvalue()
+
+
+def cue(start, end, text='text\n'):
+    return CueBlock(id=None, start=start, end=end, text=text, settings=None)
+
+
+class TestParser(unittest.TestCase):
+    def test_parse_fragment(self):
+        blocks = list(parse_fragment(WEBVTT_DATA))
+        self.assertEqual([type(block).__name__ for block in blocks], [
+            'Magic', 'StyleBlock', 'CommentBlock', 'CueBlock', 'CueBlock'])
+        self.assertIsInstance(blocks[0], Magic)
+        self.assertEqual(blocks[0].mpegts, 900000)
+        self.assertEqual(blocks[3].as_json, {
+            'id': '1',
+            'start': 0,
+            'end': 135000,
+            'text': 'first\r\ncue \xe9\r\n',
+            'settings': 'align:start',
+        })
+        self.assertEqual(blocks[4].text, 'second cue')
+
+    def test_parse_stream(self):
+        expected = serialize(parse_fragment(WEBVTT_DATA))
+        for chunk_size in (1, 2, 3, 5, 64):
+            parser = _BlockStreamParser(io.BytesIO(WEBVTT_DATA), chunk_size)
+            windows = [parser._data]
+            while parser._data:
+                parser._next_window()
+                windows.append(parser._data)
+            self.assertEqual(''.join(windows), WEBVTT_DATA.decode(), chunk_size)
+            self.assertGreater(len(windows), 2, chunk_size)
+            self.assertEqual(serialize(parse_stream(io.BytesIO(WEBVTT_DATA), chunk_size)), expected, chunk_size)
+
+
+class TestCueMerger(unittest.TestCase):
+    def assertCues(self, cues, expected):
+        self.assertEqual([(c.start, c.end, c.text) for c in cues], expected)
+
+    def test_dedup(self):
+        merger = CueMerger()
+        self.assertCues(merger.add(cue(0, 10, 'a\n')), [])
+        self.assertCues(merger.add(cue(5, 15, 'b\n')), [])
+        # Repeated by the next fragment
+        self.assertCues(merger.add(cue(0, 10, 'a\n')), [])
+        self.assertEqual(len(merger), 2)
+        self.assertCues(merger.add(cue(20, 30, 'c\n')), [(0, 10, 'a\n'), (5, 15, 'b\n')])
+        self.assertCues(merger.flush(), [(20, 30, 'c\n')])
+        self.assertEqual(len(merger), 0)
+
+    def test_hinge(self):
+        merger = CueMerger()
+        merger.add(cue(0, 10))
+        self.assertCues(merger.add(cue(10, 20)), [])
+        self.assertCues(merger.add(cue(20, 30)), [])
+        self.assertCues(merger.add(cue(30, 40, 'other\n')), [(0, 30, 'text\n')])
+
+    def test_json(self):
+        merger = CueMerger()
+        merger.add(cue(0, 10, 'a\n'))
+        merger.add(cue(5, 15, 'b\n'))
+        merger = CueMerger.from_json(merger.as_json)
+        self.assertCues(merger.add(cue(15, 20, 'b\n')), [(0, 10, 'a\n')])
+        self.assertCues(merger.add(cue(40, 50, 'c\n')), [(5, 20, 'b\n')])
+
+
+if __name__ == '__main__':
+    unittest.main()
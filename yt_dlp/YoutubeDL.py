@@ -1,4 +1,5 @@
 import collections
+import concurrent.futures
 import contextlib
 import datetime
 import errno
@@ -16,6 +17,7 @@
 import subprocess
 import sys
 import tempfile
+import threading
 import time
 import tokenize
 import traceback
@@ -23,6 +25,7 @@
 import urllib.request
 from string import ascii_letters
 
+from .archive import DownloadArchive
 from .cache import Cache
 from .compat import compat_os_name, compat_shlex_quote
 from .cookies import load_cookies
@@ -67,6 +70,7 @@
     ExtractorError,
     GeoRestrictedError,
     HEADRequest,
+    HTTPConnectionPool,
     ISO3166Utils,
     LazyList,
     MaxDownloadsReached,
@@ -79,6 +83,7 @@
     ReExtractInfo,
     RejectedVideoReached,
     SameFileError,
+    SanitizedJSONEncoder,
     UnavailableVideoError,
     YoutubeDLCookieProcessor,
     YoutubeDLHandler,
@@ -104,7 +109,6 @@
     int_or_none,
     iri_to_uri,
     join_nonempty,
-    locked_file,
     make_dir,
     make_HTTPS_handler,
     merge_headers,
@@ -133,6 +137,7 @@
     traverse_obj,
     try_get,
     url_basename,
+    url_host_candidates,
     variadic,
     version_tuple,
     windows_enable_vt_mode,
@@ -191,6 +196,10 @@ class YoutubeDL:
     forcejson:         Force printing info_dict as JSON.
     dump_single_json:  Force printing the info_dict of the whole playlist
                        (or video) as a single JSON line.
+                       If 'lines', playlists are instead printed as they are
+                       processed: one line with the playlist's info_dict
+                       (without entries), one line per entry and a final
+                       line with _type 'playlist_end' and the counts
     force_write_download_archive: Force writing download archive regardless
                        of 'skip_download' or 'simulate'.
     simulate:          Do not download the video files. If unset (or None),
@@ -240,6 +249,8 @@ class YoutubeDL:
     playlist_items:    Specific indices of playlist to download.
     playlistrandom:    Download playlist items in random order.
     lazy_playlist:     Process playlist entries as they are received.
+    concurrent_entries: Number of playlist entries that are extracted and
+                       downloaded concurrently (default: 1)
     matchtitle:        Download only matching titles.
     rejecttitle:       Reject downloads for matching titles.
     logger:            Log messages to a logging.Logger instance.
@@ -273,6 +284,11 @@ class YoutubeDL:
     skip_download:     Skip the actual download of the video file
     cachedir:          Location of the cache files in the filesystem.
                        False to disable filesystem cache.
+    cache_backend:     How the cache is stored in cachedir. One of "file"
+                       (one JSON file per entry, default) or "sqlite"
+    cache_limits:      A dictionary of cache sections and their limits as a
+                       dictionary with the keys "ttl" (maximum age of an entry
+                       in seconds) and "max_entries"
     noplaylist:        Download single video instead of a playlist if in doubt.
     age_limit:         An integer representing the user's age in years.
                        Unsuitable videos for the given age are skipped.
@@ -287,7 +303,10 @@ class YoutubeDL:
                        downloaded. None for no limit.
     download_archive:  File name of a file where all downloads are recorded.
                        Videos already present in the file are not downloaded
-                       again.
+                       again. Files named *.db, *.sqlite or *.sqlite3 are
+                       indexed SQLite databases instead of text files
+    download_archive_batch_size: Number of IDs to buffer before writing
+                       them to the download archive (default: 1)
     break_on_existing: Stop the download process after attempting to download a
                        file that is in the archive.
     break_on_reject:   Stop the download process when encountering a video that
@@ -379,6 +398,9 @@ class YoutubeDL:
                        - "detect_or_warn": check whether we can do anything
                                            about it, warn otherwise (default)
     source_address:    Client-side IP address to bind to.
+    http_pool_size:    Maximum number of idle keep-alive HTTP connections
+                       kept per host for reuse. 0 disables connection reuse
+                       (default: 4)
     sleep_interval_requests: Number of seconds to sleep between requests
                        during extraction
     sleep_interval:    Number of seconds to sleep before each download when
@@ -445,7 +467,7 @@ class YoutubeDL:
     nopart, updatetime, buffersize, ratelimit, throttledratelimit, min_filesize,
     max_filesize, test, noresizebuffer, retries, file_access_retries, fragment_retries,
     continuedl, xattr_set_filesize, hls_use_mpegts, http_chunk_size,
-    external_downloader_args, concurrent_fragment_downloads.
+    external_downloader_args, concurrent_fragment_downloads, http_connections.
 
     The following options are used by the post processors:
     ffmpeg_location:   Location of the ffmpeg/avconv binary; either the path
@@ -467,6 +489,12 @@ class YoutubeDL:
                        See "EXTRACTOR ARGUMENTS" for details.
                        Eg: {'youtube': {'skip': ['dash', 'hls']}}
     mark_watched:      Mark videos watched (even with --simulate). Only for YouTube
+    selenium_browner_timeout:  Seconds to wait for elements in browser-based extractors
+    selenium_browner_headless: Whether to run the browser of browser-based extractors headless
+    selenium_browner_pool_size: Maximum number of browsers kept alive for
+                       browser-based extractors (default: 1)
+    selenium_browner_idle_timeout: Seconds after which an unused pooled
+                       browser is closed (default: 300)
 
     The following options are deprecated and may be removed in the future:
 
@@ -557,6 +585,8 @@ def __init__(self, params=None, auto_init=True):
         self.params = params
         self._ies = {}
         self._ies_instances = {}
+        self._ies_index = None
+        self._ies_lookups = 0
         self._pps = {k: [] for k in POSTPROCESS_WHEN}
         self._printed_messages = set()
         self._first_webpage_request = True
@@ -568,6 +598,16 @@ def __init__(self, params=None, auto_init=True):
         self._num_videos = 0
         self._playlist_level = 0
         self._playlist_urls = set()
+        self._selenium_pool = None
+        self._connection_pool = None
+        self._entry_local = threading.local()
+        self._num_downloads_lock = threading.Lock()
+        self._playlist_lock = threading.Lock()
+        self._output_lock = threading.RLock()
+        self._format_selectors = {}
+        self._format_sorts = {}
+        self._probe_cache = collections.OrderedDict()
+        self._probe_cache_lock = threading.Lock()
         self.cache = Cache(self)
 
         windows_enable_vt_mode()
@@ -708,23 +748,11 @@ def check_deprecated(param, option, suggestion):
         self._setup_opener()
         register_socks_protocols()
 
-        def preload_download_archive(fn):
-            """Preload the archive, if any is specified"""
-            if fn is None:
-                return False
-            self.write_debug(f'Loading archive file {fn!r}')
-            try:
-                with locked_file(fn, 'r', encoding='utf-8') as archive_file:
-                    for line in archive_file:
-                        self.archive.add(line.strip())
-            except OSError as ioe:
-                if ioe.errno != errno.ENOENT:
-                    raise
-                return False
-            return True
-
         self.archive = set()
-        preload_download_archive(self.params.get('download_archive'))
+        fn = self.params.get('download_archive')
+        if fn is not None:
+            self.write_debug(f'Loading archive file {fn!r}')
+            self.archive = DownloadArchive.open(fn, self.params.get('download_archive_batch_size') or 1)
 
     def warn_if_short_id(self, argv):
         # short YouTube ID starting with dash?
@@ -742,10 +770,21 @@ def warn_if_short_id(self, argv):
                 'Use -- to separate parameters and URLs, like this:\n%s' %
                 args_to_str(correct_argv))
 
+    @property
+    def selenium_pool(self):
+        """The browser pool shared by all browser-based extractors"""
+        if self._selenium_pool is None:
+            from .selenium_container import SeleniumPool
+            self._selenium_pool = SeleniumPool(
+                self, self.params.get('selenium_browner_pool_size', 1),
+                self.params.get('selenium_browner_idle_timeout', 300))
+        return self._selenium_pool
+
     def add_info_extractor(self, ie):
         """Add an InfoExtractor object to the end of the list."""
         ie_key = ie.ie_key()
         self._ies[ie_key] = ie
+        self._ies_index = None
         if not isinstance(ie, type):
             self._ies_instances[ie_key] = ie
             ie.set_downloader(self)
@@ -757,6 +796,36 @@ def _get_info_extractor_class(self, ie_key):
             self.add_info_extractor(ie)
         return ie
 
+    def _candidate_ies(self, url):
+        """
+        Return the (ie_key, ie) pairs that may be suitable for the url, in order.
+        Extractors whose _VALID_URL only matches known hosts are looked up by host,
+        the others are always candidates
+        """
+        self._ies_lookups += 1
+        if self._ies_index is None:
+            from .extractor.extractors import _LAZY_LOADER
+
+            # Without lazy extractors, the host keys have to be computed from the regexes.
+            # Do not pay for this when only a single URL is extracted
+            if not (_LAZY_LOADER or self._ies_lookups > 1):
+                return list(self._ies.items())
+            ies, by_host, unindexed = list(self._ies.items()), collections.defaultdict(list), []
+            for pos, (_, ie) in enumerate(ies):
+                keys = ie._get_url_host_keys()
+                if keys is None:
+                    unindexed.append(pos)
+                for key in keys or ():
+                    by_host[key].append(pos)
+            self._ies_index = ies, dict(by_host), unindexed
+
+        ies, by_host, unindexed = self._ies_index
+        positions = set(unindexed)
+        for host in url_host_candidates(url):
+            for i in range(len(host)):
+                positions.update(by_host.get(host[i:], ()))
+        return [ies[pos] for pos in sorted(positions)]
+
     def get_info_extractor(self, ie_key):
         """
         Get an instance of an IE with name ie_key, it will try to get one from
@@ -811,11 +880,12 @@ def _bidi_workaround(self, message):
         return res[:-len('\n')]
 
     def _write_string(self, message, out=None, only_once=False):
-        if only_once:
-            if message in self._printed_messages:
-                return
-            self._printed_messages.add(message)
-        write_string(message, out=out, encoding=self.params.get('encoding'))
+        with self._output_lock:
+            if only_once:
+                if message in self._printed_messages:
+                    return
+                self._printed_messages.add(message)
+            write_string(message, out=out, encoding=self.params.get('encoding'))
 
     def to_stdout(self, message, skip_eol=False, quiet=None):
         """Print message to stdout"""
@@ -833,9 +903,14 @@ def to_screen(self, message, skip_eol=False, quiet=None):
         if (self.params.get('quiet') if quiet is None else quiet) and not self.params.get('verbose'):
             return
         self._write_string(
-            '%s%s' % (self._bidi_workaround(message), ('' if skip_eol else '\n')),
+            '%s%s%s' % (self._entry_label, self._bidi_workaround(message), ('' if skip_eol else '\n')),
             self._out_files.screen)
 
+    @property
+    def _entry_label(self):
+        """Prefix identifying the playlist entry processed by the current worker thread"""
+        return getattr(self._entry_local, 'label', None) or ''
+
     def to_stderr(self, message, only_once=False):
         """Print message to stderr"""
         assert isinstance(message, str)
@@ -878,6 +953,14 @@ def __enter__(self):
     def __exit__(self, *args):
         self.restore_console_title()
 
+        if self._selenium_pool is not None:
+            self._selenium_pool.close()
+        if self._connection_pool is not None:
+            self._connection_pool.close()
+        if isinstance(self.archive, DownloadArchive):
+            self.archive.close()
+        self.cache.close()
+
         if self.params.get('cookiefile') is not None:
             self.cookiejar.save(ignore_discard=True, ignore_expires=True)
 
@@ -1045,6 +1128,7 @@ def _outtmpl_expandpath(outtmpl):
         return expand_path(outtmpl).replace(sep, '')
 
     @staticmethod
+    @functools.lru_cache(maxsize=256)
     def escape_outtmpl(outtmpl):
         ''' Escape any remaining strings like %s, %abc% etc. '''
         return re.sub(
@@ -1072,6 +1156,89 @@ def _copy_infodict(info_dict):
         info_dict.pop('__pending_error', None)
         return info_dict
 
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def _compile_outtmpl(outtmpl):
+        """ Parse the output template into a tuple of literal strings and field specifications
+        that prepare_outtmpl can render against any info_dict """
+        EXTERNAL_FORMAT_RE = re.compile(STR_FORMAT_RE_TMPL.format('[^)]*', f'[{STR_FORMAT_TYPES}ljhqBUDS]'))
+        MATH_FUNCTIONS = {
+            '+': float.__add__,
+            '-': float.__sub__,
+        }
+        # Field is of the form key1.key2...
+        # where keys (except first) can be string, int or slice
+        FIELD_RE = r'\w*(?:\.(?:\w+|{num}|{num}?(?::{num}?){{1,2}}))*'.format(num=r'(?:-?\d+)')
+        MATH_FIELD_RE = rf'(?:{FIELD_RE}|-?{NUMBER_RE})'
+        MATH_OPERATORS_RE = r'(?:%s)' % '|'.join(map(re.escape, MATH_FUNCTIONS.keys()))
+        INTERNAL_FORMAT_RE = re.compile(rf'''(?x)
+            (?P<negate>-)?
+            (?P<fields>{FIELD_RE})
+            (?P<maths>(?:{MATH_OPERATORS_RE}{MATH_FIELD_RE})*)
+            (?:>(?P<strf_format>.+?))?
+            (?P<remaining>
+                (?P<alternate>(?<!\\),[^|&)]+)?
+                (?:&(?P<replacement>.*?))?
+                (?:\|(?P<default>.*?))?
+            )$''')
+
+        def parse_fields(fields):
+            fields = fields.split('.')
+            if fields[0] == '':
+                fields.pop(0)
+            return tuple(fields)
+
+        def parse_maths(maths):
+            operations, operator = [], None
+            while maths:
+                item = re.match(
+                    MATH_FIELD_RE if operator else MATH_OPERATORS_RE,
+                    maths).group(0)
+                maths = maths[len(item):]
+                if operator is None:
+                    operator = MATH_FUNCTIONS[item]
+                    continue
+                item, multiplier = (item[1:], -1) if item[0] == '-' else (item, 1)
+                offset = float_or_none(item)
+                operations.append((operator, multiplier, offset, parse_fields(item) if offset is None else None))
+                operator = None
+            return tuple(operations)
+
+        def parse_key(key):
+            mobj = re.match(INTERNAL_FORMAT_RE, key)
+            while mobj:
+                mobj = mobj.groupdict()
+                yield {
+                    'negate': mobj['negate'],
+                    'fields': parse_fields(mobj['fields']),
+                    'maths': parse_maths(mobj['maths']),
+                    'strf_format': mobj['strf_format'] and mobj['strf_format'].replace('\\,', ','),
+                    'alternate': mobj['alternate'],
+                    'replacement': mobj['replacement'],
+                    'default': mobj['default'],
+                }
+                mobj = mobj['alternate'] and re.match(INTERNAL_FORMAT_RE, mobj['remaining'][1:])
+
+        tmpl, last_end = [], 0
+        for mobj in EXTERNAL_FORMAT_RE.finditer(outtmpl):
+            tmpl.append(outtmpl[last_end:mobj.start() if mobj.group('has_key') else mobj.end()])
+            last_end = mobj.end()
+            if not mobj.group('has_key'):
+                continue
+            key = mobj.group('key')
+            fields = re.match(INTERNAL_FORMAT_RE, key)
+            tmpl.append({
+                'key': key,
+                'tmpl_key': '%s\0%s' % (key.replace('%', '%\0'), mobj.group('format')),
+                'initial_field': fields.group('fields') if fields else '',
+                'alternatives': tuple(parse_key(key)),
+                'prefix': mobj.group('prefix'),
+                'format': mobj.group('format'),
+                'conversion': mobj.group('conversion') or '',
+            })
+        tmpl.append(outtmpl[last_end:])
+        return tuple(tmpl)
+
     def prepare_outtmpl(self, outtmpl, info_dict, sanitize=False):
         """ Make the outtmpl and info_dict suitable for substitution: ydl.escape_outtmpl(outtmpl) % info_dict
         @param sanitize    Whether to sanitize the output as a filename.
@@ -1098,67 +1265,30 @@ def prepare_outtmpl(self, outtmpl, info_dict, sanitize=False):
             'autonumber': self.params.get('autonumber_size') or 5,
         }
 
-        TMPL_DICT = {}
-        EXTERNAL_FORMAT_RE = re.compile(STR_FORMAT_RE_TMPL.format('[^)]*', f'[{STR_FORMAT_TYPES}ljhqBUDS]'))
-        MATH_FUNCTIONS = {
-            '+': float.__add__,
-            '-': float.__sub__,
-        }
-        # Field is of the form key1.key2...
-        # where keys (except first) can be string, int or slice
-        FIELD_RE = r'\w*(?:\.(?:\w+|{num}|{num}?(?::{num}?){{1,2}}))*'.format(num=r'(?:-?\d+)')
-        MATH_FIELD_RE = rf'(?:{FIELD_RE}|-?{NUMBER_RE})'
-        MATH_OPERATORS_RE = r'(?:%s)' % '|'.join(map(re.escape, MATH_FUNCTIONS.keys()))
-        INTERNAL_FORMAT_RE = re.compile(rf'''(?x)
-            (?P<negate>-)?
-            (?P<fields>{FIELD_RE})
-            (?P<maths>(?:{MATH_OPERATORS_RE}{MATH_FIELD_RE})*)
-            (?:>(?P<strf_format>.+?))?
-            (?P<remaining>
-                (?P<alternate>(?<!\\),[^|&)]+)?
-                (?:&(?P<replacement>.*?))?
-                (?:\|(?P<default>.*?))?
-            )$''')
+        def _traverse_infodict(path):
+            return traverse_obj(info_dict, path, is_user_input=True, traverse_string=True)
 
-        def _traverse_infodict(k):
-            k = k.split('.')
-            if k[0] == '':
-                k.pop(0)
-            return traverse_obj(info_dict, k, is_user_input=True, traverse_string=True)
-
-        def get_value(mdict):
+        def get_value(field):
             # Object traversal
-            value = _traverse_infodict(mdict['fields'])
+            value = _traverse_infodict(field['fields'])
             # Negative
-            if mdict['negate']:
+            if field['negate']:
                 value = float_or_none(value)
                 if value is not None:
                     value *= -1
             # Do maths
-            offset_key = mdict['maths']
-            if offset_key:
+            if field['maths']:
                 value = float_or_none(value)
-                operator = None
-                while offset_key:
-                    item = re.match(
-                        MATH_FIELD_RE if operator else MATH_OPERATORS_RE,
-                        offset_key).group(0)
-                    offset_key = offset_key[len(item):]
-                    if operator is None:
-                        operator = MATH_FUNCTIONS[item]
-                        continue
-                    item, multiplier = (item[1:], -1) if item[0] == '-' else (item, 1)
-                    offset = float_or_none(item)
+                for op, multiplier, offset, offset_field in field['maths']:
                     if offset is None:
-                        offset = float_or_none(_traverse_infodict(item))
+                        offset = float_or_none(_traverse_infodict(offset_field))
                     try:
-                        value = operator(value, multiplier * offset)
+                        value = op(value, multiplier * offset)
                     except (TypeError, ZeroDivisionError):
                         return None
-                    operator = None
             # Datetime formatting
-            if mdict['strf_format']:
-                value = strftime_or_none(value, mdict['strf_format'].replace('\\,', ','))
+            if field['strf_format']:
+                value = strftime_or_none(value, field['strf_format'])
 
             return value
 
@@ -1178,30 +1308,25 @@ def _dumpjson_default(obj):
                 return list(obj)
             return repr(obj)
 
-        def create_key(outer_mobj):
-            if not outer_mobj.group('has_key'):
-                return outer_mobj.group(0)
-            key = outer_mobj.group('key')
-            mobj = re.match(INTERNAL_FORMAT_RE, key)
-            initial_field = mobj.group('fields') if mobj else ''
+        def create_key(tmpl_field):
+            if isinstance(tmpl_field, str):
+                return tmpl_field
+            key, initial_field = tmpl_field['key'], tmpl_field['initial_field']
             value, replacement, default = None, None, na
-            while mobj:
-                mobj = mobj.groupdict()
-                default = mobj['default'] if mobj['default'] is not None else default
-                value = get_value(mobj)
-                replacement = mobj['replacement']
-                if value is None and mobj['alternate']:
-                    mobj = re.match(INTERNAL_FORMAT_RE, mobj['remaining'][1:])
-                else:
+            for field in tmpl_field['alternatives']:
+                default = field['default'] if field['default'] is not None else default
+                value = get_value(field)
+                replacement = field['replacement']
+                if value is not None or not field['alternate']:
                     break
 
-            fmt = outer_mobj.group('format')
+            fmt = tmpl_field['format']
             if fmt == 's' and value is not None and key in field_size_compat_map.keys():
                 fmt = f'0{field_size_compat_map[key]:d}d'
 
             value = default if value is None else value if replacement is None else replacement
 
-            flags = outer_mobj.group('conversion') or ''
+            flags = tmpl_field['conversion']
             str_fmt = f'{fmt[:-1]}s'
             if fmt[-1] == 'l':  # list
                 delim = '\n' if '#' in flags else ', '
@@ -1245,11 +1370,11 @@ def create_key(outer_mobj):
                 if fmt[-1] in 'csr':
                     value = sanitizer(initial_field, value)
 
-            key = '%s\0%s' % (key.replace('%', '%\0'), outer_mobj.group('format'))
-            TMPL_DICT[key] = value
-            return '{prefix}%({key}){fmt}'.format(key=key, fmt=fmt, prefix=outer_mobj.group('prefix'))
+            TMPL_DICT[tmpl_field['tmpl_key']] = value
+            return '{prefix}%({key}){fmt}'.format(key=tmpl_field['tmpl_key'], fmt=fmt, prefix=tmpl_field['prefix'])
 
-        return EXTERNAL_FORMAT_RE.sub(create_key, outtmpl), TMPL_DICT
+        TMPL_DICT = {}
+        return ''.join(map(create_key, self._compile_outtmpl(outtmpl))), TMPL_DICT
 
     def evaluate_outtmpl(self, outtmpl, info_dict, *args, **kwargs):
         outtmpl, info_dict = self.prepare_outtmpl(outtmpl, info_dict, *args, **kwargs)
@@ -1402,11 +1527,11 @@ def extract_info(self, url, download=True, ie_key=None, extra_info=None,
             ie_key = 'Generic'
 
         if ie_key:
-            ies = {ie_key: self._get_info_extractor_class(ie_key)}
+            ies = {ie_key: self._get_info_extractor_class(ie_key)}.items()
         else:
-            ies = self._ies
+            ies = self._candidate_ies(url)
 
-        for ie_key, ie in ies.items():
+        for ie_key, ie in ies:
             if not ie.suitable(url):
                 continue
 
@@ -1635,22 +1760,26 @@ def process_ie_result(self, ie_result, download=True, extra_info=None):
             # Protect from infinite recursion due to recursively nested playlists
             # (see https://github.com/ytdl-org/youtube-dl/issues/27833)
             webpage_url = ie_result['webpage_url']
-            if webpage_url in self._playlist_urls:
+            with self._playlist_lock:
+                seen = webpage_url in self._playlist_urls
+                if not seen:
+                    self._playlist_level += 1
+                    self._playlist_urls.add(webpage_url)
+            if seen:
                 self.to_screen(
                     '[download] Skipping already downloaded playlist: %s'
                     % ie_result.get('title') or ie_result.get('id'))
                 return
 
-            self._playlist_level += 1
-            self._playlist_urls.add(webpage_url)
             self._fill_common_fields(ie_result, False)
             self._sanitize_thumbnails(ie_result)
             try:
                 return self.__process_playlist(ie_result, download)
             finally:
-                self._playlist_level -= 1
-                if not self._playlist_level:
-                    self._playlist_urls.clear()
+                with self._playlist_lock:
+                    self._playlist_level -= 1
+                    if not self._playlist_level:
+                        self._playlist_urls.clear()
         elif result_type == 'compat_list':
             self.report_warning(
                 'Extractor %s returned a compat_list result. '
@@ -1699,7 +1828,8 @@ def __process_playlist(self, ie_result, download):
         all_entries = PlaylistEntries(self, ie_result)
         entries = orderedSet(all_entries.get_requested_items(), lazy=True)
 
-        lazy = self.params.get('lazy_playlist')
+        stream_entries = self._playlist_level == 1 and self.params.get('dump_single_json') == 'lines'
+        lazy = self.params.get('lazy_playlist') or stream_entries
         if lazy:
             resolved_entries, n_entries = [], 'N/A'
             ie_result['requested_entries'], ie_result['entries'] = None, None
@@ -1710,6 +1840,8 @@ def __process_playlist(self, ie_result, download):
         if not ie_result.get('playlist_count'):
             # Better to do this after potentially exhausting entries
             ie_result['playlist_count'] = all_entries.get_full_count()
+        if stream_entries:
+            self._print_info_json({k: v for k, v in ie_result.items() if k not in ('entries', 'requested_entries')})
 
         _infojson_written = False
         write_playlist_files = self.params.get('allow_playlist_files', True)
@@ -1741,51 +1873,70 @@ def __process_playlist(self, ie_result, download):
         keep_resolved_entries = self.params.get('extract_flat') != 'discard'
         if self.params.get('extract_flat') == 'discard_in_playlist':
             keep_resolved_entries = ie_result['_type'] != 'playlist'
+        if stream_entries and _infojson_written is not True:
+            keep_resolved_entries = False  # The entries are printed as soon as they are processed
         if keep_resolved_entries:
             self.write_debug('The information of all playlist entries will be held in memory')
 
-        failures = 0
-        max_failures = self.params.get('skip_playlist_after_errors') or float('inf')
-        for i, (playlist_index, entry) in enumerate(entries):
-            if lazy:
-                resolved_entries.append((playlist_index, entry))
+        def process_entries():
+            for i, (playlist_index, entry) in enumerate(entries):
+                if lazy:
+                    resolved_entries.append((playlist_index, entry))
 
-            # TODO: Add auto-generated fields
-            if not entry or self._match_entry(entry, incomplete=True) is not None:
-                continue
+                # TODO: Add auto-generated fields
+                if not entry or self._match_entry(entry, incomplete=True) is not None:
+                    continue
+
+                self.to_screen('[download] Downloading video %s of %s' % (
+                    self._format_screen(i + 1, self.Styles.ID), self._format_screen(n_entries, self.Styles.EMPHASIS)))
+
+                entry['__x_forwarded_for_ip'] = ie_result.get('__x_forwarded_for_ip')
+                if not lazy and 'playlist-index' in self.params.get('compat_opts', []):
+                    playlist_index = ie_result['requested_entries'][i]
+
+                yield i, playlist_index, entry, {
+                    'n_entries': int_or_none(n_entries),
+                    '__last_playlist_index': max(ie_result['requested_entries'] or (0, 0)),
+                    'playlist_count': ie_result.get('playlist_count'),
+                    'playlist_index': playlist_index,
+                    'playlist_autonumber': i + 1,
+                    'playlist': title,
+                    'playlist_id': ie_result.get('id'),
+                    'playlist_title': ie_result.get('title'),
+                    'playlist_uploader': ie_result.get('uploader'),
+                    'playlist_uploader_id': ie_result.get('uploader_id'),
+                    'extractor': ie_result['extractor'],
+                    'webpage_url': ie_result['webpage_url'],
+                    'webpage_url_basename': url_basename(ie_result['webpage_url']),
+                    'webpage_url_domain': get_domain(ie_result['webpage_url']),
+                    'extractor_key': ie_result['extractor_key'],
+                }
 
-            self.to_screen('[download] Downloading video %s of %s' % (
-                self._format_screen(i + 1, self.Styles.ID), self._format_screen(n_entries, self.Styles.EMPHASIS)))
-
-            entry['__x_forwarded_for_ip'] = ie_result.get('__x_forwarded_for_ip')
-            if not lazy and 'playlist-index' in self.params.get('compat_opts', []):
-                playlist_index = ie_result['requested_entries'][i]
-
-            entry_result = self.__process_iterable_entry(entry, download, {
-                'n_entries': int_or_none(n_entries),
-                '__last_playlist_index': max(ie_result['requested_entries'] or (0, 0)),
-                'playlist_count': ie_result.get('playlist_count'),
-                'playlist_index': playlist_index,
-                'playlist_autonumber': i + 1,
-                'playlist': title,
-                'playlist_id': ie_result.get('id'),
-                'playlist_title': ie_result.get('title'),
-                'playlist_uploader': ie_result.get('uploader'),
-                'playlist_uploader_id': ie_result.get('uploader_id'),
-                'extractor': ie_result['extractor'],
-                'webpage_url': ie_result['webpage_url'],
-                'webpage_url_basename': url_basename(ie_result['webpage_url']),
-                'webpage_url_domain': get_domain(ie_result['webpage_url']),
-                'extractor_key': ie_result['extractor_key'],
+        failures = printed_entries = 0
+        max_failures = self.params.get('skip_playlist_after_errors') or float('inf')
+        with contextlib.closing(self.__process_entries(process_entries(), download)) as processed_entries:
+            for i, playlist_index, entry_result in processed_entries:
+                if not entry_result:
+                    failures += 1
+                elif stream_entries:
+                    self.post_extract(entry_result)
+                    self._print_info_json(entry_result)
+                    printed_entries += 1
+                if failures >= max_failures:
+                    self.report_error(
+                        f'Skipping the remaining entries in playlist "{title}" since {failures} items failed extraction')
+                    break
+                if keep_resolved_entries:
+                    resolved_entries[i] = (playlist_index, entry_result)
+
+        if stream_entries:
+            self._print_info_json({
+                '_type': 'playlist_end',
+                'id': ie_result.get('id'),
+                'playlist_count': ie_result.get('playlist_count') or all_entries.get_full_count(),
+                'n_entries': printed_entries,
+                'failures': failures,
             })
-            if not entry_result:
-                failures += 1
-            if failures >= max_failures:
-                self.report_error(
-                    f'Skipping the remaining entries in playlist "{title}" since {failures} items failed extraction')
-                break
-            if keep_resolved_entries:
-                resolved_entries[i] = (playlist_index, entry_result)
 
         # Update with processed data
         ie_result['requested_entries'], ie_result['entries'] = tuple(zip(*resolved_entries)) or ([], [])
@@ -1800,6 +1951,60 @@ def __process_playlist(self, ie_result, download):
         self.to_screen(f'[download] Finished downloading playlist: {title}')
         return ie_result
 
+    def __process_entries(self, entries, download):
+        """Process the (i, playlist_index, entry, extra_info) tuples of a playlist
+
+        Yields (i, playlist_index, result) in the order of the given entries.
+        With concurrent_entries > 1, the entries are processed by a pool of worker
+        threads while preserving this order. Nested playlists are processed
+        sequentially by the worker that encounters them. Once an entry raises
+        DownloadCancelled (e.g. --max-downloads, --break-on-existing), no more
+        entries are started
+
+        The output, the download count and the playlist recursion state are locked.
+        The extractor instances and the other YoutubeDL attributes are shared by
+        the workers as is, so extractors that keep per-video state on self
+        (e.g. in _real_extract) are not safe to use concurrently
+        """
+        workers = self.params.get('concurrent_entries') or 1
+        if workers <= 1 or self._entry_label:
+            for i, playlist_index, entry, extra_info in entries:
+                yield i, playlist_index, self.__process_iterable_entry(entry, download, extra_info)
+            return
+
+        stop = threading.Event()
+
+        def process_entry(label, entry, extra_info):
+            if stop.is_set():
+                return None
+            self._entry_local.label = label
+            try:
+                return self.__process_iterable_entry(entry, download, extra_info)
+            except DownloadCancelled:
+                stop.set()
+                raise
+            finally:
+                self._entry_local.label = None
+
+        pending = collections.deque()
+        executor = concurrent.futures.ThreadPoolExecutor(workers, thread_name_prefix='yt-dlp-entry')
+        try:
+            for i, playlist_index, entry, extra_info in entries:
+                pending.append((i, playlist_index, executor.submit(
+                    process_entry, f'[#{playlist_index}] ', entry, extra_info)))
+                # Keep the window bounded so that lazy playlists are not exhausted up-front
+                while len(pending) >= 2 * workers:
+                    i, playlist_index, future = pending.popleft()
+                    yield i, playlist_index, future.result()
+            while pending:
+                i, playlist_index, future = pending.popleft()
+                yield i, playlist_index, future.result()
+        finally:
+            stop.set()
+            for *_, future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
     @_handle_extraction_exceptions
     def __process_iterable_entry(self, entry, download, extra_info):
         return self.process_ie_result(
@@ -1919,6 +2124,16 @@ def can_merge():
             else 'bestvideo+bestaudio/best')
 
     def build_format_selector(self, format_spec):
+        """
+        Compile format_spec into a function that selects formats from a context.
+        The compiled selectors are cached, since the same spec is used for many videos
+        """
+        selector = self._format_selectors.get(format_spec)
+        if selector is None:
+            selector = self._format_selectors[format_spec] = self._compile_format_selector(format_spec)
+        return selector
+
+    def _compile_format_selector(self, format_spec):
         def syntax_error(note, start):
             message = (
                 'Invalid format specification: '
@@ -2112,6 +2327,14 @@ def _check_formats(formats):
                 return
             yield from self._check_formats(formats)
 
+        def _formats_view(ctx, key, filter_f):
+            # The formats of the context matching filter_f, computed once per context.
+            # They keep the order of the formats, i.e. are sorted from worst to best
+            views = ctx.setdefault('format_views', {})
+            if key not in views:
+                views[key] = [f for f in ctx['formats'] if filter_f(f)]
+            return views[key]
+
         def _build_selector_function(selector):
             if isinstance(selector, list):  # ,
                 fs = [_build_selector_function(s) for s in selector]
@@ -2161,6 +2384,7 @@ def selector_function(ctx):
 
                 else:
                     format_fallback, seperate_fallback, format_reverse, format_idx = False, None, True, 1
+                    view_key = ('spec', format_spec)
                     mobj = re.match(
                         r'(?P<bw>best|worst|b|w)(?P<type>video|audio|v|a)?(?P<mod>\*)?(?:\.(?P<n>[1-9]\d*))?$',
                         format_spec)
@@ -2182,6 +2406,7 @@ def selector_function(ctx):
                             else lambda f: True)  # b*, w*
                         filter_f = lambda f: _filter_f(f) and (
                             f.get('vcodec') != 'none' or f.get('acodec') != 'none')
+                        view_key = ('codec', format_type, format_modified)
                     else:
                         if format_spec in self._format_selection_exts['audio']:
                             filter_f = lambda f: f.get('ext') == format_spec and f.get('acodec') != 'none'
@@ -2194,30 +2419,42 @@ def selector_function(ctx):
                             filter_f = lambda f: f.get('format_id') == format_spec  # id
 
                     def selector_function(ctx):
-                        formats = list(ctx['formats'])
-                        matches = list(filter(filter_f, formats)) if filter_f is not None else formats
+                        matches = _formats_view(ctx, view_key, filter_f)
                         if not matches:
                             if format_fallback and ctx['incomplete_formats']:
                                 # for extractors with incomplete formats (audio only (soundcloud)
                                 # or video only (imgur)) best/worst will fallback to
                                 # best/worst {video,audio}-only format
-                                matches = formats
+                                matches = ctx['formats']
                             elif seperate_fallback and not ctx['has_merged_format']:
                                 # for compatibility with youtube-dl when there is no pre-merged format
-                                matches = list(filter(seperate_fallback, formats))
-                        matches = LazyList(_check_formats(matches[::-1 if format_reverse else 1]))
+                                matches = _formats_view(ctx, ('fallback', *view_key), seperate_fallback)
+                        if not check_formats:
+                            if format_idx <= len(matches):
+                                yield matches[-format_idx if format_reverse else format_idx - 1]
+                            return
+                        matches = LazyList(_check_formats(reversed(matches) if format_reverse else matches))
                         try:
                             yield matches[format_idx - 1]
                         except LazyList.IndexError:
                             return
 
+            if not selector.filters:
+                return selector_function
             filters = [self._build_format_filter(f) for f in selector.filters]
+            filters_key = tuple(selector.filters)
 
             def final_selector(ctx):
-                ctx_copy = dict(ctx)
-                for _filter in filters:
-                    ctx_copy['formats'] = list(filter(_filter, ctx_copy['formats']))
-                return selector_function(ctx_copy)
+                # Selectors with the same filters share the filtered context, and thus its views
+                filtered = ctx.setdefault('filtered_contexts', {})
+                if filters_key not in filtered:
+                    filtered[filters_key] = {
+                        **ctx,
+                        'formats': [f for f in ctx['formats'] if all(_filter(f) for _filter in filters)],
+                        'format_views': {},
+                        'filtered_contexts': {},
+                    }
+                return selector_function(filtered[filters_key])
             return final_selector
 
         stream = io.BytesIO(format_spec.encode())
@@ -2823,7 +3060,7 @@ def print_optional(field):
         print_mandatory('format')
 
         if self.params.get('forcejson'):
-            self.to_stdout(json.dumps(self.sanitize_info(info_dict)))
+            self._print_info_json(info_dict)
 
     def dl(self, name, info, subtitle=False, test=False):
         if not info.get('url'):
@@ -2887,7 +3124,11 @@ def process_info(self, info_dict):
 
         # Does nothing under normal operation - for backward compatibility of process_info
         self.post_extract(info_dict)
-        self._num_downloads += 1
+        with self._num_downloads_lock:
+            # Concurrent playlist entries may reach this after the limit was hit by another entry
+            if self._num_downloads >= float(self.params.get('max_downloads') or 'inf'):
+                raise MaxDownloadsReached()
+            self._num_downloads += 1
 
         # info_dict['_filename'] needs to be set for backward compatibility
         info_dict['_filename'] = full_filename = self.prepare_filename(info_dict, warn=True)
@@ -3264,8 +3505,11 @@ def wrapper(*args, **kwargs):
                     raise
             else:
                 if self.params.get('dump_single_json', False):
+                    if (self.params['dump_single_json'] == 'lines'
+                            and (res or {}).get('_type') in ('playlist', 'multi_video')):
+                        return  # Already printed by __process_playlist
                     self.post_extract(res)
-                    self.to_stdout(json.dumps(self.sanitize_info(res)))
+                    self._print_info_json(res)
         return wrapper
 
     def download(self, url_list):
@@ -3304,20 +3548,25 @@ def download_with_info_file(self, info_filename):
         return self._download_retcode
 
     @staticmethod
-    def sanitize_info(info_dict, remove_private_keys=False):
-        ''' Sanitize the infodict for converting to json '''
-        if info_dict is None:
-            return info_dict
-        info_dict.setdefault('epoch', int(time.time()))
-        info_dict.setdefault('_type', 'video')
+    def _prepare_sanitize_info(info_dict, remove_private_keys=False):
+        ''' Add the fields that sanitize_info sets and return the function that rejects the fields it removes '''
+        if info_dict is not None:
+            info_dict.setdefault('epoch', int(time.time()))
+            info_dict.setdefault('_type', 'video')
 
         if remove_private_keys:
-            reject = lambda k, v: v is None or k.startswith('__') or k in {
+            return lambda k, v: v is None or k.startswith('__') or k in {
                 'requested_downloads', 'requested_formats', 'requested_subtitles', 'requested_entries',
                 'entries', 'filepath', '_filename', 'infojson_filename', 'original_url', 'playlist_autonumber',
             }
-        else:
-            reject = lambda k, v: False
+        return None
+
+    @staticmethod
+    def sanitize_info(info_dict, remove_private_keys=False):
+        ''' Sanitize the infodict for converting to json '''
+        if info_dict is None:
+            return info_dict
+        reject = YoutubeDL._prepare_sanitize_info(info_dict, remove_private_keys) or (lambda k, v: False)
 
         def filter_fn(obj):
             if isinstance(obj, dict):
@@ -3336,6 +3585,30 @@ def filter_requested_info(info_dict, actually_filter=True):
         ''' Alias of sanitize_info for backward compatibility '''
         return YoutubeDL.sanitize_info(info_dict, actually_filter)
 
+    def _write_info_json_file(self, info_dict, fn):
+        ''' Write the sanitized infodict to a file, encoding it in chunks instead of sanitizing a copy first '''
+        reject = self._prepare_sanitize_info(info_dict, self.params.get('clean_infojson', True))
+        write_json_file(info_dict, fn, cls=SanitizedJSONEncoder, reject=reject)
+
+    def _print_info_json(self, info_dict):
+        ''' Print the sanitized infodict as JSON to stdout
+
+        The document is encoded into a buffer that is moved to disk once it is larger
+        than a batch, so that memory stays bounded and nothing is printed if encoding fails '''
+        chunks = SanitizedJSONEncoder(reject=self._prepare_sanitize_info(info_dict)).iterencode(info_dict)
+        if hasattr(self, '_output_channel'):  # The bidi workaround needs the complete message
+            return self.to_stdout(''.join(chunks))
+
+        batch_size = 64 * 1024
+        with tempfile.SpooledTemporaryFile(batch_size, 'w+', encoding='utf-8') as buffer:
+            buffer.writelines(chunks)
+            buffer.write('\n')
+            buffer.seek(0)
+            # Other threads must not write in between the batches of the document
+            with self._output_lock:
+                for batch in iter(functools.partial(buffer.read, batch_size), ''):
+                    self._write_string(batch, self._out_files.out)
+
     def _delete_downloaded_files(self, *files_to_delete, info={}, msg=None):
         for filename in set(filter(None, files_to_delete)):
             if msg:
@@ -3385,8 +3658,15 @@ def run_pp(self, pp, infodict):
 
     def run_all_pps(self, key, info, *, additional_pps=None):
         self._forceprint(key, info)
-        for pp in (additional_pps or []) + self._pps[key]:
-            info = self.run_pp(pp, info)
+        pps = (additional_pps or []) + self._pps[key]
+        try:
+            for pp, next_pp in zip(pps, pps[1:] + [None]):
+                # Consecutive ffmpeg postprocessors that only copy the streams of the file
+                # can be done in a single pass. See FFmpegPostProcessor._FUSABLE
+                info['__ffmpeg_fuse_next'] = getattr(next_pp, '_FUSABLE', False)
+                info = self.run_pp(pp, info)
+        finally:
+            info.pop('__ffmpeg_fuse_next', None)
         return info
 
     def pre_process(self, ie_info, key='pre_process', files_to_move=None):
@@ -3447,8 +3727,6 @@ def record_download_archive(self, info_dict):
         vid_id = self._make_archive_id(info_dict)
         assert vid_id
         self.write_debug(f'Adding to archive: {vid_id}')
-        with locked_file(fn, 'a', encoding='utf-8') as archive_file:
-            archive_file.write(vid_id + '\n')
         self.archive.add(vid_id)
 
     @staticmethod
@@ -3766,9 +4044,14 @@ def _setup_opener(self):
                 proxies['https'] = proxies['http']
         proxy_handler = PerRequestProxyHandler(proxies)
 
+        pool_size = self.params.get('http_pool_size', 4)
+        if pool_size:
+            self._connection_pool = HTTPConnectionPool(pool_size)
+
         debuglevel = 1 if self.params.get('debug_printtraffic') else 0
-        https_handler = make_HTTPS_handler(self.params, debuglevel=debuglevel)
-        ydlh = YoutubeDLHandler(self.params, debuglevel=debuglevel)
+        https_handler = make_HTTPS_handler(
+            self.params, debuglevel=debuglevel, connection_pool=self._connection_pool)
+        ydlh = YoutubeDLHandler(self.params, debuglevel=debuglevel, connection_pool=self._connection_pool)
         redirect_handler = YoutubeDLRedirectHandler()
         data_handler = urllib.request.DataHandler()
 
@@ -3824,7 +4107,7 @@ def _write_info_json(self, label, ie_result, infofn, overwrite=None):
 
         self.to_screen(f'[info] Writing {label} metadata as JSON to: {infofn}')
         try:
-            write_json_file(self.sanitize_info(ie_result, self.params.get('clean_infojson', True)), infofn)
+            self._write_info_json_file(ie_result, infofn)
             return True
         except OSError:
             self.report_error(f'Cannot write {label} metadata to JSON file {infofn}')
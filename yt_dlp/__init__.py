@@ -192,6 +192,9 @@ def validate_minmax(min_val, max_val, min_name, max_name=None):
     validate_positive('autonumber start', opts.autonumber_start)
     validate_positive('autonumber size', opts.autonumber_size, True)
     validate_positive('concurrent fragments', opts.concurrent_fragment_downloads, True)
+    validate_positive('concurrent entries', opts.concurrent_entries, True)
+    validate_positive('HTTP connections', opts.http_connections, True)
+    validate_positive('HTTP pool size', opts.http_pool_size)
     validate_positive('playlist start', opts.playliststart, True)
     if opts.playlistend != -1:
         validate_minmax(opts.playliststart, opts.playlistend, 'playlist start', 'playlist end')
@@ -391,6 +394,8 @@ def metadataparser_actions(f):
 
     opts.match_filter = match_filter_func(opts.match_filter)
 
+    validate(opts.download_archive is not None or not (opts.import_download_archive or opts.export_download_archive),
+             'download archive', msg='{name} missing')
     if opts.download_archive is not None:
         opts.download_archive = expand_path(opts.download_archive)
 
@@ -769,6 +774,8 @@ def parse_options(argv=None):
         'skip_unavailable_fragments': opts.skip_unavailable_fragments,
         'keep_fragments': opts.keep_fragments,
         'concurrent_fragment_downloads': opts.concurrent_fragment_downloads,
+        'concurrent_entries': opts.concurrent_entries,
+        'http_connections': opts.http_connections,
         'buffersize': opts.buffersize,
         'noresizebuffer': opts.noresizebuffer,
         'http_chunk_size': opts.http_chunk_size,
@@ -821,6 +828,7 @@ def parse_options(argv=None):
         'max_views': opts.max_views,
         'daterange': opts.date,
         'cachedir': opts.cachedir,
+        'cache_backend': opts.cache_backend,
         'youtube_print_sig_code': opts.youtube_print_sig_code,
         'age_limit': opts.age_limit,
         'download_archive': opts.download_archive,
@@ -855,6 +863,7 @@ def parse_options(argv=None):
         'postprocessors': postprocessors,
         'fixup': opts.fixup,
         'source_address': opts.source_address,
+        'http_pool_size': opts.http_pool_size,
         'call_home': opts.call_home,
         'sleep_interval_requests': opts.sleep_interval_requests,
         'sleep_interval': opts.sleep_interval,
@@ -884,7 +893,9 @@ def parse_options(argv=None):
         'compat_opts': opts.compat_opts,
 
         'selenium_browner_headless': opts.selenium_browner_headless,
-        'selenium_browner_timeout': opts.selenium_browner_timeout
+        'selenium_browner_timeout': opts.selenium_browner_timeout,
+        'selenium_browner_pool_size': opts.selenium_browner_pool_size,
+        'selenium_browner_idle_timeout': opts.selenium_browner_idle_timeout,
     })
 
 
@@ -903,11 +914,16 @@ def _real_main(argv=None):
         return
 
     with YoutubeDL(ydl_opts) as ydl:
-        pre_process = opts.update_self or opts.rm_cachedir
+        pre_process = (opts.update_self or opts.rm_cachedir
+                       or opts.import_download_archive or opts.export_download_archive)
         actual_use = all_urls or opts.load_info_filename
 
         if opts.rm_cachedir:
             ydl.cache.remove()
+        if opts.import_download_archive:
+            ydl.archive.import_text(expand_path(opts.import_download_archive))
+        if opts.export_download_archive:
+            ydl.archive.export_text(expand_path(opts.export_download_archive))
 
         updater = Updater(ydl)
         if opts.update_self and updater.update() and actual_use:
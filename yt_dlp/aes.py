@@ -1,4 +1,6 @@
 import base64
+import functools
+import struct
 from math import ceil
 
 from .compat import compat_ord
@@ -10,6 +12,10 @@ def aes_cbc_decrypt_bytes(data, key, iv):
         """ Decrypt bytes with AES-CBC using pycryptodome """
         return Cryptodome_AES.new(key, Cryptodome_AES.MODE_CBC, iv).decrypt(data)
 
+    def aes_ctr_decrypt_bytes(data, key, iv):
+        """ Decrypt bytes with AES-CTR using pycryptodome """
+        return Cryptodome_AES.new(key, Cryptodome_AES.MODE_CTR, nonce=b'', initial_value=iv).decrypt(data)
+
     def aes_gcm_decrypt_and_verify_bytes(data, key, tag, nonce):
         """ Decrypt bytes with AES-GCM using pycryptodome """
         return Cryptodome_AES.new(key, Cryptodome_AES.MODE_GCM, nonce).decrypt_and_verify(data, tag)
@@ -17,11 +23,15 @@ def aes_gcm_decrypt_and_verify_bytes(data, key, tag, nonce):
 else:
     def aes_cbc_decrypt_bytes(data, key, iv):
         """ Decrypt bytes with AES-CBC using native implementation since pycryptodome is unavailable """
-        return intlist_to_bytes(aes_cbc_decrypt(*map(bytes_to_intlist, (data, key, iv))))
+        return _aes_cbc_decrypt_native(data, key, iv)
+
+    def aes_ctr_decrypt_bytes(data, key, iv):
+        """ Decrypt bytes with AES-CTR using native implementation since pycryptodome is unavailable """
+        return _aes_ctr_native(data, key, iv)
 
     def aes_gcm_decrypt_and_verify_bytes(data, key, tag, nonce):
         """ Decrypt bytes with AES-GCM using native implementation since pycryptodome is unavailable """
-        return intlist_to_bytes(aes_gcm_decrypt_and_verify(*map(bytes_to_intlist, (data, key, tag, nonce))))
+        return _aes_gcm_decrypt_and_verify_native(data, key, tag, nonce)
 
 
 def aes_cbc_encrypt_bytes(data, key, iv, **kwargs):
@@ -306,10 +316,9 @@ def aes_decrypt_text(data, password, key_size_bytes):
     nonce = data[:NONCE_LENGTH_BYTES]
     cipher = data[NONCE_LENGTH_BYTES:]
 
-    decrypted_data = aes_ctr_decrypt(cipher, key, nonce + [0] * (BLOCK_SIZE_BYTES - NONCE_LENGTH_BYTES))
-    plaintext = intlist_to_bytes(decrypted_data)
-
-    return plaintext
+    return aes_ctr_decrypt_bytes(
+        intlist_to_bytes(cipher), intlist_to_bytes(key),
+        intlist_to_bytes(nonce + [0] * (BLOCK_SIZE_BYTES - NONCE_LENGTH_BYTES)))
 
 
 RCON = (0x8d, 0x01, 0x02, 0x04, 0x08, 0x10, 0x20, 0x40, 0x80, 0x1b, 0x36)
@@ -533,10 +542,185 @@ def ghash(subkey, data):
     return last_y
 
 
+# Table-driven implementation of the *_bytes functions, used when pycryptodome is unavailable.
+# Each round of a block is done with 32-bit words and four lookups per word in tables
+# combining SubBytes, ShiftRows and MixColumns (see "The Design of Rijndael", section 4.2)
+
+def _gf_mul(a, b):
+    res = 0
+    while b:
+        if b & 1:
+            res ^= a
+        a = ((a << 1) ^ 0x11B) if a & 0x80 else a << 1
+        b >>= 1
+    return res
+
+
+def _make_round_tables(sbox, coefficients):
+    table = [int.from_bytes(bytes(_gf_mul(sbox[x], c) for c in coefficients), 'big') for x in range(256)]
+    return (table, *([(w >> shift) | ((w << (32 - shift)) & 0xFFFFFFFF) for w in table] for shift in (8, 16, 24)))
+
+
+_TE0, _TE1, _TE2, _TE3 = _make_round_tables(SBOX, (2, 1, 1, 3))
+_TD0, _TD1, _TD2, _TD3 = _make_round_tables(SBOX_INV, (14, 9, 13, 11))
+
+
+@functools.lru_cache(maxsize=16)
+def _round_keys(key):
+    """
+    Precompute the round keys of a key as 32-bit words
+
+    @param {bytes} key  16/24/32-Byte cipher key
+    @returns            (encryption round keys, decryption round keys), as tuples of 4-word tuples
+    """
+    expanded_key = bytes(key_expansion(list(key)))
+    words = struct.unpack(f'>{len(expanded_key) // 4}I', expanded_key)
+    enc = tuple(words[i:i + 4] for i in range(0, len(words), 4))
+    # The equivalent inverse cipher needs InvMixColumns applied to the inner round keys
+    dec = [enc[-1]] + [tuple(
+        _TD0[SBOX[w >> 24]] ^ _TD1[SBOX[(w >> 16) & 0xFF]] ^ _TD2[SBOX[(w >> 8) & 0xFF]] ^ _TD3[SBOX[w & 0xFF]]
+        for w in round_key) for round_key in enc[-2:0:-1]] + [enc[0]]
+    return enc, tuple(dec)
+
+
+def _aes_encrypt_blocks(blocks, key):
+    """
+    Encrypt whole blocks with aes
+
+    @param {bytes} blocks  cleartext, of a length multiple of 16
+    @param {bytes} key     16/24/32-Byte cipher key
+    @returns {bytes}       encrypted data
+    """
+    round_keys, _ = _round_keys(bytes(key))
+    (k0, k1, k2, k3), inner_keys, (f0, f1, f2, f3) = round_keys[0], round_keys[1:-1], round_keys[-1]
+    te0, te1, te2, te3, sbox = _TE0, _TE1, _TE2, _TE3, SBOX
+
+    words = struct.unpack(f'>{len(blocks) // 4}I', blocks)
+    out = []
+    for i in range(0, len(words), 4):
+        s0, s1, s2, s3 = words[i] ^ k0, words[i + 1] ^ k1, words[i + 2] ^ k2, words[i + 3] ^ k3
+        for r0, r1, r2, r3 in inner_keys:
+            s0, s1, s2, s3 = (
+                te0[s0 >> 24] ^ te1[(s1 >> 16) & 0xFF] ^ te2[(s2 >> 8) & 0xFF] ^ te3[s3 & 0xFF] ^ r0,
+                te0[s1 >> 24] ^ te1[(s2 >> 16) & 0xFF] ^ te2[(s3 >> 8) & 0xFF] ^ te3[s0 & 0xFF] ^ r1,
+                te0[s2 >> 24] ^ te1[(s3 >> 16) & 0xFF] ^ te2[(s0 >> 8) & 0xFF] ^ te3[s1 & 0xFF] ^ r2,
+                te0[s3 >> 24] ^ te1[(s0 >> 16) & 0xFF] ^ te2[(s1 >> 8) & 0xFF] ^ te3[s2 & 0xFF] ^ r3)
+        out += (
+            (sbox[s0 >> 24] << 24 | sbox[(s1 >> 16) & 0xFF] << 16 | sbox[(s2 >> 8) & 0xFF] << 8 | sbox[s3 & 0xFF]) ^ f0,
+            (sbox[s1 >> 24] << 24 | sbox[(s2 >> 16) & 0xFF] << 16 | sbox[(s3 >> 8) & 0xFF] << 8 | sbox[s0 & 0xFF]) ^ f1,
+            (sbox[s2 >> 24] << 24 | sbox[(s3 >> 16) & 0xFF] << 16 | sbox[(s0 >> 8) & 0xFF] << 8 | sbox[s1 & 0xFF]) ^ f2,
+            (sbox[s3 >> 24] << 24 | sbox[(s0 >> 16) & 0xFF] << 16 | sbox[(s1 >> 8) & 0xFF] << 8 | sbox[s2 & 0xFF]) ^ f3)
+    return struct.pack(f'>{len(out)}I', *out)
+
+
+def _aes_decrypt_blocks(blocks, key):
+    """
+    Decrypt whole blocks with aes
+
+    @param {bytes} blocks  cipher, of a length multiple of 16
+    @param {bytes} key     16/24/32-Byte cipher key
+    @returns {bytes}       decrypted data
+    """
+    _, round_keys = _round_keys(bytes(key))
+    (k0, k1, k2, k3), inner_keys, (f0, f1, f2, f3) = round_keys[0], round_keys[1:-1], round_keys[-1]
+    td0, td1, td2, td3, sbox = _TD0, _TD1, _TD2, _TD3, SBOX_INV
+
+    words = struct.unpack(f'>{len(blocks) // 4}I', blocks)
+    out = []
+    for i in range(0, len(words), 4):
+        s0, s1, s2, s3 = words[i] ^ k0, words[i + 1] ^ k1, words[i + 2] ^ k2, words[i + 3] ^ k3
+        for r0, r1, r2, r3 in inner_keys:
+            s0, s1, s2, s3 = (
+                td0[s0 >> 24] ^ td1[(s3 >> 16) & 0xFF] ^ td2[(s2 >> 8) & 0xFF] ^ td3[s1 & 0xFF] ^ r0,
+                td0[s1 >> 24] ^ td1[(s0 >> 16) & 0xFF] ^ td2[(s3 >> 8) & 0xFF] ^ td3[s2 & 0xFF] ^ r1,
+                td0[s2 >> 24] ^ td1[(s1 >> 16) & 0xFF] ^ td2[(s0 >> 8) & 0xFF] ^ td3[s3 & 0xFF] ^ r2,
+                td0[s3 >> 24] ^ td1[(s2 >> 16) & 0xFF] ^ td2[(s1 >> 8) & 0xFF] ^ td3[s0 & 0xFF] ^ r3)
+        out += (
+            (sbox[s0 >> 24] << 24 | sbox[(s3 >> 16) & 0xFF] << 16 | sbox[(s2 >> 8) & 0xFF] << 8 | sbox[s1 & 0xFF]) ^ f0,
+            (sbox[s1 >> 24] << 24 | sbox[(s0 >> 16) & 0xFF] << 16 | sbox[(s3 >> 8) & 0xFF] << 8 | sbox[s2 & 0xFF]) ^ f1,
+            (sbox[s2 >> 24] << 24 | sbox[(s1 >> 16) & 0xFF] << 16 | sbox[(s0 >> 8) & 0xFF] << 8 | sbox[s3 & 0xFF]) ^ f2,
+            (sbox[s3 >> 24] << 24 | sbox[(s2 >> 16) & 0xFF] << 16 | sbox[(s1 >> 8) & 0xFF] << 8 | sbox[s0 & 0xFF]) ^ f3)
+    return struct.pack(f'>{len(out)}I', *out)
+
+
+def _xor_bytes(data1, data2):
+    """Xor data1 with the start of data2, as whole integers"""
+    size = len(data1)
+    return (int.from_bytes(data1, 'big') ^ int.from_bytes(data2[:size], 'big')).to_bytes(size, 'big')
+
+
+def _aes_cbc_decrypt_native(data, key, iv):
+    data = bytes(data)
+    blocks = data + bytes(-len(data) % BLOCK_SIZE_BYTES)
+    return _xor_bytes(_aes_decrypt_blocks(blocks, key), bytes(iv) + blocks)[:len(data)]
+
+
+_MASK_128 = (1 << 128) - 1
+
+
+def _aes_ctr_native(data, key, iv):
+    block_count = -(-len(data) // BLOCK_SIZE_BYTES)
+    start = int.from_bytes(iv, 'big')
+    counter_blocks = b''.join(
+        ((start + i) & _MASK_128).to_bytes(BLOCK_SIZE_BYTES, 'big') for i in range(block_count))
+    return _xor_bytes(bytes(data), _aes_encrypt_blocks(counter_blocks, key))
+
+
+def _ghash_tables(subkey):
+    """
+    Precompute the products of the subkey by each byte value at each byte position of a block,
+    so that multiplying a block takes a lookup per byte (NIST SP 800-38D, section 6.3)
+    """
+    powers = [int.from_bytes(subkey, 'big')]  # subkey * x^i for the i-th bit of a block
+    for _ in range(127):
+        v = powers[-1]
+        powers.append((v >> 1) ^ (0xE1 << 120) if v & 1 else v >> 1)
+    tables = []
+    for position in range(BLOCK_SIZE_BYTES):
+        table = [0] * 256
+        for byte in range(1, 256):
+            low_bit = byte & -byte  # The most significant bit of a byte is its first bit
+            table[byte] = table[byte ^ low_bit] ^ powers[position * 8 + 8 - low_bit.bit_length()]
+        tables.append(table)
+    return tables
+
+
+def _ghash_native(tables, data):
+    data = data + bytes(-len(data) % BLOCK_SIZE_BYTES)
+    y = 0
+    for i in range(0, len(data), BLOCK_SIZE_BYTES):
+        x = y ^ int.from_bytes(data[i:i + BLOCK_SIZE_BYTES], 'big')
+        y = 0
+        for table, byte in zip(tables, x.to_bytes(BLOCK_SIZE_BYTES, 'big')):
+            y ^= table[byte]
+    return y
+
+
+def _aes_gcm_decrypt_and_verify_native(data, key, tag, nonce):
+    data, nonce = bytes(data), bytes(nonce)
+    tables = _ghash_tables(_aes_encrypt_blocks(bytes(BLOCK_SIZE_BYTES), key))
+
+    if len(nonce) == 12:
+        j0 = nonce + b'\x00\x00\x00\x01'
+    else:
+        j0 = _ghash_native(tables, nonce + bytes(-len(nonce) % BLOCK_SIZE_BYTES + 8)
+                           + (8 * len(nonce)).to_bytes(8, 'big')).to_bytes(BLOCK_SIZE_BYTES, 'big')
+
+    iv_ctr = ((int.from_bytes(j0, 'big') + 1) & _MASK_128).to_bytes(BLOCK_SIZE_BYTES, 'big')
+    decrypted_data = _aes_ctr_native(data, key, iv_ctr)
+    s_tag = _ghash_native(tables, data + bytes(-len(data) % BLOCK_SIZE_BYTES) + (len(data) * 8).to_bytes(16, 'big'))
+
+    if bytes(tag) != _aes_ctr_native(s_tag.to_bytes(BLOCK_SIZE_BYTES, 'big'), key, j0):
+        raise ValueError("Mismatching authentication tag")
+
+    return decrypted_data
+
+
 __all__ = [
     'aes_cbc_decrypt',
     'aes_cbc_decrypt_bytes',
     'aes_ctr_decrypt',
+    'aes_ctr_decrypt_bytes',
     'aes_decrypt_text',
     'aes_decrypt',
     'aes_ecb_decrypt',
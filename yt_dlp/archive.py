@@ -0,0 +1,140 @@
+import contextlib
+import errno
+import os
+import threading
+
+from .dependencies import sqlite3
+from .utils import locked_file
+
+
+class DownloadArchive:
+    """
+    Set of the IDs of downloaded videos, persisted in a file
+
+    Added IDs may be buffered until batch_size of them are pending or
+    flush() is called
+    """
+
+    def __init__(self, fn, batch_size=1):
+        self.fn = fn
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._pending = []
+
+    @staticmethod
+    def open(fn, batch_size=1):
+        """Open the archive fn with the backend matching its extension"""
+        if os.path.splitext(fn)[1].lower() in SQLiteDownloadArchive.EXTENSIONS:
+            if not sqlite3:
+                raise ImportError('sqlite3 is required for a download archive named like a database')
+            return SQLiteDownloadArchive(fn, batch_size)
+        return TextDownloadArchive(fn, batch_size)
+
+    def __contains__(self, vid_id):
+        raise NotImplementedError('This method must be implemented by subclasses')
+
+    def __iter__(self):
+        raise NotImplementedError('This method must be implemented by subclasses')
+
+    def _write(self, vid_ids):
+        raise NotImplementedError('This method must be implemented by subclasses')
+
+    def add(self, vid_id):
+        with self._lock:
+            self._pending.append(vid_id)
+            if len(self._pending) < self.batch_size:
+                return
+            pending, self._pending = self._pending, []
+            self._write(pending)
+
+    def update(self, vid_ids):
+        for vid_id in vid_ids:
+            self.add(vid_id)
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if pending:
+                self._write(pending)
+
+    def close(self):
+        self.flush()
+
+    def import_text(self, fn):
+        """Add the IDs of the text archive fn"""
+        with locked_file(fn, 'r', encoding='utf-8') as archive_file:
+            self.update(filter(None, (line.strip() for line in archive_file)))
+
+    def export_text(self, fn):
+        """Write all the IDs to fn in the text archive format"""
+        self.flush()
+        with locked_file(fn, 'w', encoding='utf-8') as archive_file:
+            for vid_id in self:
+                archive_file.write(vid_id + '\n')
+
+
+class TextDownloadArchive(DownloadArchive):
+    """One ID per line. The whole file is loaded in memory"""
+
+    def __init__(self, fn, batch_size=1):
+        super().__init__(fn, batch_size)
+        self._ids = set()
+        try:
+            with locked_file(fn, 'r', encoding='utf-8') as archive_file:
+                for line in archive_file:
+                    self._ids.add(line.strip())
+        except OSError as ioe:
+            if ioe.errno != errno.ENOENT:
+                raise
+
+    def __contains__(self, vid_id):
+        return vid_id in self._ids
+
+    def __iter__(self):
+        return iter(sorted(self._ids - {''}))
+
+    def add(self, vid_id):
+        self._ids.add(vid_id)
+        super().add(vid_id)
+
+    def _write(self, vid_ids):
+        with locked_file(self.fn, 'a', encoding='utf-8') as archive_file:
+            archive_file.write(''.join(f'{vid_id}\n' for vid_id in vid_ids))
+
+
+class SQLiteDownloadArchive(DownloadArchive):
+    """
+    The IDs are the primary key of a SQLite table, so lookups do not need
+    to load the archive and see the IDs added by other processes
+    """
+    EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+
+    def __init__(self, fn, batch_size=1):
+        super().__init__(fn, batch_size)
+        # Other processes may hold a write lock on the database for a while
+        self._conn = sqlite3.connect(fn, timeout=30, isolation_level=None, check_same_thread=False)
+        with contextlib.suppress(sqlite3.DatabaseError):
+            self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS archive (id TEXT PRIMARY KEY) WITHOUT ROWID')
+
+    def __contains__(self, vid_id):
+        with self._lock:
+            if vid_id in self._pending:
+                return True
+            return bool(self._conn.execute('SELECT 1 FROM archive WHERE id = ?', (vid_id, )).fetchone())
+
+    def __iter__(self):
+        with self._lock:
+            rows = self._conn.execute('SELECT id FROM archive ORDER BY id').fetchall()
+        return (vid_id for vid_id, in rows)
+
+    def _write(self, vid_ids):
+        with self._conn:
+            self._conn.execute('BEGIN IMMEDIATE')
+            self._conn.executemany('INSERT OR IGNORE INTO archive (id) VALUES (?)', ((i, ) for i in vid_ids))
+
+    def close(self):
+        super().close()
+        with self._lock:
+            self._conn.close()
@@ -1,17 +1,218 @@
+import collections
 import contextlib
 import errno
 import json
 import os
 import re
 import shutil
+import threading
+import time
 import traceback
 
+from .dependencies import sqlite3
 from .utils import expand_path, write_json_file
 
+_NAME_RE = re.compile(r'^[a-zA-Z0-9_.-]+$')
+
+
+class CacheBackend:
+    """
+    Storage for the JSON-serializable entries of the cache, grouped in sections
+
+    Backends must tolerate other processes using the same storage concurrently
+    """
+
+    def load(self, section, key):
+        """Return a (data, mtime) tuple for the entry, or None if it does not exist"""
+        raise NotImplementedError('This method must be implemented by subclasses')
+
+    def store(self, section, key, data):
+        raise NotImplementedError('This method must be implemented by subclasses')
+
+    def delete(self, section, key=None):
+        """Delete an entry, or the whole section if key is None"""
+        raise NotImplementedError('This method must be implemented by subclasses')
+
+    def entries(self, section):
+        """Return a list of (key, mtime) tuples of the entries of section"""
+        raise NotImplementedError('This method must be implemented by subclasses')
+
+    def prune(self, section, ttl=None, max_entries=None):
+        """Delete entries older than ttl seconds and all but the max_entries newest ones"""
+        now = time.time()
+        entries = sorted(self.entries(section), key=lambda entry: entry[1], reverse=True)
+        for idx, (key, mtime) in enumerate(entries):
+            if (ttl is not None and now - mtime > ttl) or (max_entries is not None and idx >= max_entries):
+                self.delete(section, key)
+
+    def close(self):
+        pass
+
+
+class FileCacheBackend(CacheBackend):
+    """Every entry is a <root_dir>/<section>/<key>.json file"""
+
+    def __init__(self, root_dir):
+        self.root_dir = root_dir
+
+    def _get_cache_fn(self, section, key):
+        return os.path.join(self.root_dir, section, f'{key}.json')
+
+    def load(self, section, key):
+        try:
+            with open(self._get_cache_fn(section, key), encoding='utf-8') as cachef:
+                return json.load(cachef), os.fstat(cachef.fileno()).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def store(self, section, key, data):
+        fn = self._get_cache_fn(section, key)
+        try:
+            os.makedirs(os.path.dirname(fn))
+        except OSError as ose:
+            if ose.errno != errno.EEXIST:
+                raise
+        write_json_file(data, fn)
+
+    def delete(self, section, key=None):
+        if key is None:
+            shutil.rmtree(os.path.join(self.root_dir, section), ignore_errors=True)
+            return
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self._get_cache_fn(section, key))
+
+    def entries(self, section):
+        res = []
+        with contextlib.suppress(FileNotFoundError), os.scandir(os.path.join(self.root_dir, section)) as it:
+            for entry in it:
+                if not entry.name.endswith('.json'):
+                    continue
+                # The entry may be deleted by another process meanwhile
+                with contextlib.suppress(FileNotFoundError):
+                    res.append((entry.name[:-len('.json')], entry.stat().st_mtime))
+        return res
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """All the entries are rows of a single SQLite database"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _execute(self, *args):
+        with self._lock:
+            if self._conn is None:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                # Other processes may hold a write lock on the database for a while
+                conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+                with contextlib.suppress(sqlite3.DatabaseError):
+                    conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS cache (section TEXT NOT NULL, key TEXT NOT NULL, '
+                    'data TEXT NOT NULL, mtime REAL NOT NULL, PRIMARY KEY (section, key))')
+                self._conn = conn
+            return self._conn.execute(*args).fetchall()
+
+    def load(self, section, key):
+        rows = self._execute('SELECT data, mtime FROM cache WHERE section = ? AND key = ?', (section, key))
+        return (json.loads(rows[0][0]), rows[0][1]) if rows else None
+
+    def store(self, section, key, data):
+        self._execute(
+            'INSERT OR REPLACE INTO cache (section, key, data, mtime) VALUES (?, ?, ?, ?)',
+            (section, key, json.dumps(data, ensure_ascii=False), time.time()))
+
+    def delete(self, section, key=None):
+        if key is None:
+            self._execute('DELETE FROM cache WHERE section = ?', (section, ))
+        else:
+            self._execute('DELETE FROM cache WHERE section = ? AND key = ?', (section, key))
+
+    def entries(self, section):
+        return self._execute('SELECT key, mtime FROM cache WHERE section = ?', (section, ))
+
+    def prune(self, section, ttl=None, max_entries=None):
+        if ttl is not None:
+            self._execute('DELETE FROM cache WHERE section = ? AND mtime < ?', (section, time.time() - ttl))
+        if max_entries is not None:
+            self._execute(
+                'DELETE FROM cache WHERE section = ? AND key NOT IN ('
+                'SELECT key FROM cache WHERE section = ? ORDER BY mtime DESC LIMIT ?)',
+                (section, section, max_entries))
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class MemoryCacheBackend(CacheBackend):
+    """
+    An in-memory LRU layer of at most max_entries entries in front of another backend
+
+    The entries are kept serialized so that callers cannot modify the cached data
+    """
+
+    def __init__(self, backend, max_entries=256):
+        self.backend = backend
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+
+    def _remember(self, section, key, entry):
+        with self._lock:
+            self._entries[section, key] = entry
+            self._entries.move_to_end((section, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def load(self, section, key):
+        with self._lock:
+            entry = self._entries.get((section, key))
+            if entry is not None:
+                self._entries.move_to_end((section, key))
+                return json.loads(entry[0]), entry[1]
+        entry = self.backend.load(section, key)
+        if entry is not None:
+            self._remember(section, key, (json.dumps(entry[0]), entry[1]))
+        return entry
+
+    def store(self, section, key, data):
+        self.backend.store(section, key, data)
+        self._remember(section, key, (json.dumps(data), time.time()))
+
+    def delete(self, section, key=None):
+        with self._lock:
+            for cached in [k for k in self._entries if k[0] == section and key in (None, k[1])]:
+                del self._entries[cached]
+        self.backend.delete(section, key)
+
+    def entries(self, section):
+        return self.backend.entries(section)
+
+    def prune(self, section, ttl=None, max_entries=None):
+        with self._lock:
+            for cached in [k for k in self._entries if k[0] == section]:
+                del self._entries[cached]
+        self.backend.prune(section, ttl, max_entries)
+
+    def close(self):
+        self.backend.close()
+
 
 class Cache:
+    # Default (ttl in seconds, max_entries) of sections that would otherwise grow forever
+    SECTION_LIMITS = {
+        'youtube-sigfuncs': (30 * 24 * 60 * 60, 500),
+        'youtube-nsig': (30 * 24 * 60 * 60, 500),
+    }
+
     def __init__(self, ydl):
         self._ydl = ydl
+        self._backend = None
 
     def _get_root_dir(self):
         res = self._ydl.params.get('cachedir')
@@ -21,9 +222,8 @@ def _get_root_dir(self):
         return expand_path(res)
 
     def _get_cache_fn(self, section, key, dtype):
-        assert re.match(r'^[a-zA-Z0-9_.-]+$', section), \
-            'invalid section %r' % section
-        assert re.match(r'^[a-zA-Z0-9_.-]+$', key), 'invalid key %r' % key
+        assert _NAME_RE.match(section), 'invalid section %r' % section
+        assert _NAME_RE.match(key), 'invalid key %r' % key
         return os.path.join(
             self._get_root_dir(), section, f'{key}.{dtype}')
 
@@ -31,6 +231,27 @@ def _get_cache_fn(self, section, key, dtype):
     def enabled(self):
         return self._ydl.params.get('cachedir') is not False
 
+    @property
+    def backend(self):
+        if self._backend is None:
+            backend_name = self._ydl.params.get('cache_backend') or 'file'
+            if backend_name == 'sqlite' and not sqlite3:
+                self._ydl.report_warning(
+                    'Cannot use the sqlite cache backend without sqlite3 support. Falling back to file')
+                backend_name = 'file'
+            if backend_name == 'sqlite':
+                backend = SQLiteCacheBackend(os.path.join(self._get_root_dir(), 'cache.sqlite3'))
+            else:
+                backend = FileCacheBackend(self._get_root_dir())
+            self._backend = MemoryCacheBackend(backend)
+        return self._backend
+
+    def _get_limits(self, section):
+        limits = (self._ydl.params.get('cache_limits') or {}).get(section)
+        if limits is None:
+            return self.SECTION_LIMITS.get(section, (None, None))
+        return limits.get('ttl'), limits.get('max_entries')
+
     def store(self, section, key, data, dtype='json'):
         assert dtype in ('json',)
 
@@ -39,13 +260,11 @@ def store(self, section, key, data, dtype='json'):
 
         fn = self._get_cache_fn(section, key, dtype)
         try:
-            try:
-                os.makedirs(os.path.dirname(fn))
-            except OSError as ose:
-                if ose.errno != errno.EEXIST:
-                    raise
             self._ydl.write_debug(f'Saving {section}.{key} to cache')
-            write_json_file(data, fn)
+            self.backend.store(section, key, data)
+            ttl, max_entries = self._get_limits(section)
+            if ttl is not None or max_entries is not None:
+                self.backend.prune(section, ttl, max_entries)
         except Exception:
             tb = traceback.format_exc()
             self._ydl.report_warning(f'Writing cache to {fn!r} failed: {tb}')
@@ -57,20 +276,44 @@ def load(self, section, key, dtype='json', default=None):
             return default
 
         cache_fn = self._get_cache_fn(section, key, dtype)
-        with contextlib.suppress(OSError):
+        try:
+            entry = self.backend.load(section, key)
+        except OSError:
+            entry = None
+        except ValueError:
+            entry = None
             try:
-                with open(cache_fn, encoding='utf-8') as cachef:
-                    self._ydl.write_debug(f'Loading {section}.{key} from cache')
-                    return json.load(cachef)
-            except ValueError:
-                try:
-                    file_size = os.path.getsize(cache_fn)
-                except OSError as oe:
-                    file_size = str(oe)
-                self._ydl.report_warning(f'Cache retrieval from {cache_fn} failed ({file_size})')
+                file_size = os.path.getsize(cache_fn)
+            except OSError as oe:
+                file_size = str(oe)
+            self._ydl.report_warning(f'Cache retrieval from {cache_fn} failed ({file_size})')
+        except Exception as e:
+            entry = None
+            self._ydl.report_warning(f'Cache retrieval of {section}.{key} failed: {e}')
+
+        if entry is not None:
+            data, mtime = entry
+            ttl, _ = self._get_limits(section)
+            if ttl is None or time.time() - mtime <= ttl:
+                self._ydl.write_debug(f'Loading {section}.{key} from cache')
+                return data
 
         return default
 
+    def delete(self, section, key=None):
+        """Delete an entry of the cache, or the whole section if key is None"""
+        if not self.enabled:
+            return
+        assert _NAME_RE.match(section), 'invalid section %r' % section
+        assert key is None or _NAME_RE.match(key), 'invalid key %r' % key
+        with contextlib.suppress(OSError):
+            self.backend.delete(section, key)
+
+    def close(self):
+        if self._backend is not None:
+            self._backend.close()
+            self._backend = None
+
     def remove(self):
         if not self.enabled:
             self._ydl.to_screen('Cache is disabled (Did you combine --no-cache-dir and --rm-cache-dir?)')
@@ -80,6 +323,7 @@ def remove(self):
         if not any((term in cachedir) for term in ('cache', 'tmp')):
             raise Exception('Not removing directory %s - this does not look like a cache dir' % cachedir)
 
+        self.close()
         self._ydl.to_screen(
             'Removing cache dir %s .' % cachedir, skip_eol=True)
         if os.path.exists(cachedir):
@@ -72,6 +72,12 @@ def compat_expanduser(path):
     compat_expanduser = os.path.expanduser
 
 
+try:
+    from re import _parser as compat_sre_parse  # >= 3.11
+except ImportError:
+    import sre_parse as compat_sre_parse  # noqa: F401
+
+
 # NB: Add modules that are imported dynamically here so that PyInstaller can find them
 # See https://github.com/pyinstaller/pyinstaller-hooks-contrib/issues/438
 if False:
@@ -68,6 +68,9 @@ class FileDownloader:
     http_chunk_size:    Size of a chunk for chunk-based HTTP downloading. May be
                         useful for bypassing bandwidth throttling imposed by
                         a webserver (experimental)
+    http_connections:   Number of connections to download a file of known size
+                        over HTTP with, each writing its own part of the file.
+                        The remaining parts are kept in the .ytdl file for resuming
     progress_template:  See YoutubeDL.py
     retry_sleep_functions: See YoutubeDL.py
 
@@ -282,12 +285,17 @@ def _prepare_multiline_status(self, lines=1):
             self._multiline = QuietMultilinePrinter()
         elif self.ydl.params.get('logger'):
             self._multiline = MultilineLogger(self.ydl.params['logger'], lines)
-        elif self.params.get('progress_with_newline'):
+        elif self.params.get('progress_with_newline') or self._entry_label:
+            # Progress of concurrently processed playlist entries can only be multiplexed line by line
             self._multiline = BreaklineStatusPrinter(self.ydl._out_files.out, lines)
         else:
             self._multiline = MultilinePrinter(self.ydl._out_files.out, lines, not self.params.get('quiet'))
         self._multiline.allow_colors = self._multiline._HAVE_FULLCAP and not self.params.get('no_color')
 
+    @property
+    def _entry_label(self):
+        return getattr(self.ydl, '_entry_label', '')
+
     def _finish_multiline_status(self):
         self._multiline.end()
 
@@ -314,7 +322,7 @@ def _report_progress_status(self, s, default_template):
         progress_dict = {'info': s['info_dict'], 'progress': progress_dict}
 
         progress_template = self.params.get('progress_template', {})
-        self._multiline.print_at_line(self.ydl.evaluate_outtmpl(
+        self._multiline.print_at_line(self._entry_label + self.ydl.evaluate_outtmpl(
             progress_template.get('download') or '[download] %(progress._default_template)s',
             progress_dict), s.get('progress_idx') or 0)
         self.to_console_title(self.ydl.evaluate_outtmpl(
@@ -1,5 +1,4 @@
 import base64
-import io
 import itertools
 import struct
 import time
@@ -15,12 +14,23 @@ class DataTruncatedError(Exception):
     pass
 
 
-class FlvReader(io.BytesIO):
+class FlvReader:
     """
     Reader for Flv files
     The file format is documented in https://www.adobe.com/devnet/f4v.html
+
+    The data is accessed through a memoryview, so the boxes are not copied
     """
 
+    def __init__(self, data=b''):
+        self._data = memoryview(data)
+        self._pos = 0
+
+    def read(self, n=-1):
+        start = self._pos
+        self._pos = len(self._data) if n is None or n < 0 else min(start + n, len(self._data))
+        return self._data[start:self._pos]
+
     def read_bytes(self, n):
         data = self.read(n)
         if len(data) < n:
@@ -40,12 +50,11 @@ def read_unsigned_char(self):
         return struct.unpack('!B', self.read_bytes(1))[0]
 
     def read_string(self):
-        res = b''
-        while True:
-            char = self.read_bytes(1)
-            if char == b'\x00':
-                break
-            res += char
+        end = self._pos
+        while end < len(self._data) and self._data[end]:
+            end += 1
+        res = bytes(self.read_bytes(end - self._pos))
+        self.read_bytes(1)
         return res
 
     def read_box_info(self):
@@ -53,7 +62,7 @@ def read_box_info(self):
         Read a box and return the info as a tuple: (box_size, box_type, box_data)
         """
         real_size = size = self.read_unsigned_int()
-        box_type = self.read_bytes(4)
+        box_type = bytes(self.read_bytes(4))
         header_end = 8
         if size == 1:
             real_size = self.read_unsigned_long_long()
@@ -306,6 +315,24 @@ def _parse_bootstrap_node(self, node, base_url):
             boot_info = read_bootstrap_info(bootstrap)
         return boot_info, bootstrap_url
 
+    def _fixup_fragment(self, ctx, frag_bytes):
+        if not frag_bytes:
+            return frag_bytes
+        reader = FlvReader(frag_bytes)
+        while True:
+            try:
+                _, box_type, box_data = reader.read_box_info()
+            except DataTruncatedError:
+                if self.params.get('test', False):
+                    # In tests, segments may be truncated, and thus
+                    # FlvReader may not be able to parse the whole
+                    # chunk. If so, write the segment as is
+                    # See https://github.com/ytdl-org/youtube-dl/issues/9214
+                    return frag_bytes
+                raise
+            if box_type == b'mdat':
+                return box_data
+
     def real_download(self, filename, info_dict):
         man_url = info_dict['url']
         requested_bitrate = info_dict.get('tbr')
@@ -368,45 +395,39 @@ def real_download(self, filename, info_dict):
                 write_metadata_tag(dest_stream, metadata)
 
         base_url_parsed = urllib.parse.urlparse(base_url)
+        query = []
+        if base_url_parsed.query:
+            query.append(base_url_parsed.query)
+        if akamai_pv:
+            query.append(akamai_pv.strip(';'))
+        if info_dict.get('extra_param_to_segment_url'):
+            query.append(info_dict['extra_param_to_segment_url'])
+
+        def fragment_url(seg_i, frag_i):
+            name = 'Seg%d-Frag%d' % (seg_i, frag_i)
+            return base_url_parsed._replace(path=base_url_parsed.path + name, query='&'.join(query)).geturl()
 
         self._start_frag_download(ctx, info_dict)
 
+        if not live:
+            # All the fragments are known in advance, so they can be downloaded concurrently
+            fragments = [{
+                'frag_index': frag_index,
+                'url': fragment_url(seg_i, frag_i),
+            } for frag_index, (seg_i, frag_i) in enumerate(fragments_list, 1) if frag_index > ctx['fragment_index']]
+            return self.download_and_append_fragments(ctx, fragments, info_dict)
+
         frag_index = 0
         while fragments_list:
             seg_i, frag_i = fragments_list.pop(0)
             frag_index += 1
             if frag_index <= ctx['fragment_index']:
                 continue
-            name = 'Seg%d-Frag%d' % (seg_i, frag_i)
-            query = []
-            if base_url_parsed.query:
-                query.append(base_url_parsed.query)
-            if akamai_pv:
-                query.append(akamai_pv.strip(';'))
-            if info_dict.get('extra_param_to_segment_url'):
-                query.append(info_dict['extra_param_to_segment_url'])
-            url_parsed = base_url_parsed._replace(path=base_url_parsed.path + name, query='&'.join(query))
             try:
-                success = self._download_fragment(ctx, url_parsed.geturl(), info_dict)
+                success = self._download_fragment(ctx, fragment_url(seg_i, frag_i), info_dict)
                 if not success:
                     return False
-                down_data = self._read_fragment(ctx)
-                reader = FlvReader(down_data)
-                while True:
-                    try:
-                        _, box_type, box_data = reader.read_box_info()
-                    except DataTruncatedError:
-                        if test:
-                            # In tests, segments may be truncated, and thus
-                            # FlvReader may not be able to parse the whole
-                            # chunk. If so, write the segment as is
-                            # See https://github.com/ytdl-org/youtube-dl/issues/9214
-                            dest_stream.write(down_data)
-                            break
-                        raise
-                    if box_type == b'mdat':
-                        self._append_fragment(ctx, box_data)
-                        break
+                self._append_fragment(ctx, self._fixup_fragment(ctx, self._read_fragment(ctx)))
             except urllib.error.HTTPError as err:
                 if live and (err.code == 404 or err.code == 410):
                     # We didn't keep up with the live window. Continue
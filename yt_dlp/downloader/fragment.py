@@ -1,10 +1,13 @@
+import collections
 import concurrent.futures
 import contextlib
 import http.client
+import itertools
 import json
 import math
 import os
 import struct
+import tempfile
 import threading
 import time
 import urllib.error
@@ -19,6 +22,7 @@
     encodeFilename,
     error_to_compat_str,
     sanitized_Request,
+    timeconvert,
     traverse_obj,
 )
 
@@ -95,11 +99,40 @@ def __call__(self, value):
 
 
 class HttpQuietDownloader(HttpFD):
+    def __init__(self, ydl, params):
+        super().__init__(ydl, params)
+        self._sink = threading.local()
+
     def to_screen(self, *args, **kargs):
         pass
 
     to_console_title = to_screen
 
+    def download_to_buffer(self, buffer, info_dict):
+        """Download into the writable file object buffer instead of a file on disk"""
+        self._sink.buffer = buffer
+        try:
+            return self.download('-', info_dict)
+        finally:
+            self._sink.buffer = None
+
+    def sanitize_open(self, filename, open_mode):
+        buffer = getattr(self._sink, 'buffer', None)
+        if filename != '-' or buffer is None:
+            return super().sanitize_open(filename, open_mode)
+        if 'a' in open_mode:
+            buffer.seek(0, os.SEEK_END)
+        else:
+            buffer.seek(0)
+            buffer.truncate()
+        return buffer, filename
+
+    def try_utime(self, filename, last_modified_hdr):
+        if filename != '-' or getattr(self._sink, 'buffer', None) is None:
+            return super().try_utime(filename, last_modified_hdr)
+        # There is no file to touch; only report the time to the fragment downloader
+        return last_modified_hdr and timeconvert(last_modified_hdr) or None
+
 
 class FragmentFD(FileDownloader):
     """
@@ -113,9 +146,19 @@ class FragmentFD(FileDownloader):
                         Skip unavailable fragments (DASH and hlsnative only)
     keep_fragments:     Keep downloaded fragments on disk after downloading is
                         finished
-    concurrent_fragment_downloads:  The number of threads to use for native hls and dash downloads
+    concurrent_fragment_downloads:  The number of threads to use for native hls, dash, ism and f4m downloads
     _no_ytdl_file:      Don't use .ytdl file
 
+    Unless keep_fragments is set, fragments are not written to disk one by one.
+    Each fragment is downloaded into a buffer that is kept in memory up to
+    _FRAGMENT_BUFFER_SIZE bytes (and spilled to an anonymous temporary file
+    beyond that) and is appended to the destination file from there.
+
+    When the sizes of all fragments are known in advance (byte ranges) and
+    several fragments are downloaded concurrently, the destination file is
+    preallocated and each fragment is written at its final offset as soon as
+    it completes instead of waiting for the fragments before it.
+
     For each incomplete fragment download yt-dlp keeps on disk a special
     bookkeeping file with download state and metadata (in future such files will
     be used for any incomplete download handled by yt-dlp). This file is
@@ -133,10 +176,17 @@ class FragmentFD(FileDownloader):
                 index:  0-based index of current fragment among all fragments
             fragment_count:
                 Total count of fragments
+            fragment_bitmap:
+                Hex-encoded bitmap of the completed fragments (bit i of byte j
+                is set when fragment 8*j+i+1 is complete). Only present when the
+                fragments are written at their final offsets of a preallocated
+                file as they complete, in which case current_fragment stays 0
 
     This feature is experimental and file format may change in future.
     """
 
+    _FRAGMENT_BUFFER_SIZE = 8 * 1024 * 1024
+
     def report_retry_fragment(self, err, frag_index, count, retries):
         self.to_screen(
             '\r[download] Got server HTTP error: %s. Retrying fragment %d (attempt %d of %s) ...'
@@ -166,6 +216,8 @@ def _read_ytdl_file(self, ctx):
             ctx['fragment_index'] = ytdl_data['downloader']['current_fragment']['index']
             if 'extra_state' in ytdl_data['downloader']:
                 ctx['extra_state'] = ytdl_data['downloader']['extra_state']
+            if 'fragment_bitmap' in ytdl_data['downloader']:
+                ctx['fragment_bitmap'] = bytearray.fromhex(ytdl_data['downloader']['fragment_bitmap'])
         except Exception:
             ctx['ytdl_corrupt'] = True
         finally:
@@ -181,6 +233,8 @@ def _write_ytdl_file(self, ctx):
             }
             if 'extra_state' in ctx:
                 downloader['extra_state'] = ctx['extra_state']
+            if 'fragment_bitmap' in ctx:
+                downloader['fragment_bitmap'] = ctx['fragment_bitmap'].hex()
             if ctx.get('fragment_count') is not None:
                 downloader['fragment_count'] = ctx['fragment_count']
             frag_index_stream.write(json.dumps({'downloader': downloader}))
@@ -188,21 +242,38 @@ def _write_ytdl_file(self, ctx):
             frag_index_stream.close()
 
     def _download_fragment(self, ctx, frag_url, info_dict, headers=None, request_data=None):
-        fragment_filename = '%s-Frag%d' % (ctx['tmpfilename'], ctx['fragment_index'])
         fragment_info_dict = {
             'url': frag_url,
             'http_headers': headers or info_dict.get('http_headers'),
             'request_data': request_data,
         }
-        success, _ = ctx['dl'].download(fragment_filename, fragment_info_dict)
-        if not success:
-            return False
+        if ctx.get('fragment_sink'):
+            buffer = tempfile.SpooledTemporaryFile(self._FRAGMENT_BUFFER_SIZE)
+            try:
+                success, _ = ctx['dl'].download_to_buffer(buffer, fragment_info_dict)
+            except BaseException:
+                buffer.close()
+                raise
+            if not success:
+                buffer.close()
+                return False
+            ctx['fragment_buffer'] = buffer
+        else:
+            fragment_filename = '%s-Frag%d' % (ctx['tmpfilename'], ctx['fragment_index'])
+            success, _ = ctx['dl'].download(fragment_filename, fragment_info_dict)
+            if not success:
+                return False
+            ctx['fragment_filename_sanitized'] = fragment_filename
         if fragment_info_dict.get('filetime'):
             ctx['fragment_filetime'] = fragment_info_dict.get('filetime')
-        ctx['fragment_filename_sanitized'] = fragment_filename
         return True
 
     def _read_fragment(self, ctx):
+        buffer = ctx.pop('fragment_buffer', None)
+        if buffer is not None:
+            with buffer:
+                buffer.seek(0)
+                return buffer.read()
         if not ctx.get('fragment_filename_sanitized'):
             return None
         try:
@@ -223,12 +294,16 @@ def _append_fragment(self, ctx, frag_content):
         try:
             ctx['dest_stream'].write(frag_content)
             ctx['dest_stream'].flush()
-        finally:
+            # Only record the fragment as done once it is fully written
             if self.__do_ytdl_file(ctx):
                 self._write_ytdl_file(ctx)
-            if not self.params.get('keep_fragments', False):
-                self.try_remove(encodeFilename(ctx['fragment_filename_sanitized']))
-            del ctx['fragment_filename_sanitized']
+        finally:
+            self._remove_fragment_file(ctx)
+
+    def _remove_fragment_file(self, ctx):
+        fragment_filename = ctx.pop('fragment_filename_sanitized', None)
+        if fragment_filename and not self.params.get('keep_fragments', False):
+            self.try_remove(encodeFilename(fragment_filename))
 
     def _prepare_frag_download(self, ctx):
         if 'live' not in ctx:
@@ -242,10 +317,16 @@ def _prepare_frag_download(self, ctx):
             total_frags_str = 'unknown (live)'
         self.to_screen(f'[{self.FD_NAME}] Total fragments: {total_frags_str}')
         self.report_destination(ctx['filename'])
+        fragment_sink = not self.params.get('keep_fragments', False)
         dl = HttpQuietDownloader(self.ydl, {
             **self.params,
             'noprogress': True,
             'test': False,
+            'http_connections': 1,
+            # Fragments are never downloaded in parts, so there is no parts map to look for
+            '_no_ytdl_file': True,
+            # Fragment buffers start out empty and have no filesystem metadata
+            **({'continuedl': False, 'xattr_set_filesize': False} if fragment_sink else {}),
         })
         tmpfilename = self.temp_name(ctx['filename'])
         open_mode = 'wb'
@@ -266,7 +347,8 @@ def _prepare_frag_download(self, ctx):
             if os.path.isfile(encodeFilename(self.ytdl_filename(ctx['filename']))):
                 self._read_ytdl_file(ctx)
                 is_corrupt = ctx.get('ytdl_corrupt') is True
-                is_inconsistent = ctx['fragment_index'] > 0 and resume_len == 0
+                is_inconsistent = resume_len == 0 and (
+                    ctx['fragment_index'] > 0 or any(ctx.get('fragment_bitmap') or b''))
                 if is_corrupt or is_inconsistent:
                     message = (
                         '.ytdl file is corrupt' if is_corrupt else
@@ -274,6 +356,7 @@ def _prepare_frag_download(self, ctx):
                     self.report_warning(
                         '%s. Restarting from the beginning ...' % message)
                     ctx['fragment_index'] = resume_len = 0
+                    ctx.pop('fragment_bitmap', None)
                     if 'ytdl_corrupt' in ctx:
                         del ctx['ytdl_corrupt']
                     self._write_ytdl_file(ctx)
@@ -285,6 +368,7 @@ def _prepare_frag_download(self, ctx):
 
         ctx.update({
             'dl': dl,
+            'fragment_sink': fragment_sink,
             'dest_stream': dest_stream,
             'tmpfilename': tmpfilename,
             # Total complete fragments downloaded so far in bytes
@@ -425,11 +509,14 @@ def _prepare_external_frag_download(self, ctx):
 
     def decrypter(self, info_dict):
         _key_cache = {}
+        _key_lock = threading.Lock()
 
         def _get_key(url):
-            if url not in _key_cache:
-                _key_cache[url] = self.ydl.urlopen(self._prepare_url(info_dict, url)).read()
-            return _key_cache[url]
+            # Fragments may be decrypted concurrently
+            with _key_lock:
+                if url not in _key_cache:
+                    _key_cache[url] = self.ydl.urlopen(self._prepare_url(info_dict, url)).read()
+                return _key_cache[url]
 
         def decrypt_fragment(fragment, frag_content):
             decrypt_info = fragment.get('decrypt_info')
@@ -446,6 +533,33 @@ def decrypt_fragment(fragment, frag_content):
 
         return decrypt_fragment
 
+    def _fragment_layout(self, ctx, fragments, info_dict):
+        """
+        Get the offset and size in the output file of each fragment, indexed by frag_index,
+        if the fragments can be written at their final place in any order. Otherwise, None
+        """
+        if (not self.__do_ytdl_file(ctx) or info_dict.get('is_live')
+                or type(self)._fixup_fragment is not FragmentFD._fixup_fragment):
+            return None
+        # A partial download without a bitmap has been appended to in order
+        if 'fragment_bitmap' not in ctx and (ctx['fragment_index'] or ctx['complete_frags_downloaded_bytes']):
+            return None
+
+        layout, offset = {}, 0
+        for frag_index, fragment in enumerate(fragments, 1):
+            byte_range = fragment.get('byte_range') or {}
+            start, end = byte_range.get('start'), byte_range.get('end')
+            if (fragment['frag_index'] != frag_index or None in (start, end)
+                    or traverse_obj(fragment, ('decrypt_info', 'METHOD')) == 'AES-128'):
+                return None
+            layout[frag_index] = (offset, end - start)
+            offset += end - start
+
+        bitmap = ctx.get('fragment_bitmap')
+        if not layout or bitmap is not None and len(bitmap) != math.ceil(len(layout) / 8):
+            return None
+        return layout
+
     def download_and_append_fragments_multiple(self, *args, pack_func=None, finish_func=None):
         '''
         @params (ctx1, fragments1, info_dict1), (ctx2, fragments2, info_dict2), ...
@@ -522,6 +636,7 @@ def download_and_append_fragments(
             ((lambda _: False) if info_dict.get('is_live') else (lambda idx: idx == 0))
             if self.params.get('skip_unavailable_fragments', True) else (lambda _: True))
 
+        is_packed = pack_func is not None or finish_func is not None
         if not pack_func:
             pack_func = lambda frag_content, _: frag_content
 
@@ -579,27 +694,174 @@ def append_fragment(frag_content, frag_index, ctx):
 
         max_workers = math.ceil(
             self.params.get('concurrent_fragment_downloads', 1) / ctx.get('max_progress', 1))
-        if max_workers > 1:
+
+        layout = None
+        if max_workers > 1 or 'fragment_bitmap' in ctx:
+            fragments = list(fragments)
+            if not is_packed:
+                layout = self._fragment_layout(ctx, fragments, info_dict)
+            if layout is None and 'fragment_bitmap' in ctx:
+                self.report_warning(
+                    'Unable to resume out-of-order fragment download. Restarting from the beginning ...')
+                del ctx['fragment_bitmap']
+                ctx['dest_stream'].truncate(0)
+                ctx['complete_frags_downloaded_bytes'] = 0
+
+        if layout:
+            def place_fragment(fragment):
+                ctx_copy = ctx.copy()
+                download_fragment(fragment, ctx_copy)
+                frag_content = self._read_fragment(ctx_copy)
+                if not frag_content:
+                    return fragment, None
+                frag_content = decrypt_fragment(fragment, frag_content)
+                offset, size = layout[fragment['frag_index']]
+                if len(frag_content) == size:
+                    write_at(frag_content, offset)
+                return fragment, len(frag_content)
+
+            write_lock = threading.Lock()
+
+            def write_at(data, offset):
+                data = memoryview(data)
+                while data:
+                    if hasattr(os, 'pwrite'):
+                        written = os.pwrite(fd, data, offset)
+                    else:
+                        with write_lock:
+                            os.lseek(fd, offset, os.SEEK_SET)
+                            written = os.write(fd, data)
+                    data, offset = data[written:], offset + written
+
+            bitmap = ctx.setdefault('fragment_bitmap', bytearray(math.ceil(len(layout) / 8)))
+            is_complete = lambda frag_index: bitmap[(frag_index - 1) // 8] & (1 << ((frag_index - 1) % 8))
+            total_size = sum(size for _, size in layout.values())
+            skipped = set()
+
+            def compact_fragments(chunk_size=1024 * 1024):
+                write_offset = 0
+                for frag_index, (offset, size) in sorted(layout.items()):
+                    if frag_index in skipped:
+                        continue
+                    if offset != write_offset:
+                        for pos in range(0, size, chunk_size):
+                            os.lseek(fd, offset + pos, os.SEEK_SET)
+                            write_at(os.read(fd, min(chunk_size, size - pos)), write_offset + pos)
+                    write_offset += size
+                os.ftruncate(fd, write_offset)
+
+            fd = os.open(encodeFilename(ctx['tmpfilename']), os.O_RDWR | getattr(os, 'O_BINARY', 0))
+            try:
+                if os.fstat(fd).st_size != total_size:
+                    # Record the bitmap before the file grows so that an interrupted
+                    # download is never resumed by appending to the preallocated file
+                    bitmap[:] = bytes(len(bitmap))
+                    self._write_ytdl_file(ctx)
+                    os.ftruncate(fd, total_size)
+                    if hasattr(os, 'posix_fallocate'):
+                        with contextlib.suppress(OSError):
+                            os.posix_fallocate(fd, 0, total_size)
+                ctx['complete_frags_downloaded_bytes'] = sum(
+                    size for frag_index, (_, size) in layout.items() if is_complete(frag_index))
+
+                remaining = iter([fragment for fragment in fragments if not is_complete(fragment['frag_index'])])
+                with tpe or concurrent.futures.ThreadPoolExecutor(max_workers) as pool:
+                    try:
+                        pending = set()
+                        while True:
+                            if interrupt_trigger[0]:
+                                for fragment in itertools.islice(remaining, 2 * max_workers - len(pending)):
+                                    pending.add(pool.submit(place_fragment, fragment))
+                            if not pending:
+                                break
+                            done, pending = concurrent.futures.wait(
+                                pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                            for future in done:
+                                fragment, frag_size = future.result()
+                                frag_index = fragment['frag_index']
+                                if frag_size is None:
+                                    if is_fatal(frag_index - 1):
+                                        ctx['dest_stream'].close()
+                                        self.report_error(f'fragment {frag_index} not found, unable to continue')
+                                        return False
+                                    self.report_skip_fragment(frag_index, 'fragment not found')
+                                    skipped.add(frag_index)
+                                    continue
+                                elif frag_size != layout[frag_index][1]:
+                                    ctx['dest_stream'].close()
+                                    self.report_error(
+                                        f'fragment {frag_index} has an unexpected size of {frag_size} bytes '
+                                        f'instead of {layout[frag_index][1]}, unable to continue')
+                                    return False
+                                bitmap[(frag_index - 1) // 8] |= 1 << ((frag_index - 1) % 8)
+                                if self.__do_ytdl_file(ctx):
+                                    self._write_ytdl_file(ctx)
+                    except KeyboardInterrupt:
+                        self._finish_multiline_status()
+                        self.report_error(
+                            'Interrupted by user. Waiting for all threads to shutdown...', is_error=False, tb=False)
+                        pool.shutdown(wait=False)
+                        raise
+
+                if skipped:
+                    # Close the holes left by the skipped fragments
+                    compact_fragments()
+            finally:
+                os.close(fd)
+        elif max_workers > 1:
             def _download_fragment(fragment):
                 ctx_copy = ctx.copy()
                 download_fragment(fragment, ctx_copy)
-                return fragment, fragment['frag_index'], ctx_copy.get('fragment_filename_sanitized')
+                return fragment, ctx_copy
+
+            def _process_fragment(fragment, ctx_copy):
+                frag_content = self._read_fragment(ctx_copy)
+                if frag_content:
+                    frag_content = decrypt_fragment(fragment, self._fixup_fragment(ctx_copy, frag_content))
+                return fragment, ctx_copy.get('fragment_filename_sanitized'), frag_content
 
-            with tpe or concurrent.futures.ThreadPoolExecutor(max_workers) as pool:
+            def submit(fragment):
+                # Each downloaded fragment is fixed up and decrypted in process_pool, so that
+                # this overlaps with the other downloads and with the writes of the previous fragments
+                processed = concurrent.futures.Future()
+
+                def process(download):
+                    try:
+                        processed.set_result(process_pool.submit(_process_fragment, *download.result()))
+                    except BaseException as e:
+                        processed.set_exception(e)
+
+                pool.submit(_download_fragment, fragment).add_done_callback(process)
+                return processed
+
+            def pipelined_map(iterable):
+                # Yield the processed fragments in order, keeping only a limited number
+                # of them waiting to be appended
+                pending = collections.deque()
+                for item in iterable:
+                    pending.append(submit(item))
+                    if len(pending) >= 2 * max_workers:
+                        yield pending.popleft().result().result()
+                while pending:
+                    yield pending.popleft().result().result()
+
+            process_pool = concurrent.futures.ThreadPoolExecutor(max_workers)
+            # The downloads must be finished before process_pool is shut down
+            with process_pool, tpe or concurrent.futures.ThreadPoolExecutor(max_workers) as pool:
                 try:
-                    for fragment, frag_index, frag_filename in pool.map(_download_fragment, fragments):
+                    for fragment, frag_filename, frag_content in pipelined_map(fragments):
                         ctx.update({
                             'fragment_filename_sanitized': frag_filename,
-                            'fragment_index': frag_index,
+                            'fragment_index': fragment['frag_index'],
                         })
-                        frag_bytes = self._fixup_fragment(ctx, self._read_fragment(ctx))
-                        if not append_fragment(decrypt_fragment(fragment, frag_bytes), frag_index, ctx):
+                        if not append_fragment(frag_content, fragment['frag_index'], ctx):
                             return False
                 except KeyboardInterrupt:
                     self._finish_multiline_status()
                     self.report_error(
                         'Interrupted by user. Waiting for all threads to shutdown...', is_error=False, tb=False)
                     pool.shutdown(wait=False)
+                    process_pool.shutdown(wait=False)
                     raise
         else:
             for fragment in fragments:
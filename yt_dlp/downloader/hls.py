@@ -258,6 +258,8 @@ def is_ad_fragment_end(s):
             return fd.real_download(filename, info_dict)
 
         if is_webvtt:
+            dedup_merger = webvtt.CueMerger.from_json(extra_state.get('webvtt_dedup_window') or [])
+
             def pack_fragment(frag_content, frag_index):
                 output = io.StringIO()
                 adjust = 0
@@ -272,33 +274,8 @@ def pack_fragment(frag_content, frag_index):
                         block.start += adjust
                         block.end += adjust
 
-                        dedup_window = extra_state.setdefault('webvtt_dedup_window', [])
-
-                        ready = []
-
-                        i = 0
-                        is_new = True
-                        while i < len(dedup_window):
-                            wcue = dedup_window[i]
-                            wblock = webvtt.CueBlock.from_json(wcue)
-                            i += 1
-                            if wblock.hinges(block):
-                                wcue['end'] = block.end
-                                is_new = False
-                                continue
-                            if wblock == block:
-                                is_new = False
-                                continue
-                            if wblock.end > block.start:
-                                continue
-                            ready.append(wblock)
-                            i -= 1
-                            del dedup_window[i]
-
-                        if is_new:
-                            dedup_window.append(block.as_json)
-                        for block in ready:
-                            block.write_into(output)
+                        for cue in dedup_merger.add(block):
+                            cue.write_into(output)
 
                         # we only emit cues once they fall out of the duplicate window
                         continue
@@ -335,16 +312,13 @@ def pack_fragment(frag_content, frag_index):
                             continue
                     block.write_into(output)
 
+                extra_state['webvtt_dedup_window'] = dedup_merger.as_json
                 return output.getvalue().encode()
 
             def fin_fragments():
-                dedup_window = extra_state.get('webvtt_dedup_window')
-                if not dedup_window:
-                    return b''
-
                 output = io.StringIO()
-                for cue in dedup_window:
-                    webvtt.CueBlock.from_json(cue).write_into(output)
+                for cue in dedup_merger.flush():
+                    cue.write_into(output)
 
                 return output.getvalue().encode()
 
@@ -1,14 +1,18 @@
+import concurrent.futures
 import http.client
+import json
 import os
 import random
 import socket
 import ssl
+import threading
 import time
 import urllib.error
 
 from .common import FileDownloader
 from ..utils import (
     ContentTooShortError,
+    DownloadError,
     ThrottledDownload,
     XAttrMetadataError,
     XAttrUnavailableError,
@@ -30,6 +34,9 @@
 
 
 class HttpFD(FileDownloader):
+    # Smallest part a download over several connections is split into
+    _MIN_PART_SIZE = 1024 * 1024
+
     def real_download(self, filename, info_dict):
         url = info_dict['url']
         request_data = info_dict.get('request_data', None)
@@ -64,6 +71,14 @@ class DownloadContext(dict):
         # parse given Range
         req_start, req_end, _ = parse_http_range(headers.get('Range'))
 
+        if (self.params.get('http_connections', 1) > 1 and not is_test and ctx.tmpfilename != '-'
+                and req_start is None and req_end is None and not self.params.get('ratelimit')):
+            success = self._download_in_parts(ctx, url, request_data, headers, chunk_size, info_dict)
+            if success is not None:
+                return success
+        if ctx.tmpfilename != '-' and not self.params.get('_no_ytdl_file'):
+            self._discard_part_map(ctx)
+
         if self.params.get('continuedl', True):
             # Establish possible resume length
             if os.path.isfile(encodeFilename(ctx.tmpfilename)):
@@ -389,3 +404,255 @@ def retry(e):
 
         self.report_error('giving up after %s retries' % retries)
         return False
+
+    def _read_part_map(self, ctx):
+        """Get the file size and the remaining [start, end) ranges of an interrupted download in parts"""
+        ytdl_filename = encodeFilename(self.ytdl_filename(ctx.filename))
+        if not os.path.isfile(ytdl_filename):
+            return None, None
+        try:
+            with open(ytdl_filename, encoding='utf-8') as f:
+                ytdl_data = json.load(f)['downloader']
+            return ytdl_data['filesize'], [list(part) for part in ytdl_data['http_parts']]
+        except Exception:
+            return None, None
+
+    def _write_part_map(self, ctx, filesize, parts):
+        with open(encodeFilename(self.ytdl_filename(ctx.filename)), 'w', encoding='utf-8') as f:
+            json.dump({'downloader': {'filesize': filesize, 'http_parts': parts}}, f)
+
+    def _discard_part_map(self, ctx):
+        """The .part file of a download in parts has holes and cannot be appended to"""
+        filesize, _ = self._read_part_map(ctx)
+        if filesize is None:
+            return
+        self.report_unable_to_resume()
+        self.try_remove(encodeFilename(self.ytdl_filename(ctx.filename)))
+        if os.path.isfile(encodeFilename(ctx.tmpfilename)):
+            self.try_remove(encodeFilename(ctx.tmpfilename))
+
+    def _download_in_parts(self, ctx, url, request_data, headers, chunk_size, info_dict):
+        """
+        Download the file over several connections, each writing its own part of the file.
+        Returns None if the server does not support it
+        """
+        try:
+            probe = self.ydl.urlopen(sanitized_Request(url, request_data, {**headers, 'Range': 'bytes=0-0'}))
+        except (urllib.error.URLError, *RESPONSE_READ_EXCEPTIONS):
+            return None
+        with probe:
+            probe.read()
+        content_range_start, _, filesize = parse_http_range(probe.headers.get('Content-Range'))
+        if probe.getcode() != 206 or content_range_start != 0 or not filesize:
+            return None
+        if filesize < 2 * self._MIN_PART_SIZE:
+            return None
+
+        min_data_len = self.params.get('min_filesize')
+        max_data_len = self.params.get('max_filesize')
+        if min_data_len is not None and filesize < min_data_len:
+            self.to_screen(
+                f'\r[download] File is smaller than min-filesize ({filesize} bytes < {min_data_len} bytes). Aborting.')
+            return False
+        if max_data_len is not None and filesize > max_data_len:
+            self.to_screen(
+                f'\r[download] File is larger than max-filesize ({filesize} bytes > {max_data_len} bytes). Aborting.')
+            return False
+
+        connections = self.params['http_connections']
+        # With --no-continue, an interrupted download is started over and its parts map replaced
+        resumed_filesize, parts = (
+            self._read_part_map(ctx) if self.params.get('continuedl', True) else (None, None))
+        tmpfilename = encodeFilename(ctx.tmpfilename)
+        if (resumed_filesize != filesize or not os.path.isfile(tmpfilename)
+                or os.path.getsize(tmpfilename) != filesize):
+            if resumed_filesize is not None:
+                self.report_unable_to_resume()
+            part_size = -(-filesize // connections)
+            parts = [[start, min(start + part_size, filesize)] for start in range(0, filesize, part_size)]
+            self._write_part_map(ctx, filesize, parts)
+            with open(tmpfilename, 'wb') as f:
+                f.truncate(filesize)
+        resume_len = filesize - sum(end - start for start, end in parts)
+        if resume_len:
+            self.report_resuming_byte(resume_len)
+        self.report_destination(ctx.filename)
+
+        if self.params.get('xattr_set_filesize', False):
+            try:
+                write_xattr(ctx.tmpfilename, 'user.ytdl.filesize', str(filesize).encode())
+            except (XAttrUnavailableError, XAttrMetadataError) as err:
+                self.report_error('unable to set filesize xattr: %s' % str(err))
+
+        lock = threading.Lock()
+        # Parts that are not being downloaded by any connection
+        pending = [part for part in parts if part[0] < part[1]]
+        # Parts being downloaded, mapped to the lock held while the part is written
+        active = {}
+        state = {'last_save': time.monotonic(), 'error': None}
+        retries = self.params.get('retries', 0)
+        throttled_rate = (self.params.get('throttledratelimit') or 0) / connections
+        start_time = time.time()
+
+        def save_part_map(force=False):
+            with lock:
+                if force or time.monotonic() - state['last_save'] > 1:
+                    state['last_save'] = time.monotonic()
+                    self._write_part_map(ctx, filesize, [part for part in parts if part[0] < part[1]])
+
+        def split_part(part):
+            # Hand over the second half of the remaining range of part to a new part
+            with active[id(part)]:
+                start, end = part
+                if end - start < 2 * self._MIN_PART_SIZE:
+                    return None
+                new_part = [start + (end - start) // 2, end]
+                part[1] = new_part[0]
+            parts.append(new_part)
+            return new_part
+
+        def next_part():
+            with lock:
+                if state['error']:
+                    return None
+                if pending:
+                    part = pending.pop(0)
+                else:
+                    # Help with the biggest remaining part
+                    busy = [part for part in parts if id(part) in active and part[0] < part[1]]
+                    part = busy and split_part(max(busy, key=lambda p: p[1] - p[0]))
+                    if not part:
+                        return None
+                active[id(part)] = threading.Lock()
+                return part
+
+        def report_progress():
+            with lock:
+                downloaded = filesize - sum(end - start for start, end in parts)
+            now = time.time()
+            self._hook_progress({
+                'status': 'downloading',
+                'downloaded_bytes': downloaded,
+                'total_bytes': filesize,
+                'tmpfilename': ctx.tmpfilename,
+                'filename': ctx.filename,
+                'eta': self.calc_eta(start_time, now, filesize - resume_len, downloaded - resume_len),
+                'speed': self.calc_speed(start_time, now, downloaded - resume_len),
+                'elapsed': now - ctx.start_time,
+            }, info_dict)
+
+        def download_part(part, fd):
+            count, block_size = 0, ctx.block_size
+            while part[0] < part[1]:
+                range_end = part[1] if not chunk_size else min(part[1], part[0] + chunk_size)
+                request = sanitized_Request(
+                    url, request_data, {**headers, 'Range': f'bytes={part[0]}-{range_end - 1}'})
+                try:
+                    data = self.ydl.urlopen(request)
+                    with data:
+                        range_start, _, _ = parse_http_range(data.headers.get('Content-Range'))
+                        if data.getcode() != 206 or range_start != part[0]:
+                            raise DownloadError(f'Server did not honor the requested range {part[0]}-{range_end - 1}')
+                        part_start = before = time.time()
+                        throttle_start, received = None, 0
+                        while not state['error']:
+                            data_block = data.read(block_size)
+                            if not data_block:
+                                if part[0] < min(part[1], range_end):
+                                    raise ContentTooShortError(received, range_end - range_start)
+                                break
+                            with active[id(part)]:
+                                data_block = data_block[:part[1] - part[0]]
+                                write_at(fd, data_block, part[0])
+                                part[0] += len(data_block)
+                            received += len(data_block)
+                            count = 0
+                            report_progress()
+                            save_part_map()
+                            if part[0] >= min(part[1], range_end):
+                                break
+
+                            after = time.time()
+                            if not self.params.get('noresizebuffer', False):
+                                block_size = self.best_block_size(after - before, len(data_block))
+                            before = after
+
+                            speed = self.calc_speed(part_start, after, received)
+                            if speed and speed < throttled_rate:
+                                throttle_start = throttle_start or time.time()
+                                if time.time() - throttle_start > 3:
+                                    # Give half of the slow part to a new connection and reconnect
+                                    with lock:
+                                        new_part = split_part(part)
+                                        if new_part:
+                                            pending.append(new_part)
+                                    break
+                            else:
+                                throttle_start = None
+                except (urllib.error.URLError, ContentTooShortError, *RESPONSE_READ_EXCEPTIONS) as err:
+                    if isinstance(err, urllib.error.HTTPError) and not 500 <= err.code < 600:
+                        raise
+                    count += 1
+                    if count > retries:
+                        raise
+                    self.report_retry(err, count, retries)
+                if state['error']:
+                    return
+
+        write_lock = threading.Lock()
+
+        def write_at(fd, data, offset):
+            data = memoryview(data)
+            while data:
+                if hasattr(os, 'pwrite'):
+                    written = os.pwrite(fd, data, offset)
+                else:
+                    with write_lock:
+                        os.lseek(fd, offset, os.SEEK_SET)
+                        written = os.write(fd, data)
+                data, offset = data[written:], offset + written
+
+        def worker(fd):
+            while True:
+                part = next_part()
+                if not part:
+                    return
+                try:
+                    download_part(part, fd)
+                except BaseException as err:
+                    with lock:
+                        state['error'] = state['error'] or err
+                    raise
+                finally:
+                    with lock:
+                        active.pop(id(part))
+
+        fd = os.open(tmpfilename, os.O_RDWR | getattr(os, 'O_BINARY', 0))
+        try:
+            with concurrent.futures.ThreadPoolExecutor(connections) as pool:
+                for future in [pool.submit(worker, fd) for _ in range(connections)]:
+                    try:
+                        future.result()
+                    except KeyboardInterrupt:
+                        with lock:
+                            state['error'] = state['error'] or KeyboardInterrupt()
+                        raise
+        finally:
+            os.close(fd)
+            save_part_map(force=True)
+        if state['error']:
+            raise state['error']
+
+        self.try_remove(encodeFilename(self.ytdl_filename(ctx.filename)))
+        self.try_rename(ctx.tmpfilename, ctx.filename)
+        if self.params.get('updatetime', True):
+            info_dict['filetime'] = self.try_utime(ctx.filename, probe.headers.get('last-modified', None))
+
+        self._hook_progress({
+            'downloaded_bytes': filesize,
+            'total_bytes': filesize,
+            'filename': ctx.filename,
+            'status': 'finished',
+            'elapsed': time.time() - ctx.start_time,
+        }, info_dict)
+        return True
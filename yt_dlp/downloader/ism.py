@@ -2,7 +2,6 @@
 import io
 import struct
 import time
-import urllib.error
 
 from .fragment import FragmentFD
 
@@ -245,40 +244,20 @@ def real_download(self, filename, info_dict):
             'ism_track_written': False,
         })
 
-        fragment_retries = self.params.get('fragment_retries', 0)
-        skip_unavailable_fragments = self.params.get('skip_unavailable_fragments', True)
-
-        frag_index = 0
-        for i, segment in enumerate(segments):
-            frag_index += 1
-            if frag_index <= ctx['fragment_index']:
-                continue
-            count = 0
-            while count <= fragment_retries:
-                try:
-                    success = self._download_fragment(ctx, segment['url'], info_dict)
-                    if not success:
-                        return False
-                    frag_content = self._read_fragment(ctx)
-
-                    if not extra_state['ism_track_written']:
-                        tfhd_data = extract_box_data(frag_content, [b'moof', b'traf', b'tfhd'])
-                        info_dict['_download_params']['track_id'] = u32.unpack(tfhd_data[4:8])[0]
-                        write_piff_header(ctx['dest_stream'], info_dict['_download_params'])
-                        extra_state['ism_track_written'] = True
-                    self._append_fragment(ctx, frag_content)
-                    break
-                except urllib.error.HTTPError as err:
-                    count += 1
-                    if count <= fragment_retries:
-                        self.report_retry_fragment(err, frag_index, count, fragment_retries)
-            if count > fragment_retries:
-                if skip_unavailable_fragments:
-                    self.report_skip_fragment(frag_index)
-                    continue
-                self.report_error('giving up after %s fragment retries' % fragment_retries)
-                return False
-
-        self._finish_frag_download(ctx, info_dict)
-
-        return True
+        def pack_fragment(frag_content, frag_index):
+            # Fragments are packed in order, so the header is written right before the first one
+            if extra_state['ism_track_written']:
+                return frag_content
+            tfhd_data = extract_box_data(frag_content, [b'moof', b'traf', b'tfhd'])
+            info_dict['_download_params']['track_id'] = u32.unpack(tfhd_data[4:8])[0]
+            header = io.BytesIO()
+            write_piff_header(header, info_dict['_download_params'])
+            extra_state['ism_track_written'] = True
+            return header.getvalue() + frag_content
+
+        fragments = [{
+            'frag_index': frag_index,
+            'url': segment['url'],
+        } for frag_index, segment in enumerate(segments, 1) if frag_index > ctx['fragment_index']]
+
+        return self.download_and_append_fragments(ctx, fragments, info_dict, pack_func=pack_fragment)
@@ -1,4 +1,7 @@
+import concurrent.futures
+import contextlib
 import json
+import os
 import time
 import urllib.error
 
@@ -9,6 +12,9 @@
 class YoutubeLiveChatFD(FragmentFD):
     """ Downloads YouTube live chats fragment by fragment """
 
+    # Seconds between syncs of the output while downloading a replay
+    _REPLAY_SYNC_INTERVAL = 5
+
     def real_download(self, filename, info_dict):
         video_id = info_dict['video_id']
         self.to_screen('[%s] Downloading live chat' % self.FD_NAME)
@@ -31,22 +37,18 @@ def real_download(self, filename, info_dict):
 
         start_time = int(time.time() * 1000)
 
-        def dl_fragment(url, data=None, headers=None):
+        def dl_fragment(url, data=None, headers=None, frag_ctx=None):
             http_headers = info_dict.get('http_headers', {})
             if headers:
                 http_headers = http_headers.copy()
                 http_headers.update(headers)
-            return self._download_fragment(ctx, url, info_dict, http_headers, data)
+            return self._download_fragment(frag_ctx or ctx, url, info_dict, http_headers, data)
 
-        def parse_actions_replay(live_chat_continuation):
+        def replay_continuation(live_chat_continuation):
             offset = continuation_id = click_tracking_params = None
-            processed_fragment = bytearray()
             for action in live_chat_continuation.get('actions', []):
                 if 'replayChatItemAction' in action:
-                    replay_chat_item_action = action['replayChatItemAction']
-                    offset = int(replay_chat_item_action['videoOffsetTimeMsec'])
-                processed_fragment.extend(
-                    json.dumps(action, ensure_ascii=False).encode() + b'\n')
+                    offset = int(action['replayChatItemAction']['videoOffsetTimeMsec'])
             if offset is not None:
                 continuation = try_get(
                     live_chat_continuation,
@@ -54,9 +56,17 @@ def parse_actions_replay(live_chat_continuation):
                 if continuation:
                     continuation_id = continuation.get('continuation')
                     click_tracking_params = continuation.get('clickTrackingParams')
-            self._append_fragment(ctx, processed_fragment)
             return continuation_id, offset, click_tracking_params
 
+        def replay_actions(live_chat_continuation):
+            return b''.join(
+                json.dumps(action, ensure_ascii=False).encode() + b'\n'
+                for action in live_chat_continuation.get('actions', []))
+
+        def parse_actions_replay(live_chat_continuation):
+            self._append_fragment(ctx, replay_actions(live_chat_continuation))
+            return replay_continuation(live_chat_continuation)
+
         def try_refresh_replay_beginning(live_chat_continuation):
             # choose the second option that contains the unfiltered live chat replay
             refresh_continuation = try_get(
@@ -168,21 +178,77 @@ def download_and_parse_fragment(url, frag_index, request_data=None, headers=None
             url = 'https://www.youtube.com/youtubei/v1/live_chat/get_live_chat?key=' + api_key
             chat_page_url = 'https://www.youtube.com/live_chat?continuation=' + continuation_id
 
-        frag_index = offset = 0
-        click_tracking_params = None
-        while continuation_id is not None:
-            frag_index += 1
+        def continuation_request(continuation_id, offset, click_tracking_params):
             request_data = {
                 'context': innertube_context,
                 'continuation': continuation_id,
+                'currentPlayerState': {'playerOffsetMs': str(max(offset - 5000, 0))},
             }
+            if click_tracking_params:
+                request_data['context']['clickTracking'] = {'clickTrackingParams': click_tracking_params}
+            headers = ie.generate_api_headers(ytcfg=ytcfg, visitor_data=visitor_data)
+            headers.update({'content-type': 'application/json'})
+            return json.dumps(request_data, ensure_ascii=False).encode() + b'\n', headers
+
+        def fetch_replay_fragment(frag_index, fragment_request_data, headers):
+            # The API response is JSON, so it is decoded directly from the downloaded bytes
+            frag_ctx = {**ctx, 'fragment_index': frag_index}
+            count = 0
+            while count <= fragment_retries:
+                try:
+                    if not dl_fragment(url, fragment_request_data, headers, frag_ctx):
+                        return None
+                    return frag_ctx, try_get(
+                        json.loads(self._read_fragment(frag_ctx)),
+                        lambda x: x['continuationContents']['liveChatContinuation'], dict) or {}
+                except urllib.error.HTTPError as err:
+                    count += 1
+                    if count <= fragment_retries:
+                        self.report_retry_fragment(err, frag_index, count, fragment_retries)
+            self.report_error('giving up after %s fragment retries' % fragment_retries)
+            return None
+
+        def download_replay(frag_index, continuation_id, offset, click_tracking_params):
+            # Each response names the next continuation, so the next request is sent
+            # as soon as a response is parsed and is in flight while its actions are written
+            dest_stream, last_sync = ctx['dest_stream'], time.monotonic()
+            with concurrent.futures.ThreadPoolExecutor(1) as pool:
+                def submit(frag_index, *continuation):
+                    return pool.submit(fetch_replay_fragment, frag_index, *continuation_request(*continuation))
+
+                future = submit(frag_index, continuation_id, offset, click_tracking_params)
+                while future:
+                    result = future.result()
+                    if result is None:
+                        return False
+                    frag_ctx, live_chat_continuation = result
+                    continuation_id, offset, click_tracking_params = replay_continuation(live_chat_continuation)
+                    future = continuation_id and submit(frag_index + 1, continuation_id, offset, click_tracking_params)
+
+                    # Like _append_fragment, but the output is only flushed every _REPLAY_SYNC_INTERVAL
+                    try:
+                        dest_stream.write(replay_actions(live_chat_continuation))
+                    finally:
+                        self._remove_fragment_file(frag_ctx)
+                    ctx['fragment_index'] = frag_index
+                    frag_index += 1
+                    if not future or time.monotonic() - last_sync >= self._REPLAY_SYNC_INTERVAL:
+                        dest_stream.flush()
+                        with contextlib.suppress(OSError, ValueError):
+                            os.fsync(dest_stream.fileno())
+                        last_sync = time.monotonic()
+            return True
+
+        frag_index = offset = 0
+        click_tracking_params = None
+        while continuation_id is not None:
+            frag_index += 1
             if frag_index > 1:
-                request_data['currentPlayerState'] = {'playerOffsetMs': str(max(offset - 5000, 0))}
-                if click_tracking_params:
-                    request_data['context']['clickTracking'] = {'clickTrackingParams': click_tracking_params}
-                headers = ie.generate_api_headers(ytcfg=ytcfg, visitor_data=visitor_data)
-                headers.update({'content-type': 'application/json'})
-                fragment_request_data = json.dumps(request_data, ensure_ascii=False).encode() + b'\n'
+                if info_dict['protocol'] == 'youtube_live_chat_replay':
+                    if not download_replay(frag_index, continuation_id, offset, click_tracking_params):
+                        return False
+                    break
+                fragment_request_data, headers = continuation_request(continuation_id, offset, click_tracking_params)
                 success, continuation_id, offset, click_tracking_params = download_and_parse_fragment(
                     url, frag_index, fragment_request_data, headers)
             else:
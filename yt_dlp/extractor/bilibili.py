@@ -549,21 +549,12 @@ def _real_extract(self, url):
         chrome_wait_timeout = self.get_param('selenium_browner_timeout', 20)
         headless = self.get_param('selenium_browner_headless', True)
 
-        from ..selenium_container import SeleniumContainer
         from selenium.webdriver.support import expected_conditions as EC
         from selenium.webdriver.common.by import By
 
-        self.to_screen(f'start chrome to query video page...')
-        with SeleniumContainer(
-            headless=headless,
-            close_log_callback=lambda: self.to_screen('Quit chrome and cleanup temp profile...')
-        ) as engine:
-            engine.start()
-
-            if self.get_param('cookiesfrombrowser'):
-                engine.load('https://www.bilibili.com')
-                engine.load_cookies(self._downloader.cookiejar, '.bilibili.com')
-
+        with self._downloader.selenium_pool.lease(
+                headless, cookie_url='https://www.bilibili.com', cookie_domain='.bilibili.com') as engine:
+            engine.capture('https://api.bilibili.com/pugv/')
             engine.load(url)
 
             engine.extract_network()
@@ -74,6 +74,7 @@
     url_basename,
     url_or_none,
     urljoin,
+    valid_url_host_keys,
     variadic,
     xpath_element,
     xpath_text,
@@ -514,6 +515,23 @@ def suitable(cls, url):
         # so that lazy_extractors works correctly
         return cls._match_valid_url(url) is not None
 
+    @classmethod
+    def _get_url_host_keys(cls):
+        """
+        Host suffixes, one of which ends the host of every URL suitable for this IE
+        (see utils.valid_url_host_keys). None if they cannot be determined
+        """
+        if '_URL_HOST_KEYS' not in cls.__dict__:
+            keys = None
+            # Extractors that override these may accept URLs not matching _VALID_URL
+            if (cls.suitable.__func__ is InfoExtractor.suitable.__func__
+                    and cls._match_valid_url.__func__ is InfoExtractor._match_valid_url.__func__):
+                valid_url = cls.__dict__.get('_VALID_URL') or try_call(lambda: cls._make_valid_url())
+                if isinstance(valid_url, str):
+                    keys = valid_url_host_keys(valid_url)
+            cls._URL_HOST_KEYS = keys
+        return cls._URL_HOST_KEYS
+
     @classmethod
     def _match_id(cls, url):
         return cls._match_valid_url(url).group('id')
@@ -1720,8 +1738,12 @@ class FormatSort:
 
         def __init__(self, ie, field_preference):
             self._order = []
+            self._order_ranks = {}
             self.ydl = ie._downloader
+            # The settings are updated with the parsed sort order, so they must not be shared between instances
+            self.settings = {field: dict(setting) for field, setting in self.settings.items()}
             self.evaluate_params(self.ydl.params, field_preference)
+            self._key_functions = tuple(map(self._compile_field, self._order))
             if ie.get_param('verbose'):
                 self.print_verbose_info(self.ydl.write_debug)
 
@@ -1761,17 +1783,7 @@ def _resolve_field_value(self, field, value, convertNone=False):
             elif conversion == 'bytes':
                 return FileDownloader.parse_bytes(value)
             elif conversion == 'order':
-                order_list = (self._use_free_order and self._get_field_setting(field, 'order_free')) or self._get_field_setting(field, 'order')
-                use_regex = self._get_field_setting(field, 'regex')
-                list_length = len(order_list)
-                empty_pos = order_list.index('') if '' in order_list else list_length + 1
-                if use_regex and value is not None:
-                    for i, regex in enumerate(order_list):
-                        if regex and re.match(regex, value):
-                            return list_length - i
-                    return list_length - empty_pos  # not in list
-                else:  # not regex or  value = None
-                    return list_length - (order_list.index(value) if value in order_list else empty_pos)
+                return self._get_order_rank(field)(value)
             else:
                 if value.isnumeric():
                     return float(value)
@@ -1849,46 +1861,90 @@ def print_verbose_info(self, write_debug):
                 if self._get_field_setting(field, 'limit_text') is not None else '')
                 for field in self._order if self._get_field_setting(field, 'visible')]))
 
-        def _calculate_field_preference_from_value(self, format, field, type, value):
-            reverse = self._get_field_setting(field, 'reverse')
-            closest = self._get_field_setting(field, 'closest')
-            limit = self._get_field_setting(field, 'limit')
+        def _get_order_rank(self, field):
+            """Return a memoized function that gives the rank of a value in the order of an 'ordered' field"""
+            if field in self._order_ranks:
+                return self._order_ranks[field]
+
+            order_list = (self._use_free_order and self._get_field_setting(field, 'order_free')) or self._get_field_setting(field, 'order')
+            list_length = len(order_list)
+            empty_pos = order_list.index('') if '' in order_list else list_length + 1
+            # The first occurrence of a value in the list takes precedence
+            ranks = {value: list_length - i for i, value in reversed(tuple(enumerate(order_list)))}
+            ranks.setdefault(None, list_length - empty_pos)
+            not_in_list = list_length - empty_pos
+
+            if self._get_field_setting(field, 'regex'):
+                # The first alternative that matches is chosen, which is the same as trying each regex in order
+                regex = re.compile('|'.join(
+                    f'(?P<_{i}>{regex})' for i, regex in enumerate(order_list) if regex))
+                group_ranks = {f'_{i}': list_length - i for i in range(list_length)}
+
+                def get_rank(value):
+                    mobj = regex.match(value)
+                    return group_ranks[mobj.lastgroup] if mobj else not_in_list
+            else:
+                get_rank = lambda value: ranks.get(value, not_in_list)
+
+            cache = {None: ranks[None]}
+
+            def rank(value):
+                if value not in cache:
+                    cache[value] = get_rank(value.lower())
+                return cache[value]
+
+            self._order_ranks[field] = rank
+            return rank
 
+        def _compile_field(self, field):
+            """Build a function that calculates the preference of a format for the given field"""
+            type = self._get_field_setting(field, 'type')  # extractor, boolean, ordered, field, multiple
+            if type == 'multiple':
+                type = 'field'  # Only 'field' is allowed in multiple for now
+                function = self._get_field_setting(field, 'function')
+                keys = tuple(self._get_field_setting(f, 'field') for f in self._get_field_setting(field, 'field'))
+                get_value = lambda format: function(format.get(key) for key in keys)
+            else:
+                key = self._get_field_setting(field, 'field')
+                get_value = lambda format: format.get(key)
+
+            convert_value = None
             if type == 'extractor':
                 maximum = self._get_field_setting(field, 'max')
-                if value is None or (maximum is not None and value >= maximum):
-                    value = -1
+                convert_value = lambda value: -1 if value is None or (maximum is not None and value >= maximum) else value
             elif type == 'boolean':
                 in_list = self._get_field_setting(field, 'in_list')
                 not_in_list = self._get_field_setting(field, 'not_in_list')
-                value = 0 if ((in_list is None or value in in_list) and (not_in_list is None or value not in not_in_list)) else -1
+                convert_value = lambda value: 0 if (
+                    (in_list is None or value in in_list) and (not_in_list is None or value not in not_in_list)) else -1
             elif type == 'ordered':
-                value = self._resolve_field_value(field, value, True)
-
-            # try to convert to number
-            val_num = float_or_none(value, default=self._get_field_setting(field, 'default'))
-            is_num = self._get_field_setting(field, 'convert') != 'string' and val_num is not None
-            if is_num:
-                value = val_num
-
-            return ((-10, 0) if value is None
-                    else (1, value, 0) if not is_num  # if a field has mixed strings and numbers, strings are sorted higher
-                    else (0, -abs(value - limit), value - limit if reverse else limit - value) if closest
-                    else (0, value, 0) if not reverse and (limit is None or value <= limit)
-                    else (0, -value, 0) if limit is None or (reverse and value == limit) or value > limit
-                    else (-1, value, 0))
-
-        def _calculate_field_preference(self, format, field):
-            type = self._get_field_setting(field, 'type')  # extractor, boolean, ordered, field, multiple
-            get_value = lambda f: format.get(self._get_field_setting(f, 'field'))
-            if type == 'multiple':
-                type = 'field'  # Only 'field' is allowed in multiple for now
-                actual_fields = self._get_field_setting(field, 'field')
+                convert_value = self._get_order_rank(field)
 
-                value = self._get_field_setting(field, 'function')(get_value(f) for f in actual_fields)
-            else:
-                value = get_value(field)
-            return self._calculate_field_preference_from_value(format, field, type, value)
+            reverse = self._get_field_setting(field, 'reverse')
+            closest = self._get_field_setting(field, 'closest')
+            limit = self._get_field_setting(field, 'limit')
+            default = self._get_field_setting(field, 'default')
+            is_string = self._get_field_setting(field, 'convert') == 'string'
+
+            def calculate_preference(format):
+                value = get_value(format)
+                if convert_value:
+                    value = convert_value(value)
+
+                # try to convert to number
+                val_num = float_or_none(value, default=default)
+                is_num = not is_string and val_num is not None
+                if is_num:
+                    value = val_num
+
+                return ((-10, 0) if value is None
+                        else (1, value, 0) if not is_num  # if a field has mixed strings and numbers, strings are sorted higher
+                        else (0, -abs(value - limit), value - limit if reverse else limit - value) if closest
+                        else (0, value, 0) if not reverse and (limit is None or value <= limit)
+                        else (0, -value, 0) if limit is None or (reverse and value == limit) or value > limit
+                        else (-1, value, 0))
+
+            return calculate_preference
 
         def calculate_preference(self, format):
             # Determine missing protocol
@@ -1917,12 +1973,23 @@ def calculate_preference(self, format):
                 if format.get('acodec') != 'none' and format.get('abr') is None:
                     format['abr'] = format.get('tbr') - format.get('vbr', 0)
 
-            return tuple(self._calculate_field_preference(format, field) for field in self._order)
+            return tuple(calculate(format) for calculate in self._key_functions)
 
     def _sort_formats(self, formats, field_preference=[]):
         if not formats:
             return
-        formats.sort(key=self.FormatSort(self, field_preference).calculate_preference)
+        formats.sort(key=self._get_format_sort(field_preference).calculate_preference)
+
+    def _get_format_sort(self, field_preference=()):
+        """Return the FormatSort for the current parameters, reusing the one compiled by an earlier call"""
+        key = (tuple(field_preference), self.get_param('prefer_free_formats', False),
+               tuple(self.get_param('format_sort') or ()), self.get_param('format_sort_force', False))
+        format_sort = self._downloader._format_sorts.get(key)
+        if format_sort is None:
+            format_sort = self._downloader._format_sorts[key] = self.FormatSort(self, field_preference)
+        elif self.get_param('verbose'):
+            format_sort.print_verbose_info(self._downloader.write_debug)
+        return format_sort
 
     def _check_formats(self, formats, video_id):
         if formats:
@@ -16,21 +16,11 @@ def _real_extract(self, url):
         chrome_wait_timeout = self.get_param('selenium_browner_timeout', 20)
         headless = self.get_param('selenium_browner_headless', False)
 
-        from ..selenium_container import SeleniumContainer
         from selenium.webdriver.support import expected_conditions as EC
         from selenium.webdriver.common.by import By
 
-        self.to_screen(f'start chrome to query video page...')
-        with SeleniumContainer(
-            headless=headless,
-            close_log_callback=lambda: self.to_screen('Quit chrome and cleanup temp profile...')
-        ) as engine:
-            engine.start()
-
-            if self.get_param('cookiesfrombrowser'):
-                engine.load(url)
-                engine.load_cookies(self._downloader.cookiejar, '.xiaoeknow.com')
-
+        with self._downloader.selenium_pool.lease(headless, cookie_url=url, cookie_domain='.xiaoeknow.com') as engine:
+            engine.capture()
             engine.load(url)
 
             video_e = engine.wait(chrome_wait_timeout).until(
@@ -34,17 +34,11 @@ def _real_extract(self, url):
         chrome_wait_timeout = self.get_param('selenium_browner_timeout', 20)
         headless = self.get_param('selenium_browner_headless', True)
 
-        from ..selenium_container import SeleniumContainer
         from selenium.webdriver.support import expected_conditions as EC
         from selenium.webdriver.common.by import By
 
-        self.to_screen(f'start chrome to query video page...')
-        with SeleniumContainer(
-            headless=headless,
-            close_log_callback=lambda: self.to_screen('Quit chrome and cleanup temp profile...')
-        ) as engine:
-            engine.start()
-
+        with self._downloader.selenium_pool.lease(headless) as engine:
+            engine.capture()
             engine.load(url)
 
             iframe_e = engine.wait(chrome_wait_timeout).until(
@@ -478,6 +478,10 @@ def _alias_callback(option, opt_str, value, parser, opts, nargs):
         metavar='IP', dest='source_address', default=None,
         help='Client-side IP address to bind to',
     )
+    network.add_option(
+        '--http-pool-size',
+        dest='http_pool_size', metavar='N', default=4, type=int,
+        help='Maximum number of idle keep-alive connections kept per host for reuse; 0 disables reuse (default is %default)')
     network.add_option(
         '-4', '--force-ipv4',
         action='store_const', const='0.0.0.0', dest='source_address',
@@ -610,7 +614,18 @@ def _alias_callback(option, opt_str, value, parser, opts, nargs):
     selection.add_option(
         '--download-archive', metavar='FILE',
         dest='download_archive',
-        help='Download only videos not listed in the archive file. Record the IDs of all downloaded videos in it')
+        help=(
+            'Download only videos not listed in the archive file. Record the IDs of all downloaded videos in it. '
+            'Files named *.db, *.sqlite or *.sqlite3 are indexed SQLite databases, '
+            'which are faster for large archives'))
+    selection.add_option(
+        '--import-download-archive', metavar='FILE',
+        dest='import_download_archive', default=None,
+        help='Add the IDs listed in the text archive FILE to --download-archive')
+    selection.add_option(
+        '--export-download-archive', metavar='FILE',
+        dest='export_download_archive', default=None,
+        help='Write the IDs recorded in --download-archive to FILE as a text archive')
     selection.add_option(
         '--no-download-archive',
         dest='download_archive', action="store_const", const=None,
@@ -835,7 +850,17 @@ def _alias_callback(option, opt_str, value, parser, opts, nargs):
     downloader.add_option(
         '-N', '--concurrent-fragments',
         dest='concurrent_fragment_downloads', metavar='N', default=1, type=int,
-        help='Number of fragments of a dash/hlsnative video that should be downloaded concurrently (default is %default)')
+        help='Number of fragments of a dash/hlsnative/ism/f4m video that should be downloaded concurrently (default is %default)')
+    downloader.add_option(
+        '--concurrent-entries',
+        dest='concurrent_entries', metavar='N', default=1, type=int,
+        help='Number of playlist entries that should be extracted and downloaded concurrently (default is %default)')
+    downloader.add_option(
+        '--http-connections',
+        dest='http_connections', metavar='N', default=1, type=int,
+        help=(
+            'Number of connections to download a single file over native HTTP with, '
+            'each fetching its own part of the file. Needs a server supporting range requests (default is %default)'))
     downloader.add_option(
         '-r', '--limit-rate', '--rate-limit',
         dest='ratelimit', metavar='RATE',
@@ -997,6 +1022,12 @@ def _alias_callback(option, opt_str, value, parser, opts, nargs):
         '--selenium-browner-no-headless', dest='selenium_browner_headless', action='store_false')
     downloader.add_option(
         '--selenium-browner-headless', dest='selenium_browner_headless', action='store_true')
+    downloader.add_option(
+        '--selenium-browner-pool-size', dest='selenium_browner_pool_size', metavar='N', default=1, type=int,
+        help='Maximum number of browsers kept alive and reused across videos (default is %default)')
+    downloader.add_option(
+        '--selenium-browner-idle-timeout', dest='selenium_browner_idle_timeout', metavar='SECONDS', default=300, type=float,
+        help='Close pooled browsers that have been unused for this long (default is %default)')
 
     workarounds = optparse.OptionGroup(parser, 'Workarounds')
     workarounds.add_option(
@@ -1153,6 +1184,13 @@ def _alias_callback(option, opt_str, value, parser, opts, nargs):
         help=(
             'Quiet, but print JSON information for each url or infojson passed. Simulate unless --no-simulate is used. '
             'If the URL refers to a playlist, the whole playlist information is dumped in a single line'))
+    verbosity.add_option(
+        '--dump-json-stream',
+        action='store_const', dest='dump_single_json', const='lines',
+        help=(
+            'Same as --dump-single-json, but print playlists as JSON lines while the entries are processed: '
+            'first the playlist information without the entries, then one line for each entry, '
+            'and finally a line with "_type": "playlist_end" and the number of entries. Implies --lazy-playlist'))
     verbosity.add_option(
         '--print-json',
         action='store_true', dest='print_json', default=False,
@@ -1422,6 +1460,10 @@ def _alias_callback(option, opt_str, value, parser, opts, nargs):
     filesystem.add_option(
         '--no-cache-dir', action='store_false', dest='cachedir',
         help='Disable filesystem caching')
+    filesystem.add_option(
+        '--cache-backend',
+        metavar='BACKEND', dest='cache_backend', default='file', choices=('file', 'sqlite'),
+        help='How to store the cache. One of "file" (one file per entry) or "sqlite" (a single database) (default is %default)')
     filesystem.add_option(
         '--rm-cache-dir',
         action='store_true', dest='rm_cachedir',
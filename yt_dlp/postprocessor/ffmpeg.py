@@ -27,7 +27,6 @@
     shell_quote,
     traverse_obj,
     variadic,
-    write_json_file,
     write_string,
 )
 
@@ -81,6 +80,9 @@ class FFmpegPostProcessorError(PostProcessingError):
 
 
 class FFmpegPostProcessor(PostProcessor):
+    # Number of files whose ffprobe output is kept, most recently used first
+    _PROBE_CACHE_SIZE = 16
+
     def __init__(self, downloader=None):
         PostProcessor.__init__(self, downloader)
         self._prefer_ffmpeg = self.get_param('prefer_ffmpeg', True)
@@ -205,6 +207,77 @@ def probe_available(self):
     def probe_executable(self):
         return self._paths.get(self.probe_basename)
 
+    # Whether this postprocessor applies the stream copy fixups postponed by the previous ones.
+    # YoutubeDL.run_all_pps sets info['__ffmpeg_fuse_next'] when the next postprocessor does
+    _FUSABLE = False
+
+    @staticmethod
+    def _fuse_fixups(func):
+        """Decorator for the run method of fusable postprocessors. Runs the postponed
+        fixups that are left after it unless the next postprocessor can take them"""
+        @functools.wraps(func)
+        def wrapper(self, info):
+            try:
+                return func(self, info)
+            finally:
+                if not info.get('__ffmpeg_fuse_next'):
+                    self._run_fixups(info)
+        return wrapper
+
+    @staticmethod
+    def _conflicting_options(fixup_options, options):
+        """Whether options set an option of the fixup to another value
+        Only fixup_options are known to be (option, value) pairs. Other option lists can
+        have options without a value such as -dn, so only what follows each option is checked"""
+        for opt, value in zip(fixup_options[::2], fixup_options[1::2]):
+            if any(other == opt and options[i + 1:i + 2] != [value] for i, other in enumerate(options)):
+                return True
+        return False
+
+    def _group_fixups(self, fixups):
+        groups = []
+        for fixup in fixups:
+            if not groups or any(self._conflicting_options(fixup[2], options) for _, _, options in groups[-1]):
+                groups.append([])
+            groups[-1].append(fixup)
+        return groups
+
+    def _report_fixups(self, filename, fixups):
+        for pp_name, msg, _ in fixups:
+            self.to_screen(f'[{pp_name}] {msg} of "{filename}"', prefix=False)
+
+    def _run_fixups(self, info):
+        """Run the postponed fixups, in as few stream copies of the file as possible"""
+        for fixups in self._group_fixups(info.pop('__ffmpeg_fixups', None) or []):
+            filename = info['filepath']
+            temp_filename = prepend_extension(filename, 'temp')
+            self._report_fixups(filename, fixups)
+            self.run_ffmpeg(filename, temp_filename, [*self.stream_copy_opts(), *itertools.chain.from_iterable(
+                fixup_options for _, _, fixup_options in fixups)])
+            os.replace(temp_filename, filename)
+
+    def _fused_options(self, info, options):
+        """Add the options of the postponed fixups to those of an ffmpeg pass over info['filepath']
+        The fixups are run on their own first if they conflict with each other or with the options"""
+        options = list(options)
+        fixups = info.get('__ffmpeg_fixups') or []
+        if len(self._group_fixups(fixups)) > 1 or any(
+                self._conflicting_options(fixup_options, options) for _, _, fixup_options in fixups):
+            self._run_fixups(info)
+            return options
+        self._report_fixups(info['filepath'], fixups)
+        return [*options, *itertools.chain.from_iterable(fixup_options for _, _, fixup_options in fixups)]
+
+    def _run_fused_ffmpeg(self, info, input_paths, out_path, options):
+        """Run ffmpeg with the postponed fixups added to options
+        They are only done with once the pass succeeds. Otherwise, they are run on their own"""
+        try:
+            self.run_ffmpeg_multiple_files(input_paths, out_path, self._fused_options(info, options))
+        except FFmpegPostProcessorError:
+            self._run_fixups(info)
+            raise
+        info.pop('__ffmpeg_fixups', None)
+
     @staticmethod
     def stream_copy_opts(copy=True, *, ext=None):
         yield from ('-map', '0')
@@ -228,6 +301,13 @@ def check_version(self):
     def get_audio_codec(self, path):
         if not self.probe_available and not self.available:
             raise PostProcessingError('ffprobe and ffmpeg not found. Please install or provide the path using --ffmpeg-location')
+        if self.probe_basename == 'ffprobe' and self.available:
+            try:
+                metadata = self.get_metadata_object(path)
+            except (OSError, ValueError):
+                return None
+            return traverse_obj(
+                metadata, ('streams', lambda _, v: v['codec_type'] == 'audio', 'codec_name'), get_all=False)
         try:
             if self.probe_available:
                 cmd = [
@@ -262,6 +342,41 @@ def get_audio_codec(self, path):
                 return mobj.group(1)
         return None
 
+    def _probe_cache_key(self, path):
+        """The absolute path and the current version of the file, if its ffprobe output can be cached"""
+        if not self._downloader or path == '-' or path.startswith(('http://', 'https://')):
+            return None
+        try:
+            stat = os.stat(encodeFilename(path))
+        except OSError:
+            return None
+        return os.path.abspath(path), (stat.st_size, stat.st_mtime_ns)
+
+    def _load_probe_cache(self, cache_key):
+        path, version = cache_key
+        with self._downloader._probe_cache_lock:
+            cached = self._downloader._probe_cache.get(path)
+            if not cached or cached[0] != version:
+                return None
+            self._downloader._probe_cache.move_to_end(path)
+            return cached[1]
+
+    def _store_probe_cache(self, cache_key, stdout):
+        path, version = cache_key
+        with self._downloader._probe_cache_lock:
+            self._downloader._probe_cache[path] = version, stdout
+            self._downloader._probe_cache.move_to_end(path)
+            while len(self._downloader._probe_cache) > self._PROBE_CACHE_SIZE:
+                self._downloader._probe_cache.popitem(last=False)
+
+    def _invalidate_probe_cache(self, *paths):
+        if not self._downloader:
+            return
+        with self._downloader._probe_cache_lock:
+            for path in paths:
+                if path:
+                    self._downloader._probe_cache.pop(os.path.abspath(path), None)
+
     def get_metadata_object(self, path, opts=[]):
         if self.probe_basename != 'ffprobe':
             if self.probe_available:
@@ -269,6 +384,14 @@ def get_metadata_object(self, path, opts=[]):
             raise PostProcessingError('ffprobe not found. Please install or provide the path using --ffmpeg-location')
         self.check_version()
 
+        # The output is cached per YoutubeDL instance, so that the several postprocessors
+        # that probe the same file only run ffprobe once for every version of it
+        cache_key = None if opts else self._probe_cache_key(path)
+        stdout = self._load_probe_cache(cache_key) if cache_key else None
+        if stdout is not None:
+            self.write_debug(f'Using cached ffprobe output for {path}')
+            return json.loads(stdout)
+
         cmd = [
             encodeFilename(self.probe_executable, True),
             encodeArgument('-hide_banner'),
@@ -281,7 +404,10 @@ def get_metadata_object(self, path, opts=[]):
         cmd += opts
         cmd.append(self._ffmpeg_filename_argument(path))
         self.write_debug(f'ffprobe command line: {shell_quote(cmd)}')
-        stdout, _, _ = Popen.run(cmd, text=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, stdin=subprocess.PIPE)
+        stdout, _, returncode = Popen.run(
+            cmd, text=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, stdin=subprocess.PIPE)
+        if cache_key and returncode == 0:
+            self._store_probe_cache(cache_key, stdout)
         return json.loads(stdout)
 
     def get_stream_number(self, path, keys, value):
@@ -346,6 +472,8 @@ def make_args(file, args, name, number):
         self.write_debug('ffmpeg command line: %s' % shell_quote(cmd))
         _, stderr, returncode = Popen.run(
             cmd, text=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, stdin=subprocess.PIPE)
+        # The inputs are usually replaced by the output afterwards
+        self._invalidate_probe_cache(*(path for path, _ in (*input_path_opts, *output_path_opts)))
         if returncode not in variadic(expected_retcodes):
             self.write_debug(stderr)
             raise FFmpegPostProcessorError(stderr.strip().splitlines()[-1])
@@ -569,11 +697,13 @@ def _options(target_ext):
 
 class FFmpegEmbedSubtitlePP(FFmpegPostProcessor):
     SUPPORTED_EXTS = ('mp4', 'mov', 'm4a', 'webm', 'mkv', 'mka')
+    _FUSABLE = True
 
     def __init__(self, downloader=None, already_have_subtitle=False):
         super().__init__(downloader)
         self._already_have_subtitle = already_have_subtitle
 
+    @FFmpegPostProcessor._fuse_fixups
     @PostProcessor._restrict_to(images=False)
     def run(self, info):
         if info['ext'] not in self.SUPPORTED_EXTS:
@@ -641,7 +771,7 @@ def run(self, info):
 
         temp_filename = prepend_extension(filename, 'temp')
         self.to_screen('Embedding subtitles in "%s"' % filename)
-        self.run_ffmpeg_multiple_files(input_files, temp_filename, opts)
+        self._run_fused_ffmpeg(info, input_files, temp_filename, opts)
         os.replace(temp_filename, filename)
 
         files_to_delete = [] if self._already_have_subtitle else sub_filenames
@@ -649,6 +779,7 @@ def run(self, info):
 
 
 class FFmpegMetadataPP(FFmpegPostProcessor):
+    _FUSABLE = True
 
     def __init__(self, downloader, add_metadata=True, add_chapters=True, add_infojson='if_exists'):
         FFmpegPostProcessor.__init__(self, downloader)
@@ -663,6 +794,7 @@ def _options(target_ext):
         if audio_only:
             yield from ('-vn', '-acodec', 'copy')
 
+    @FFmpegPostProcessor._fuse_fixups
     @PostProcessor._restrict_to(images=False)
     def run(self, info):
         filename, metadata_filename = info['filepath'], None
@@ -689,8 +821,8 @@ def run(self, info):
 
         temp_filename = prepend_extension(filename, 'temp')
         self.to_screen('Adding metadata to "%s"' % filename)
-        self.run_ffmpeg_multiple_files(
-            (filename, metadata_filename), temp_filename,
+        self._run_fused_ffmpeg(
+            info, (filename, metadata_filename), temp_filename,
             itertools.chain(self._options(info['ext']), *options))
         self._delete_downloaded_files(*files_to_delete)
         os.replace(temp_filename, filename)
@@ -781,7 +913,7 @@ def _get_infojson_opts(self, info, infofn):
             if not self._downloader._ensure_dir_exists(infofn):
                 return
             self.write_debug(f'Writing info-json to: {infofn}')
-            write_json_file(self._downloader.sanitize_info(info, self.get_param('clean_infojson', True)), infofn)
+            self._downloader._write_info_json_file(info, infofn)
             info['infojson_filename'] = infofn
 
         old_stream, new_stream = self.get_stream_number(info['filepath'], ('tags', 'mimetype'), 'application/json')
@@ -835,7 +967,16 @@ def can_merge(self):
 
 
 class FFmpegFixupPostProcessor(FFmpegPostProcessor):
-    def _fixup(self, msg, filename, options):
+    def _fixup(self, msg, filename, options, info=None):
+        copy_opts = list(self.stream_copy_opts())
+        fixup_options = options[len(copy_opts):]
+        if (self._FUSABLE and info is not None and options[:len(copy_opts)] == copy_opts
+                and len(fixup_options) % 2 == 0 and all(opt.startswith('-') for opt in fixup_options[::2])):
+            # A stream copy with extra options can be done in the same pass as other ones.
+            # It is run when the fusable postprocessors that follow are done, if none of them takes it
+            info.setdefault('__ffmpeg_fixups', []).append((self.PP_NAME, msg, fixup_options))
+            return
+
         temp_filename = prepend_extension(filename, 'temp')
 
         self.to_screen(f'{msg} of "{filename}"')
@@ -845,24 +986,32 @@ def _fixup(self, msg, filename, options):
 
 
 class FFmpegFixupStretchedPP(FFmpegFixupPostProcessor):
+    _FUSABLE = True
+
+    @FFmpegPostProcessor._fuse_fixups
     @PostProcessor._restrict_to(images=False, audio=False)
     def run(self, info):
         stretched_ratio = info.get('stretched_ratio')
         if stretched_ratio not in (None, 1):
             self._fixup('Fixing aspect ratio', info['filepath'], [
-                *self.stream_copy_opts(), '-aspect', '%f' % stretched_ratio])
+                *self.stream_copy_opts(), '-aspect', '%f' % stretched_ratio], info)
         return [], info
 
 
 class FFmpegFixupM4aPP(FFmpegFixupPostProcessor):
+    _FUSABLE = True
+
+    @FFmpegPostProcessor._fuse_fixups
     @PostProcessor._restrict_to(images=False, video=False)
     def run(self, info):
         if info.get('container') == 'm4a_dash':
-            self._fixup('Correcting container', info['filepath'], [*self.stream_copy_opts(), '-f', 'mp4'])
+            self._fixup('Correcting container', info['filepath'], [*self.stream_copy_opts(), '-f', 'mp4'], info)
         return [], info
 
 
 class FFmpegFixupM3u8PP(FFmpegFixupPostProcessor):
+    _FUSABLE = True
+
     def _needs_fixup(self, info):
         yield info['ext'] in ('mp4', 'm4a')
         yield info['protocol'].startswith('m3u8')
@@ -874,11 +1023,12 @@ def _needs_fixup(self, info):
         else:
             yield traverse_obj(metadata, ('format', 'format_name'), casesense=False) == 'mpegts'
 
+    @FFmpegPostProcessor._fuse_fixups
     @PostProcessor._restrict_to(images=False)
     def run(self, info):
         if all(self._needs_fixup(info)):
             self._fixup('Fixing MPEG-TS in MP4 container', info['filepath'], [
-                *self.stream_copy_opts(), '-f', 'mp4', '-bsf:a', 'aac_adtstoasc'])
+                *self.stream_copy_opts(), '-f', 'mp4', '-bsf:a', 'aac_adtstoasc'], info)
         return [], info
 
 
@@ -905,10 +1055,12 @@ def run(self, info):
 
 class FFmpegCopyStreamPP(FFmpegFixupPostProcessor):
     MESSAGE = 'Copying stream'
+    _FUSABLE = True
 
+    @FFmpegPostProcessor._fuse_fixups
     @PostProcessor._restrict_to(images=False)
     def run(self, info):
-        self._fixup(self.MESSAGE, info['filepath'], self.stream_copy_opts())
+        self._fixup(self.MESSAGE, info['filepath'], list(self.stream_copy_opts()), info)
         return [], info
 
 
@@ -1,8 +1,13 @@
 import base64
 import collections
+import contextlib
 import json
+import os
 import re
+import tempfile
+import threading
 import time
+import weakref
 
 from .utils import (
     int_or_none,
@@ -18,15 +23,25 @@
 
 
 class SeleniumContainer:
-    def __init__(self, headless, close_log_callback=None):
+    _CAPTURE_EVENTS = ('Network.requestWillBeSent', 'Network.responseReceived', 'Network.loadingFinished')
+
+    def __init__(self, headless, close_log_callback=None, spill_size=1024 * 1024):
         self.headless = headless
         self.driver = None
         self.close_log_callback = close_log_callback
+        self.cookie_domains = set()
+        self.last_used = time.monotonic()
+
+        self.spill_size = spill_size
 
+        self.capture_prefixes = None
         self.response_dict = collections.defaultdict(dict)
-        self.request_id_data = collections.defaultdict(list)
         self.closed_request_id_set = set()
         self.response_updated_key_list = []
+        self._request_state = {}
+        self._pending_request_ids = {}
+        self._response_urls = set()
+        self._spill_files = {}
 
     def start(self):
         chrome_options = Options()
@@ -72,91 +87,129 @@ def load_cookies(self, cookiejar, base_domain):
             for c in cookies_loaded:
                 self.driver.add_cookie(c)
             print(f'loaded {len(cookies_loaded)} cookies for {domain}')
+        self.cookie_domains.add(base_domain)
+
+    def capture(self, *url_prefixes):
+        """Only fetch response bodies of URLs starting with one of url_prefixes
+
+        Must be called before the page is loaded. Without prefixes, no bodies
+        are fetched and only the response URLs are recorded in response_updated_key_list
+        """
+        self.capture_prefixes = tuple(url_prefixes)
+
+    def _should_capture(self, url):
+        if url.startswith('chrome'):
+            return False
+        return self.capture_prefixes is None or url.startswith(self.capture_prefixes)
+
+    def _handle_event(self, method, params):
+        request_id = params['requestId']
+        if method == 'Network.requestWillBeSent':
+            # A requestId is reused on redirects; the new response has to be fetched again
+            self.closed_request_id_set.discard(request_id)
+            self._request_state[request_id] = {'url': params['request']['url'], 'content_range': None}
+            return
+
+        state = self._request_state.setdefault(request_id, {'url': None, 'content_range': None})
+        if method == 'Network.responseReceived':
+            response = params['response']
+            state['url'] = state['url'] or response.get('url')
+            state['content_range'] = traverse_obj(response, ('headers', 'Content-Range'))
+            if state['url'] and state['url'] not in self._response_urls:
+                self._response_urls.add(state['url'])
+                if self.capture_prefixes is not None and not self._should_capture(state['url']):
+                    self.response_updated_key_list.append(state['url'])
+        elif method == 'Network.loadingFinished':
+            if request_id not in self.closed_request_id_set and self._should_capture(
+                    state['url'] or f'requestId:{request_id}'):
+                self._pending_request_ids[request_id] = None
+
+    def _spill(self, request_url, range_start, body):
+        spill_file = self._spill_files.get(request_url)
+        if spill_file is None:
+            spill_file = self._spill_files[request_url] = tempfile.NamedTemporaryFile(
+                prefix='yt-dlp-capture-', suffix='.part', delete=False)
+        spill_file.seek(range_start)
+        spill_file.write(body)
+        spill_file.flush()
+        return spill_file.name
 
     def extract_network(self):
-        browser_log = self.driver.get_log('performance')
-
-        events = [json.loads(entry['message'])['message'] for entry in browser_log]
-        events = [e for e in events
-                  if e['method'].startswith('Network.requestWillBeSent')
-                  or e['method'].startswith('Network.responseReceived')
-                  ]
-
-        for e in events:
-            request_url = traverse_obj(e, ('params', 'request', 'url'))
-            if request_url is not None:
-                e['request_url'] = request_url
-            request_id = e['params']['requestId']
-            if request_id in self.closed_request_id_set:
-                self.closed_request_id_set.remove(request_id)
-            self.request_id_data[request_id].append(e)
-
-        for requestId, request_list in self.request_id_data.items():
-            if requestId in self.closed_request_id_set:
-                continue
-            request_url = (traverse_obj(request_list, (..., 'request_url')) or [None])[0]
-            if request_url is None:
-                request_url = f"requestId:{requestId}"
-            if request_url.startswith('chrome'):
+        """Process the network events received since the last call
+
+        Only the responses which finished loading since then and pass the
+        capture filter are fetched. Ranged binary bodies of at least
+        spill_size bytes are written to a spill file at their offset instead of
+        being kept in memory. The spill file is deleted when the container is
+        reset or closed, i.e. once the lease ends, so its body_file path must
+        only be used within the lease
+        """
+        for entry in self.driver.get_log('performance'):
+            message = entry['message']
+            # Avoid decoding the (many) events we are not interested in
+            if not any(method in message for method in self._CAPTURE_EVENTS):
                 continue
+            event = json.loads(message)['message']
+            if event['method'] in self._CAPTURE_EVENTS:
+                self._handle_event(event['method'], event['params'])
+
+        pending, self._pending_request_ids = self._pending_request_ids, {}
+        for requestId in pending:
+            state = self._request_state[requestId]
+            request_url = state['url'] or f'requestId:{requestId}'
 
             try:
                 resp = self.driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': requestId})
+            except Exception as e:
+                if 'No data found for resource with given identifier' in str(e):
+                    continue
+                elif 'No resource with given identifier found' in str(e):
+                    continue
+                raise
 
-                resp_range_list = traverse_obj(request_list, (..., 'params', 'response', 'headers', 'Content-Range')) or []
-
-                if resp['base64Encoded']:
-                    resp_body = base64.b64decode(resp['body'])
-                    try:
-                        resp_body = resp_body.decode('utf8')
-                        resp_body_text = True
-                    except Exception:
-                        resp_body_text = False
-                else:
-                    resp_body = resp['body']
+            if resp['base64Encoded']:
+                resp_body = base64.b64decode(resp['body'])
+                try:
+                    resp_body = resp_body.decode('utf8')
                     resp_body_text = True
+                except Exception:
+                    resp_body_text = False
+            else:
+                resp_body = resp['body']
+                resp_body_text = True
+
+            self.closed_request_id_set.add(requestId)
+
+            mobj = re.match(r'^bytes (?P<start>\d+)-(?P<end>\d+)/(?P<len>\d+)$', state['content_range'] or '')
+
+            range_start = try_call(lambda: int(mobj.group('start')))
+            range_end = try_call(lambda: int(mobj.group('end')))
+            range_len = try_call(lambda: int(mobj.group('len')))
+
+            data = {
+                'body': resp_body,
+                'body_text': resp_body_text,
+                'range_start': range_start,
+                'range_end': range_end,
+                'range_len': range_len,
+                'end': range_end == range_len - 1 if range_len is not None else True
+            }
+            if range_start is not None and not resp_body_text and len(resp_body) >= self.spill_size:
+                data['body'] = None
+                data['body_file'] = self._spill(request_url, range_start, resp_body)
 
-                self.closed_request_id_set.add(requestId)
-
-                resp_range = resp_range_list[0] if resp_range_list else ''
-                mobj = re.match(r'^bytes (?P<start>\d+)-(?P<end>\d+)/(?P<len>\d+)$', resp_range)
-
-                range_start = try_call(lambda: int(mobj.group('start')))
-                range_end = try_call(lambda: int(mobj.group('end')))
-                range_len = try_call(lambda: int(mobj.group('len')))
-
-                data = {
-                    'body': resp_body,
-                    'body_text': resp_body_text,
-                    'range_start': range_start,
-                    'range_end': range_end,
-                    'range_len': range_len,
-                    'end': range_end == range_len - 1 if range_len is not None else True
-                }
-                updated = True
-                if requestId in self.response_dict[request_url]:
-                    if self.response_dict[request_url][requestId] == data:
-                        # print(f'Found same rewrite, {request_url}')
-                        updated = False
-                    else:
-                        # print(f'Found same updated, {request_url}')
-                        pass
-
-                if updated and request_url not in self.response_updated_key_list:
-                    self.response_updated_key_list.append(request_url)
-
-                self.response_dict[request_url][requestId] = data
-                # print(f'Get new resp:{len(self.response_dict[request_url])} start:{range_start} len:{len(resp_body)} {request_url}')
+            updated = self.response_dict[request_url].get(requestId) != data
+            if updated and request_url not in self.response_updated_key_list:
+                self.response_updated_key_list.append(request_url)
 
-            except Exception as e:
-                if 'No data found for resource with given identifier' in str(e):
-                    pass
-                elif 'No resource with given identifier found' in str(e):
-                    pass
-                else:
-                    raise
+            self.response_dict[request_url][requestId] = data
 
     def get_response_frag_data(self, resp_map, check_complete=True):
+        """Join the ranged responses of resp_map into a single one
+
+        If any part was spilled to a file, the result has a body_file instead
+        of a body. Like the parts, it is only valid until the lease ends
+        """
         if len(resp_map) == 1:
             return list(resp_map.values())[0]
 
@@ -171,13 +224,31 @@ def get_response_frag_data(self, resp_map, check_complete=True):
             if not frags[-1]['end']:
                 print('missing tail')
 
-        data = b''.join(f['body'] for f in frags)
-        return {
-            'body': data,
+        result = {
             'body_text': False,
             'range_len': frags[-1]['range_len'],
             'end': frags[-1]['end']
         }
+        body_file = next((f['body_file'] for f in frags if f.get('body_file')), None)
+        if body_file is None:
+            return {**result, 'body': b''.join(f['body'] for f in frags)}
+
+        # Parts that were small enough to stay in memory are written into the spill file
+        with open(body_file, 'r+b') as f:
+            for frag in frags:
+                if frag['body'] is not None:
+                    f.seek(frag['range_start'])
+                    f.write(frag['body'])
+        return {**result, 'body': None, 'body_file': body_file}
+
+    def _close_spill_files(self):
+        for spill_file in self._spill_files.values():
+            spill_file.close()
+            try:
+                os.remove(spill_file.name)
+            except OSError:
+                pass
+        self._spill_files.clear()
 
     def parse_video_info(self):
         self.driver.switch_to.new_window()
@@ -214,6 +285,36 @@ def execute_script(self, script, *args):
     def wait(self, timeout):
         return WebDriverWait(self.driver, timeout)
 
+    def is_alive(self):
+        if not self.driver:
+            return False
+        try:
+            return bool(self.driver.window_handles)
+        except Exception:
+            return False
+
+    def reset(self):
+        """Return the browser to a blank state while keeping its profile and network cache"""
+        handles = self.driver.window_handles
+        for handle in handles[1:]:
+            self.driver.switch_to.window(handle)
+            self.driver.close()
+        self.driver.switch_to.window(handles[0])
+        self.driver.switch_to.default_content()
+        self.load('about:blank')
+        # Drain the performance log so that the next lease does not see stale requests
+        self.driver.get_log('performance')
+
+        self.capture_prefixes = None
+        self.response_dict.clear()
+        self.closed_request_id_set.clear()
+        self.response_updated_key_list.clear()
+        self._request_state.clear()
+        self._pending_request_ids.clear()
+        self._response_urls.clear()
+        self._close_spill_files()
+        self.last_used = time.monotonic()
+
     def close(self):
         if self.driver:
             if self.close_log_callback:
@@ -221,6 +322,7 @@ def close(self):
 
             self.driver.quit()
             self.driver = None
+        self._close_spill_files()
 
     def __enter__(self):
         return self
@@ -229,3 +331,174 @@ def __exit__(self, type, value, trace):
         self.close()
 
 
+class SeleniumPool:
+    """A process-wide pool of warm browsers that extractors lease from
+
+    Browsers are started lazily, reused across leases (keeping their cache and
+    loaded cookies) and closed once idle for longer than idle_timeout seconds,
+    even if no more browsers are leased. The browsers that are still running
+    when the pool is garbage collected or the process exits are closed then.
+    At most size browsers are alive at once; further leases wait for one to be released.
+    """
+
+    def __init__(self, ydl, size=1, idle_timeout=300):
+        self.ydl = ydl
+        self.size = max(size or 1, 1)
+        self.idle_timeout = idle_timeout
+        self._idle = []
+        self._num_alive = 0
+        self._cond = threading.Condition()
+        self._reaper = None
+        self._containers = set()
+        weakref.finalize(self, self._close_all, self._containers)
+
+    @staticmethod
+    def _close_all(containers):
+        for container in list(containers):
+            with contextlib.suppress(Exception):
+                container.close()
+        containers.clear()
+
+    def _new_container(self, headless):
+        # The containers are closed by the finalizer of the pool, so they must not reference it
+        ydl_ref = weakref.ref(self.ydl)
+
+        def close_log_callback():
+            ydl = ydl_ref()
+            if ydl is not None:
+                ydl.to_screen('Quit chrome and cleanup temp profile...')
+
+        container = SeleniumContainer(headless=headless, close_log_callback=close_log_callback)
+        self._containers.add(container)
+        self.ydl.to_screen('start chrome to query video page...')
+        try:
+            container.start()
+        except BaseException:
+            self._close_container(container)
+            raise
+        return container
+
+    def _close_container(self, container):
+        self._containers.discard(container)
+        try:
+            container.close()
+        except Exception:
+            pass
+
+    def _evict_idle(self, keep=None):
+        now = time.monotonic()
+        expired = [c for c in self._idle if c is not keep and (
+            self.idle_timeout is not None and now - c.last_used >= self.idle_timeout)]
+        for container in expired:
+            self._idle.remove(container)
+            self._num_alive -= 1
+        return expired
+
+    def _schedule_reaper(self):
+        # Must be called with self._cond held
+        if self.idle_timeout is None or self._reaper is not None or not self._idle:
+            return
+        delay = min(c.last_used for c in self._idle) + self.idle_timeout - time.monotonic()
+        # The timer must not keep the pool alive, or it would never be garbage collected
+        self._reaper = threading.Timer(max(delay, 0), self._reap_pool, (weakref.ref(self),))
+        self._reaper.daemon = True
+        self._reaper.start()
+
+    @staticmethod
+    def _reap_pool(pool_ref):
+        pool = pool_ref()
+        if pool is not None:
+            pool._reap()
+
+    def _reap(self):
+        with self._cond:
+            self._reaper = None
+            expired = self._evict_idle()
+            self._schedule_reaper()
+            self._cond.notify_all()
+        for c in expired:
+            self._close_container(c)
+
+    def acquire(self, headless):
+        expired = []
+        with self._cond:
+            while True:
+                expired += self._evict_idle()
+                container = next((c for c in reversed(self._idle) if c.headless == headless), None)
+                if container is not None:
+                    self._idle.remove(container)
+                    break
+                if self._num_alive < self.size:
+                    self._num_alive += 1
+                    break
+                if self._idle:
+                    # All idle browsers have the wrong headless mode; replace the oldest one
+                    expired.append(self._idle.pop(0))
+                    continue
+                self._cond.wait()
+        for c in expired:
+            self._close_container(c)
+
+        if container is not None and container.is_alive():
+            self.ydl.write_debug('Reusing pooled chrome instance')
+            return container
+        elif container is not None:
+            self.ydl.write_debug('Pooled chrome instance is unresponsive; restarting it')
+            self._close_container(container)
+        try:
+            return self._new_container(headless)
+        except BaseException:
+            with self._cond:
+                self._num_alive -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, container, reuse=True):
+        if reuse and not container.is_alive():
+            reuse = False
+        if reuse:
+            try:
+                container.reset()
+            except Exception:
+                reuse = False
+        if not reuse:
+            self._close_container(container)
+        with self._cond:
+            if reuse:
+                self._idle.append(container)
+            else:
+                self._num_alive -= 1
+            expired = self._evict_idle(keep=container)
+            self._schedule_reaper()
+            self._cond.notify()
+        for c in expired:
+            self._close_container(c)
+
+    @contextlib.contextmanager
+    def lease(self, headless, cookie_url=None, cookie_domain=None):
+        """Lease a started browser; cookies for cookie_domain are preloaded once per browser
+
+        The browser is closed instead of being reused if the block raises,
+        since it may be left in the middle of a navigation
+        """
+        container = self.acquire(headless)
+        try:
+            if (cookie_domain and cookie_domain not in container.cookie_domains
+                    and self.ydl.params.get('cookiesfrombrowser')):
+                container.load(cookie_url)
+                container.load_cookies(self.ydl.cookiejar, cookie_domain)
+            yield container
+        except BaseException:
+            self.release(container, reuse=False)
+            raise
+        self.release(container)
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._num_alive -= len(idle)
+            if self._reaper is not None:
+                self._reaper.cancel()
+                self._reaper = None
+        for container in idle:
+            self._close_container(container)
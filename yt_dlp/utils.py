@@ -38,6 +38,7 @@
 import subprocess
 import sys
 import tempfile
+import threading
 import time
 import traceback
 import types
@@ -54,6 +55,7 @@
     compat_HTMLParseError,
     compat_os_name,
     compat_shlex_quote,
+    compat_sre_parse,
 )
 from .dependencies import brotli, certifi, websockets, xattr
 from .socks import ProxyType, sockssocket
@@ -256,8 +258,121 @@ def preferredencoding():
     return pref
 
 
-def write_json_file(obj, fn):
-    """ Encode obj as JSON and write it to fn, atomically if possible """
+class SanitizedJSONEncoder(json.JSONEncoder):
+    """ JSON encoder that sanitizes the object while encoding it, without copying it
+
+    Dict items for which reject(key, value) returns True are skipped.
+    Sets, tuples and LazyLists are encoded as lists and any other object that
+    is not supported by JSON is encoded as its repr.
+    The output is generated in chunks, so json.dump writes it incrementally.
+    Indentation is not supported.
+    """
+
+    def __init__(self, *args, reject=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        assert self.indent is None, 'SanitizedJSONEncoder does not support indent'
+        self.reject = reject
+
+    def encode(self, o):
+        return ''.join(self.iterencode(o))
+
+    def iterencode(self, o, _one_shot=False):
+        encode_str = json.encoder.encode_basestring_ascii if self.ensure_ascii else json.encoder.encode_basestring
+        item_separator, key_separator = self.item_separator, self.key_separator
+        reject, skipkeys, allow_nan = self.reject, self.skipkeys, self.allow_nan
+        CONTAINERS = (dict, list, tuple, set, LazyList)
+
+        def encode_float(o):
+            if o != o:
+                text = 'NaN'
+            elif o == float('inf'):
+                text = 'Infinity'
+            elif o == -float('inf'):
+                text = '-Infinity'
+            else:
+                return float.__repr__(o)
+            if not allow_nan:
+                raise ValueError(f'Out of range float values are not JSON compliant: {o!r}')
+            return text
+
+        def encode_scalar(o):
+            if isinstance(o, str):
+                return encode_str(o)
+            elif o is None:
+                return 'null'
+            elif o is True:
+                return 'true'
+            elif o is False:
+                return 'false'
+            elif isinstance(o, int):
+                return int.__repr__(o)
+            elif isinstance(o, float):
+                return encode_float(o)
+            return None
+
+        def encode_key(key):
+            if isinstance(key, str):
+                return encode_str(key)
+            elif isinstance(key, float):
+                return encode_str(encode_float(key))
+            elif key is None or isinstance(key, (bool, int)):
+                return encode_str(encode_scalar(key))
+            elif skipkeys:
+                return None
+            raise TypeError(f'keys must be str, int, float, bool or None, not {key.__class__.__name__}')
+
+        def encode_value(o):
+            text = encode_scalar(o)
+            return encode_str(repr(o)) if text is None else text
+
+        # Scalars are collected into a single chunk, which is yielded before descending into a container
+        def encode_dict(obj):
+            chunk, separator = ['{'], ''
+            for key, value in obj.items():
+                if reject and reject(key, value):
+                    continue
+                key = encode_key(key)
+                if key is None:
+                    continue
+                chunk.extend((separator, key, key_separator))
+                separator = item_separator
+                if isinstance(value, CONTAINERS):
+                    yield ''.join(chunk)
+                    chunk = []
+                    yield from encode(value)
+                else:
+                    chunk.append(encode_value(value))
+            chunk.append('}')
+            yield ''.join(chunk)
+
+        def encode_list(obj):
+            chunk, separator = ['['], ''
+            for value in obj:
+                chunk.append(separator)
+                separator = item_separator
+                if isinstance(value, CONTAINERS):
+                    yield ''.join(chunk)
+                    chunk = []
+                    yield from encode(value)
+                else:
+                    chunk.append(encode_value(value))
+            chunk.append(']')
+            yield ''.join(chunk)
+
+        def encode(obj):
+            if isinstance(obj, dict):
+                return encode_dict(obj)
+            elif isinstance(obj, CONTAINERS):
+                return encode_list(obj)
+            return iter((encode_value(obj),))
+
+        return encode(o)
+
+
+def write_json_file(obj, fn, **kwargs):
+    """ Encode obj as JSON and write it to fn, atomically if possible
+    @param kwargs    Passed to json.dump
+    """
 
     tf = tempfile.NamedTemporaryFile(
         prefix=f'{os.path.basename(fn)}.', dir=os.path.dirname(fn),
@@ -265,7 +380,7 @@ def write_json_file(obj, fn):
 
     try:
         with tf:
-            json.dump(obj, tf, ensure_ascii=False)
+            json.dump(obj, tf, ensure_ascii=False, **kwargs)
         if sys.platform == 'win32':
             # Need to remove existing file on Windows, else os.rename raises
             # WindowsError or FileExistsError.
@@ -1249,6 +1364,123 @@ def _create_connection(address, timeout=socket._GLOBAL_DEFAULT_TIMEOUT, source_a
     return hc
 
 
+class HTTPConnectionPool:
+    """
+    Thread-safe pool of idle keep-alive http.client connections
+
+    Connections are looked up by a key identifying the host, proxy and TLS
+    configuration they were created for. At most max_per_host idle connections
+    are kept for each key and connections idle for more than idle_timeout
+    seconds are closed
+    """
+
+    def __init__(self, max_per_host=4, idle_timeout=60):
+        self.max_per_host = max_per_host
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._idle = {}
+
+    def acquire(self, key):
+        """Get an idle connection for key or None"""
+        with self._lock:
+            self._evict()
+            idle = self._idle.get(key)
+            while idle:
+                conn, _ = idle.pop()
+                if conn.sock is not None:
+                    return conn
+
+    def release(self, key, conn):
+        """Return a connection whose last response has been fully read"""
+        with self._lock:
+            idle = self._idle.setdefault(key, collections.deque())
+            if conn.sock is None or len(idle) >= self.max_per_host:
+                conn.close()
+            else:
+                idle.append((conn, time.monotonic()))
+
+    def _evict(self):
+        deadline = time.monotonic() - self.idle_timeout
+        for key, idle in tuple(self._idle.items()):
+            while idle and idle[0][1] < deadline:
+                idle.popleft()[0].close()
+            if not idle:
+                del self._idle[key]
+
+    def close(self):
+        with self._lock:
+            for idle in self._idle.values():
+                for conn, _ in idle:
+                    conn.close()
+            self._idle.clear()
+
+
+class _PooledHTTPResponse(http.client.HTTPResponse):
+    """HTTPResponse that hands its connection back to the pool once the body is exhausted"""
+    _release = None
+    _trailer_read = False
+
+    def _read_and_discard_trailer(self):
+        super()._read_and_discard_trailer()
+        self._trailer_read = True
+
+    def _close_conn(self):
+        reusable = self.fp is not None and not self.will_close and (self.length == 0 or self._trailer_read)
+        super()._close_conn()
+        release, self._release = self._release, None
+        if release:
+            release(reusable)
+
+
+def _do_open_pooled(handler, pool, pool_key, http_class, req, **http_conn_args):
+    """Like urllib.request.AbstractHTTPHandler.do_open, but reuses connections from pool"""
+    host = req.host
+    if not host:
+        raise urllib.error.URLError('no host given')
+
+    headers = dict(req.unredirected_hdrs)
+    headers.update((k, v) for k, v in req.headers.items() if k not in headers)
+    headers = {name.title(): val for name, val in headers.items()}
+    tunnel_headers = {}
+    if req._tunnel_host and 'Proxy-Authorization' in headers:
+        tunnel_headers['Proxy-Authorization'] = headers.pop('Proxy-Authorization')
+    key = (*pool_key, host, req._tunnel_host, tunnel_headers.get('Proxy-Authorization'))
+
+    while True:
+        h = pool.acquire(key)
+        reused = h is not None
+        if reused:
+            h.timeout = req.timeout
+            if isinstance(req.timeout, (int, float)):
+                h.sock.settimeout(req.timeout)
+        else:
+            h = http_class(host, timeout=req.timeout, **http_conn_args)
+            h.response_class = _PooledHTTPResponse
+            if req._tunnel_host:
+                h.set_tunnel(req._tunnel_host, headers=tunnel_headers)
+        h.set_debuglevel(handler._debuglevel)
+
+        try:
+            try:
+                h.request(req.get_method(), req.selector, req.data, headers,
+                          encode_chunked=req.has_header('Transfer-encoding'))
+            except OSError as err:
+                raise urllib.error.URLError(err)
+            r = h.getresponse()
+        except BaseException as err:
+            h.close()
+            # The server may have closed the connection while it was idle
+            if reused and isinstance(getattr(err, 'reason', err), (ConnectionError, http.client.BadStatusLine)):
+                continue
+            raise
+        break
+
+    r._release = lambda reusable: pool.release(key, h) if reusable else h.close()
+    r.url = req.get_full_url()
+    r.msg = r.reason
+    return r
+
+
 def handle_youtubedl_headers(headers):
     filtered_headers = headers
 
@@ -1277,9 +1509,10 @@ class YoutubeDLHandler(urllib.request.HTTPHandler):
     public domain.
     """
 
-    def __init__(self, params, *args, **kwargs):
+    def __init__(self, params, *args, connection_pool=None, **kwargs):
         urllib.request.HTTPHandler.__init__(self, *args, **kwargs)
         self._params = params
+        self._connection_pool = connection_pool
 
     def http_open(self, req):
         conn_class = http.client.HTTPConnection
@@ -1289,9 +1522,10 @@ def http_open(self, req):
             conn_class = make_socks_conn_class(conn_class, socks_proxy)
             del req.headers['Ytdl-socks-proxy']
 
-        return self.do_open(functools.partial(
-            _create_http_connection, self, conn_class, False),
-            req)
+        http_class = functools.partial(_create_http_connection, self, conn_class, False)
+        if self._connection_pool is not None:
+            return _do_open_pooled(self, self._connection_pool, ('http', socks_proxy), http_class, req)
+        return self.do_open(http_class, req)
 
     @staticmethod
     def deflate(data):
@@ -1433,10 +1667,11 @@ def connect(self):
 
 
 class YoutubeDLHTTPSHandler(urllib.request.HTTPSHandler):
-    def __init__(self, params, https_conn_class=None, *args, **kwargs):
+    def __init__(self, params, https_conn_class=None, *args, connection_pool=None, **kwargs):
         urllib.request.HTTPSHandler.__init__(self, *args, **kwargs)
         self._https_conn_class = https_conn_class or http.client.HTTPSConnection
         self._params = params
+        self._connection_pool = connection_pool
 
     def https_open(self, req):
         kwargs = {}
@@ -1452,9 +1687,13 @@ def https_open(self, req):
             conn_class = make_socks_conn_class(conn_class, socks_proxy)
             del req.headers['Ytdl-socks-proxy']
 
+        http_class = functools.partial(_create_http_connection, self, conn_class, True)
         try:
-            return self.do_open(
-                functools.partial(_create_http_connection, self, conn_class, True), req, **kwargs)
+            if self._connection_pool is not None:
+                # The handler owns the TLS configuration of its connections
+                return _do_open_pooled(
+                    self, self._connection_pool, ('https', id(self), socks_proxy), http_class, req, **kwargs)
+            return self.do_open(http_class, req, **kwargs)
         except urllib.error.URLError as e:
             if (isinstance(e.reason, ssl.SSLError)
                     and getattr(e.reason, 'reason', None) == 'SSLV3_ALERT_HANDSHAKE_FAILURE'):
@@ -2413,6 +2652,179 @@ def get_domain(url):
     return remove_start(urllib.parse.urlparse(url).netloc, 'www.') or None
 
 
+def url_host_candidates(url):
+    """
+    The possible hosts of url as seen by valid_url_host_keys: the text after the
+    first "//" and the text before the first "/", both up to the following "/"
+    """
+    candidates = {url.split('/', 1)[0]}
+    mobj = re.match(r'[^/]*//([^/]*)', url)
+    if mobj:
+        candidates.add(mobj.group(1))
+    candidates.update([h[:-1] for h in candidates if h.endswith('\n')])
+    return {h.casefold() for h in candidates}
+
+
+def valid_url_host_keys(valid_url, max_keys=64):
+    """
+    Find literal suffixes of the host part of the URLs matched by the regex valid_url.
+    Every URL matched by valid_url has one of url_host_candidates(url) ending with one of
+    the returned (casefolded) strings. None is returned if this cannot be determined
+    """
+    sre = compat_sre_parse
+    REPEATS = tuple(filter(None, (
+        sre.MAX_REPEAT, sre.MIN_REPEAT, getattr(sre, 'POSSESSIVE_REPEAT', None))))
+    SLASH = ord('/')
+
+    def flatten(items):
+        for op, av in items:
+            if op is sre.SUBPATTERN:
+                yield from flatten(av[-1])
+            elif op is getattr(sre, 'ATOMIC_GROUP', None):
+                yield from flatten(av)
+            else:
+                yield op, av
+
+    def in_matches_slash(members):
+        negate, matched = False, False
+        for op, av in members:
+            if op is sre.NEGATE:
+                negate = True
+            elif op is sre.LITERAL:
+                matched = matched or av == SLASH
+            elif op is sre.RANGE:
+                matched = matched or av[0] <= SLASH <= av[1]
+            elif op is sre.CATEGORY:
+                matched = matched or av in (
+                    sre.CATEGORY_NOT_DIGIT, sre.CATEGORY_NOT_WORD, sre.CATEGORY_NOT_SPACE)
+            else:
+                return True
+        return matched != negate
+
+    def may_match_slash(items):
+        for op, av in flatten(items):
+            if op in (sre.AT, sre.ASSERT, sre.ASSERT_NOT):
+                continue
+            elif op is sre.LITERAL:
+                if av == SLASH:
+                    return True
+            elif op is sre.NOT_LITERAL:
+                if av != SLASH:
+                    return True
+            elif op is sre.IN:
+                if in_matches_slash(av):
+                    return True
+            elif op in REPEATS:
+                if may_match_slash(av[2]):
+                    return True
+            elif op is sre.BRANCH:
+                if any(map(may_match_slash, av[1])):
+                    return True
+            elif op is sre.GROUPREF_EXISTS:
+                if may_match_slash(av[1]) or may_match_slash(av[2] or []):
+                    return True
+            else:
+                return True
+        return False
+
+    def is_double_slash(items):
+        return items[-2:] == [(sre.LITERAL, SLASH)] * 2 and not may_match_slash(items[:-2])
+
+    def is_host_end(op, av):
+        if op is sre.LITERAL:
+            return av == SLASH
+        elif op is sre.AT:
+            return av in (sre.AT_END, sre.AT_END_STRING)
+        elif op is sre.BRANCH:
+            return all(alt and is_host_end(*alt[0]) for alt in map(list, map(flatten, av[1])))
+        return False
+
+    def literal_suffixes(items):
+        """Set of (suffix, whether the suffix is all that items can match)"""
+        results = {('', True)}
+        for op, av in reversed(items):
+            if op is sre.IN and len(av) == 1 and av[0][0] is sre.LITERAL:
+                op, av = av[0]
+            new_results = set()
+            for suffix, complete in results:
+                if not complete:
+                    new_results.add((suffix, False))
+                elif op is sre.LITERAL:
+                    new_results.add((chr(av) + suffix, True))
+                elif op is sre.BRANCH:
+                    for alt in av[1]:
+                        alt_results = literal_suffixes(list(flatten(alt)))
+                        if alt_results is None:
+                            return None
+                        new_results.update((s + suffix, c) for s, c in alt_results)
+                elif op in (sre.AT, sre.ASSERT, sre.ASSERT_NOT):
+                    new_results.add((suffix, True))
+                else:
+                    new_results.add((suffix, False))
+            results = new_results
+            if len(results) > max_keys:
+                return None
+            if not any(complete for _, complete in results):
+                break
+        return results
+
+    def linearize(items, slashes=3):
+        """Expand the alternatives that decide where the first slashes of a match are"""
+        for i, (op, av) in enumerate(items):
+            if not may_match_slash([(op, av)]):
+                continue
+            if op is sre.BRANCH:
+                alternatives = [list(flatten(alt)) for alt in av[1]]
+            elif op in REPEATS:
+                min_, max_, content = av
+                alternatives = [] if min_ else [[]]
+                if max_ != 1:
+                    max_ = max_ if max_ is sre.MAXREPEAT else max_ - 1
+                    content = [*flatten(content), (op, (max(min_ - 1, 0), max_, content))]
+                alternatives.append(list(flatten(content)))
+            else:
+                slashes -= 1
+                if slashes:
+                    continue
+                yield items
+                return
+            for alt in alternatives:
+                for tail in linearize(alt + items[i + 1:], slashes):
+                    yield items[:i] + tail
+            return
+        yield items
+
+    def host_keys(items):
+        start = next((i + 2 for i in range(len(items) - 1) if is_double_slash(items[:i + 2])), 0)
+
+        end = next((i for i in range(start, len(items)) if is_host_end(*items[i])), None)
+        if end is None or may_match_slash(items[start:end]):
+            return None
+
+        suffixes = literal_suffixes(items[start:end])
+        if not suffixes or not all(suffix for suffix, _ in suffixes):
+            return None
+        return {suffix.casefold() for suffix, _ in suffixes}
+
+    try:
+        items = list(flatten(sre.parse(valid_url)))
+    except Exception:
+        return None
+
+    alternatives = list(itertools.islice(linearize(items), max_keys + 1))
+    if len(alternatives) > max_keys:
+        return None
+    keys = set()
+    for linear_items in alternatives:
+        new_keys = host_keys(linear_items)
+        if new_keys is None:
+            return None
+        keys.update(new_keys)
+        if len(keys) > max_keys:
+            return None
+    return tuple(sorted(keys))
+
+
 def url_basename(url):
     path = urllib.parse.urlparse(url).path
     return path.strip('/').split('/')[-1]
@@ -5170,6 +5582,119 @@ def load_plugins(name, suffix, namespace):
     return classes
 
 
+def _is_compilable_traversal(path, is_user_input):
+    """Whether the path only has keys that _compile_traversal can handle and that are safe to cache"""
+    for key in path:
+        if key is None or key is ... or isinstance(key, str):
+            continue
+        elif isinstance(key, int):
+            if is_user_input:  # Must raise at runtime for non-dict objects
+                return False
+        # Functions are not cached since they are usually lambdas that are re-created on each call
+        # Sub-keys other than tuples are single keys; e.g. lists are not hashable
+        elif type(key) is not tuple or not all(
+                _is_compilable_traversal(sub_key if type(sub_key) is tuple else (sub_key,), is_user_input)
+                for sub_key in key):
+            return False
+    return True
+
+
+@functools.lru_cache(maxsize=1024)
+def _compile_traversal(path, casesense, is_user_input, traverse_string):
+    """Compile the path into a function that behaves like traverse_obj's interpreter for a single path
+
+    The returned function takes (obj, current_depth, depth), where depth is
+    a single item list that is updated with the maximum branching depth
+    """
+    def compile_path(path):
+        if not path:
+            return None
+        key, rest = path[0], path[1:]
+        if key is None:
+            return lambda obj, current_depth, depth: obj
+        elif key is ...:
+            return compile_branch(rest)
+        elif isinstance(key, tuple):
+            return compile_tuple(key, rest)
+        return compile_lookup(path)
+
+    def compile_branch(path, get_values=None):
+        next_step = compile_path(path)
+
+        def branch(obj, current_depth, depth):
+            if obj is None:
+                return None
+            obj = (get_values(obj, current_depth, depth) if get_values
+                   else obj.values() if isinstance(obj, dict)
+                   else obj if isinstance(obj, (list, tuple, LazyList))
+                   else str(obj) if traverse_string else [])
+            current_depth += 1
+            if current_depth > depth[0]:
+                depth[0] = current_depth
+            if next_step is None:
+                return list(obj)
+            return [next_step(inner_obj, current_depth, depth) for inner_obj in obj]
+        return branch
+
+    def compile_tuple(key, path):
+        # Each of the keys is traversed and the results are then branched over like with ...
+        steps = [compile_path(tuple(variadic(sub_key))) or (lambda obj, current_depth, depth: obj)
+                 for sub_key in key]
+        return compile_branch(path, lambda obj, current_depth, depth: [
+            step(obj, current_depth, depth) for step in steps])
+
+    def compile_lookup(path):
+        # Consecutive dict keys and indices are looked up in a single loop
+        lookups = []
+        for i, key in enumerate(path):
+            if key is None or key is ... or isinstance(key, tuple):
+                break
+            use_dict = not (is_user_input and key == ':')
+            index = key
+            if is_user_input:
+                index = (int_or_none(key) if ':' not in key
+                         else slice(*map(int_or_none, key.split(':'))))
+                if index == slice(None):
+                    lookups.append((key, use_dict, ...))
+                    i += 1
+                    break
+            lookups.append((key, use_dict, index if isinstance(index, (int, slice)) else None))
+        else:
+            i = len(path)
+        rest = path[i:]
+        next_step = compile_path(rest)
+        # slice(None) with is_user_input is the same as ...
+        branch_step = compile_branch(rest) if lookups[-1][2] is ... else None
+        lookups = tuple(lookups)
+
+        def lookup(obj, current_depth, depth):
+            for key, use_dict, index in lookups:
+                if obj is None:
+                    return None
+                if use_dict and isinstance(obj, dict):
+                    obj = (obj.get(key) if casesense or (key in obj)
+                           else next((v for k, v in obj.items() if (k.lower() if isinstance(k, str) else k) == key), None))
+                    continue
+                if index is ...:
+                    return branch_step(obj, current_depth, depth)
+                if index is None:
+                    return None
+                if not isinstance(obj, (list, tuple, LazyList)):
+                    if not traverse_string:
+                        return None
+                    obj = str(obj)
+                try:
+                    obj = obj[index]
+                except IndexError:
+                    return None
+            if next_step is None:
+                return obj
+            return next_step(obj, current_depth, depth)
+        return lookup
+
+    return compile_path(path) or (lambda obj, current_depth, depth: obj)
+
+
 def traverse_obj(
         obj, *path_list, default=None, expected_type=None, get_all=True,
         casesense=True, is_user_input=False, traverse_string=False):
@@ -5253,7 +5778,14 @@ def _traverse_obj(obj, path, _current_depth=0):
 
     for path in path_list:
         depth = 0
-        val = _traverse_obj(obj, path)
+        if not isinstance(path, tuple):
+            path = tuple(variadic(path))
+        if _is_compilable_traversal(path, is_user_input):
+            max_depth = [0]
+            val = _compile_traversal(path, casesense, is_user_input, traverse_string)(obj, 0, max_depth)
+            depth = max_depth[0]
+        else:
+            val = _traverse_obj(obj, path)
         if val is not None:
             if depth:
                 for _ in range(depth - 1):
@@ -8,6 +8,8 @@
 in RFC 8216 §3.5 <https://tools.ietf.org/html/rfc8216#section-3.5>.
 """
 
+import collections
+import heapq
 import io
 import re
 
@@ -75,6 +77,51 @@ def commit(self):
         return self.__parent
 
 
+class _BlockStreamParser(_MatchParser):
+    """
+    A parser over a binary stream that only keeps a chunk of it in memory.
+    No syntax element spans a blank line, so the data is read in windows
+    of whole blocks, each ending with the blank lines after a block, and the
+    next window is only read and decoded once the current one is consumed.
+    """
+
+    _REGEX_BLOCK_END = re.compile(rb'(?:\r\n|\r(?!\n)|\n){2,}')
+
+    def __init__(self, stream, chunk_size):
+        super().__init__('')
+        self._windows = self._iter_windows(stream, chunk_size)
+        self._next_window()
+
+    @classmethod
+    def _iter_windows(cls, stream, chunk_size):
+        buf = bytearray()
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                if buf:
+                    yield buf.decode()
+                return
+            # The blank lines ending a block may have started in the previous chunk
+            search_start = max(0, len(buf) - 4)
+            buf += chunk
+            window_end = None
+            for m in cls._REGEX_BLOCK_END.finditer(buf, search_start):
+                # A block only ends where the next one starts, since a CRLF may be split across chunks
+                if m.end() < len(buf):
+                    window_end = m.end()
+            if window_end:
+                yield buf[:window_end].decode()
+                del buf[:window_end]
+
+    def _next_window(self):
+        self._data, self._pos = next(self._windows, ''), 0
+
+    def match(self, r):
+        if self._pos >= len(self._data):
+            self._next_window()
+        return super().match(r)
+
+
 class ParseError(Exception):
     def __init__(self, parser):
         super().__init__("Parse error at position %u (near %r)" % (
@@ -251,48 +298,31 @@ class CueBlock(Block):
     A cue block. The payload is not interpreted.
     """
 
-    _REGEX_ID = re.compile(r'((?:(?!-->)[^\r\n])+)(?:\r\n|[\r\n])')
-    _REGEX_ARROW = re.compile(r'[ \t]+-->[ \t]+')
-    _REGEX_SETTINGS = re.compile(r'[ \t]+((?:(?!-->)[^\r\n])+)')
-    _REGEX_PAYLOAD = re.compile(r'[^\r\n]+(?:\r\n|[\r\n])?')
+    # The whole cue, matched at once: an optional identifier line,
+    # the timings with their optional settings, then the payload lines
+    _REGEX = re.compile(r'''(?x)
+        (?:((?:(?!-->)[^\r\n])+)(?:\r\n|[\r\n]))?
+        ((?:[0-9]{1,}:)?[0-9]{2}:[0-9]{2}\.(?:[0-9]{3})?)
+        [\ \t]+-->[\ \t]+
+        ((?:[0-9]{1,}:)?[0-9]{2}:[0-9]{2}\.(?:[0-9]{3})?)
+        (?:[\ \t]+((?:(?!-->)[^\r\n])+))?
+        (?:\r\n|[\r\n])
+        ((?:[^\r\n]+(?:\r\n|[\r\n])?)*)
+    ''')
 
     @classmethod
     def parse(cls, parser):
-        parser = parser.child()
-
-        id = None
-        m = parser.consume(cls._REGEX_ID)
-        if m:
-            id = m.group(1)
-
-        m0 = parser.consume(_REGEX_TS)
-        if not m0:
-            return None
-        if not parser.consume(cls._REGEX_ARROW):
-            return None
-        m1 = parser.consume(_REGEX_TS)
-        if not m1:
-            return None
-        m2 = parser.consume(cls._REGEX_SETTINGS)
-        if not parser.consume(_REGEX_NL):
+        m = parser.match(cls._REGEX)
+        if not m:
             return None
+        parser.advance(m)
 
-        start = _parse_ts(m0)
-        end = _parse_ts(m1)
-        settings = m2.group(1) if m2 is not None else None
-
-        text = io.StringIO()
-        while True:
-            m = parser.consume(cls._REGEX_PAYLOAD)
-            if not m:
-                break
-            text.write(m.group(0))
-
-        parser.commit()
+        id, start, end, settings, text = m.groups()
         return cls(
             id=id,
-            start=start, end=end, settings=settings,
-            text=text.getvalue()
+            start=_parse_ts(_REGEX_TS.match(start)),
+            end=_parse_ts(_REGEX_TS.match(end)),
+            settings=settings, text=text
         )
 
     def write_into(self, stream):
@@ -340,13 +370,112 @@ def hinges(self, other):
         return self.start <= self.end == other.start <= other.end
 
 
+class CueMerger:
+    """
+    Incrementally merge the cues of consecutive fragments of a live stream.
+
+    Live streams repeat the cues of a rolling window in every fragment, and
+    split a cue displayed across fragments into cues that hinge on each other.
+    Cues are kept until they end before the start of an incoming cue, since
+    they can then no longer be extended or duplicated. They are indexed by
+    text, settings and end time, so adding a cue does not scan the window.
+    """
+
+    def __init__(self):
+        self._cues = {}  # seq -> CueBlock, in the order the cues were added
+        self._next_seq = 0
+        self._by_end = collections.defaultdict(set)  # (text, settings, end) -> seqs
+        self._ends = []  # heap of (end, seq); entries are stale if the cue ended later
+
+    def __len__(self):
+        return len(self._cues)
+
+    def _index(self, seq, cue):
+        self._by_end[cue.text, cue.settings, cue.end].add(seq)
+        heapq.heappush(self._ends, (cue.end, seq))
+
+    def _unindex(self, seq, cue):
+        key = cue.text, cue.settings, cue.end
+        self._by_end[key].discard(seq)
+        if not self._by_end[key]:
+            del self._by_end[key]
+
+    def _append(self, cue):
+        seq, self._next_seq = self._next_seq, self._next_seq + 1
+        self._cues[seq] = cue
+        self._index(seq, cue)
+
+    def _candidates(self, cue, end):
+        return list(self._by_end.get((cue.text, cue.settings, end), ()))
+
+    def add(self, cue):
+        """
+        Add a cue and return the list of cues that are final, in the order they were added
+        """
+        keep = set()
+        if cue.start <= cue.end:
+            for seq in self._candidates(cue, cue.start):
+                hinged = self._cues[seq]
+                if hinged.start <= hinged.end:
+                    self._unindex(seq, hinged)
+                    hinged.end = cue.end
+                    self._index(seq, hinged)
+                    keep.add(seq)
+        keep.update(seq for seq in self._candidates(cue, cue.end) if self._cues[seq] == cue)
+
+        ready, kept = {}, []
+        while self._ends and self._ends[0][0] <= cue.start:
+            end, seq = heapq.heappop(self._ends)
+            if seq in keep:
+                kept.append((end, seq))
+            elif seq in self._cues and self._cues[seq].end == end:
+                ready[seq] = self._cues.pop(seq)
+                self._unindex(seq, ready[seq])
+        for item in kept:
+            heapq.heappush(self._ends, item)
+
+        if not keep:
+            self._append(cue)
+        return [ready[seq] for seq in sorted(ready)]
+
+    def flush(self):
+        """Remove and return all the remaining cues, in the order they were added"""
+        cues = list(self._cues.values())
+        self._cues.clear()
+        self._by_end.clear()
+        self._ends.clear()
+        return cues
+
+    @property
+    def as_json(self):
+        return [cue.as_json for cue in self._cues.values()]
+
+    @classmethod
+    def from_json(cls, json):
+        merger = cls()
+        for cue in json:
+            merger._append(CueBlock.from_json(cue))
+        return merger
+
+
 def parse_fragment(frag_content):
     """
     A generator that yields (partially) parsed WebVTT blocks when given
     a bytes object containing the raw contents of a WebVTT file.
     """
 
-    parser = _MatchParser(frag_content.decode())
+    return parse_stream(io.BytesIO(frag_content))
+
+
+def parse_stream(stream, chunk_size=64 * 1024):
+    """
+    A generator that yields (partially) parsed WebVTT blocks when given
+    a binary file object with the raw contents of a WebVTT file.
+    The stream is read lazily in chunks of chunk_size bytes, so memory use
+    is bounded by the chunk size and the size of the largest block.
+    """
+
+    parser = _BlockStreamParser(stream, chunk_size)
 
     yield Magic.parse(parser)
 